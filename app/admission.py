@@ -0,0 +1,158 @@
+"""
+Admission control: concurrency limits per route class, with bounded queues.
+
+Requests are classified by method and path before they reach a handler.
+Each class has its own limit on requests in progress, a bounded queue of
+requests waiting for a slot and a deadline for that wait. A request that
+finds the queue full, or is still queued at its deadline, gets an immediate
+503 with Retry-After. Slow LLM-backed endpoints can therefore only fill
+their own slots, and cheap endpoints keep answering.
+
+A slot is held until the response has been sent completely, so streamed
+exports count for as long as they stream.
+"""
+import asyncio
+import math
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+import orjson
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .metrics import registry
+
+ADMISSION_REJECTED = registry.counter(
+    "admission_rejected_total", "Requests shed by admission control", ("route_class", "reason")
+)
+ADMISSION_WAIT = registry.histogram(
+    "admission_queue_wait_seconds", "Time queued for an admission slot", ("route_class",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+ADMISSION_IN_FLIGHT = registry.gauge("admission_in_flight", "Admitted requests in progress", ("route_class",))
+ADMISSION_QUEUED = registry.gauge("admission_queued", "Requests waiting for an admission slot", ("route_class",))
+
+
+@dataclass(frozen=True)
+class RouteClass:
+    name: str
+    concurrency: int
+    max_queue: int
+    queue_timeout_s: float
+
+
+# (method or None for any, path pattern, class name); first match wins, unmatched -> "default"
+ROUTE_RULES: List[Tuple[Optional[str], "re.Pattern[str]", str]] = [
+    (None, re.compile(r"^/(metrics|docs|openapi\.json|redoc)?$"), "exempt"),
+    ("POST", re.compile(r"^/chat/(query|applicant-query)$"), "llm"),
+    ("POST", re.compile(r"^/ai/generate-email$"), "llm"),
+    ("POST", re.compile(r"^/applications$"), "upload"),
+    ("GET", re.compile(r"^/jobs/\d+/applications/export$"), "export"),
+]
+
+
+def classify(method: str, path: str) -> str:
+    for rule_method, pattern, name in ROUTE_RULES:
+        if (rule_method is None or rule_method == method) and pattern.match(path):
+            return name
+    return "default"
+
+
+class _Gate:
+    """Counting semaphore with a bounded FIFO queue and a wait deadline"""
+
+    def __init__(self, route_class: RouteClass):
+        self.route_class = route_class
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> Optional[str]:
+        """None when admitted, otherwise why the request was rejected"""
+        name = self.route_class.name
+        if self.in_flight < self.route_class.concurrency and not self.waiters:
+            self.in_flight += 1
+            ADMISSION_IN_FLIGHT.set(name, value=self.in_flight)
+            return None
+        if len(self.waiters) >= self.route_class.max_queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        ADMISSION_QUEUED.set(name, value=len(self.waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.route_class.queue_timeout_s)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Handed a slot just as the deadline passed; take it
+                return None
+            waiter.cancel()
+            return "timeout"
+        except asyncio.CancelledError:
+            # Client went away; pass on a slot we may have been handed meanwhile
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            ADMISSION_QUEUED.set(name, value=len(self.waiters))
+            ADMISSION_WAIT.observe(name, value=time.perf_counter() - start)
+        return None
+
+    def release(self) -> None:
+        # Hand the slot straight to the next waiter, so queued requests aren't overtaken
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                ADMISSION_QUEUED.set(self.route_class.name, value=len(self.waiters))
+                return
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.set(self.route_class.name, value=self.in_flight)
+
+
+class AdmissionControlMiddleware:
+    """Per-route-class concurrency limits; sheds load with 503 + Retry-After"""
+
+    def __init__(self, app: ASGIApp, route_classes: List[RouteClass], retry_after_s: float = 2.0):
+        self.app = app
+        self.gates: Dict[str, _Gate] = {rc.name: _Gate(rc) for rc in route_classes}
+        self.retry_after = str(max(1, math.ceil(retry_after_s)))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.gates.get(classify(scope["method"], scope["path"]))
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await gate.acquire()
+        if reason is not None:
+            ADMISSION_REJECTED.inc(gate.route_class.name, reason)
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+    async def _reject(self, send: Send) -> None:
+        body = orjson.dumps({"detail": "Server is busy, please retry shortly"})
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", self.retry_after.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,91 +1,119 @@
-import openai
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from ..database import SessionLocal
-from .. import models
-from ..config import Settings
+import logging
+import re
+from datetime import date
+from typing import List, Optional
+from ..database import SessionLocal, release_connection
+from ..cache import TTLCache
+from ..config import settings
+from ..etags import manager_data_version
+from .gateway import Priority, chat_completion
+from .tools import TOOL_SCHEMAS, run_tool
 
-settings = Settings()
-openai.api_key = settings.openai_api_key
+logger = logging.getLogger(__name__)
 
-def get_database_context(hiring_manager_id: int, db: Session) -> str:
-    """Gather relevant database context for the AI agent"""
-    
-    # Get all jobs for this manager
-    jobs = db.query(models.Job).filter(
-        models.Job.hiring_manager_id == hiring_manager_id
-    ).all()
-    
-    job_ids = [j.id for j in jobs]
-    
-    # Get all applications
-    applications = db.query(models.Application).filter(
-        models.Application.job_id.in_(job_ids)
-    ).all() if job_ids else []
-    
-    # Build context string
-    context = f"Total jobs: {len(jobs)}\n"
-    context += f"Open jobs: {len([j for j in jobs if j.status == 'open'])}\n"
-    context += f"Closed jobs: {len([j for j in jobs if j.status == 'closed'])}\n"
-    context += f"Total applications: {len(applications)}\n\n"
-    
-    context += "Jobs:\n"
-    for job in jobs:
-        app_count = len([a for a in applications if a.job_id == job.id])
-        context += f"- {job.title} [{job.status}] - {job.location} | £{job.salary_min}-{job.salary_max} | {app_count} applications\n"
-    
-    context += "\nApplications:\n"
-    for app in applications[:20]:  # Limit to recent 20
-        applicant = db.get(models.User, app.applicant_id)
-        job = db.get(models.Job, app.job_id)
-        context += f"- {applicant.full_name if applicant else 'Unknown'} applied to {job.title if job else 'Unknown'} "
-        context += f"[Status: {app.status}]"
-        if app.ai_score:
-            context += f" [AI Score: {app.ai_score}/100]"
-        context += "\n"
-    
-    return context
+# Answers are keyed by the manager's data version, so they are only reused
+# until one of their jobs or applications changes (or the TTL runs out)
+answer_cache = TTLCache(
+    "assistant_answers",
+    max_entries=settings.answer_cache_max_entries,
+    ttl=settings.answer_cache_ttl_s,
+)
+
+MAX_TOOL_ROUNDS = 4
 
-def query_database_with_ai(question: str, hiring_manager_id: int) -> str:
+SYSTEM_PROMPT = """You are an AI recruitment assistant helping a hiring manager.
+You can look up their jobs and applications with the provided tools; call them
+instead of guessing, and combine several calls if needed. Tool results cover
+all of the manager's data. Answer clearly and concisely.
+If the tools can't answer the question, say so politely."""
+
+def normalize_question(question: str) -> str:
+    """Case, punctuation and whitespace-insensitive form of a question"""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.casefold()).split())
+
+def _assistant_message(message) -> dict:
+    """Echo the model's tool-call turn back into the conversation"""
+    return {
+        "role": "assistant",
+        "content": message.content,
+        "tool_calls": [
+            {
+                "id": call.id,
+                "type": "function",
+                "function": {"name": call.function.name, "arguments": call.function.arguments},
+            }
+            for call in message.tool_calls
+        ],
+    }
+
+def query_database_with_ai(question: str, hiring_manager_id: int, history: Optional[List[dict]] = None) -> str:
     """
-    Enhanced AI agent using OpenAI GPT to answer questions about jobs and applications
+    Answer a hiring manager's question by letting the model call read-only
+    query tools, so the prompt stays the same size however much data there is.
+    `history` is the earlier conversation (summary and recent turns); answers
+    to follow-up questions depend on it and are not cached.
     """
     db = SessionLocal()
     
     try:
-        # Get database context
-        db_context = get_database_context(hiring_manager_id, db)
-        
-        # Create prompt
-        system_prompt = """You are an AI recruitment assistant helping a hiring manager. 
-You have access to their job postings and applications data. 
-Answer their questions clearly and helpfully based on the provided data.
-If you don't have enough information, say so politely."""
+        cache_key = None
+        if not history:
+            cache_key = (hiring_manager_id, normalize_question(question), manager_data_version(db, hiring_manager_id))
+            release_connection(db)
+            cached = answer_cache.get(cache_key)
+            if cached is not None:
+                return cached
 
-        user_prompt = f"""Here's the current data:
+        messages = [
+            {"role": "system", "content": f"{SYSTEM_PROMPT}\nToday is {date.today().isoformat()}."},
+            *(history or []),
+            {"role": "user", "content": question},
+        ]
 
-{db_context}
+        for _ in range(MAX_TOOL_ROUNDS):
+            response = chat_completion(
+                priority=Priority.INTERACTIVE,
+                caller="recruitment_assistant",
+                model=settings.openai_model,
+                messages=messages,
+                tools=TOOL_SCHEMAS,
+                temperature=0.2,
+                max_tokens=500
+            )
+            message = response.choices[0].message
+            if not message.tool_calls:
+                break
+            messages.append(_assistant_message(message))
+            for call in message.tool_calls:
+                logger.debug("Assistant tool call %s(%s)", call.function.name, call.function.arguments)
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": call.id,
+                    "content": run_tool(db, hiring_manager_id, call.function.name, call.function.arguments),
+                })
+            # Tool queries are short; the next model call runs without a connection
+            release_connection(db)
+        else:
+            # Out of tool rounds: ask for an answer from what was gathered
+            response = chat_completion(
+                priority=Priority.INTERACTIVE,
+                caller="recruitment_assistant",
+                model=settings.openai_model,
+                messages=messages,
+                tools=TOOL_SCHEMAS,
+                tool_choice="none",
+                temperature=0.2,
+                max_tokens=500
+            )
+            message = response.choices[0].message
 
-Question: {question}
-
-Please provide a clear, helpful answer."""
-
-        # Call OpenAI
-        response = openai.chat.completions.create(
-            model=settings.openai_model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.5,
-            max_tokens=500
-        )
-        
-        answer = response.choices[0].message.content
+        answer = message.content
+        if answer and cache_key is not None:
+            answer_cache.set(cache_key, answer)
         return answer
         
     except Exception as e:
-        print(f"Error in AI query: {e}")
+        logger.exception("Error in AI query")
         return f"I encountered an error processing your question: {str(e)}\n\nPlease try rephrasing or contact support."
         
     finally:
@@ -0,0 +1,12 @@
+from functools import lru_cache
+
+from ..config import settings
+
+
+@lru_cache()
+def get_openai_client():
+    """Shared OpenAI client, created on first use so startup doesn't import openai"""
+    from openai import OpenAI
+
+    # Retries are handled by the gateway so it can see 429s
+    return OpenAI(api_key=settings.openai_api_key, max_retries=0)
@@ -0,0 +1,152 @@
+"""
+Server-side chat conversations with a rolling summary.
+
+Clients send only the new message and a conversation id. Each prompt is
+built from the conversation's running summary plus its last
+settings.chat_recent_turns turns, so its size stays flat however long the
+conversation gets. Once settings.chat_summary_batch turns older than that
+window are not yet in the summary, a background step folds them in with one
+LLM call.
+"""
+import logging
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from ..database import SessionLocal, release_connection
+from ..metrics import registry
+from .gateway import Priority, chat_completion
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_SUMMARIES = registry.counter(
+    "chat_conversation_summaries_total", "Rolling summary updates", ("outcome",)
+)
+
+# Summaries are asked to stay under this, so they don't grow with the conversation
+SUMMARY_MAX_WORDS = 200
+
+SUMMARY_PROMPT = f"""Update the running summary of a conversation between a user and an assistant.
+Keep every fact, name, number, id and decision that later questions may refer to, and
+what the user is trying to achieve. Drop greetings and small talk. Write plain prose
+in at most {SUMMARY_MAX_WORDS} words. Reply with the updated summary only."""
+
+
+def get_conversation(db: Session, user_id: int, assistant: str, conversation_id: Optional[int]) -> models.Conversation:
+    """The user's conversation with that id, or a new one when no id is given"""
+    if conversation_id is None:
+        conversation = models.Conversation(user_id=user_id, assistant=assistant, summarized_through=0)
+        db.add(conversation)
+        db.flush()
+        return conversation
+    conversation = db.get(models.Conversation, conversation_id)
+    if conversation is None or conversation.user_id != user_id or conversation.assistant != assistant:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation
+
+
+def context_messages(db: Session, conversation: models.Conversation) -> List[Dict[str, str]]:
+    """Summary (as a system message) plus the most recent turns, oldest first"""
+    Turn = models.ConversationTurn
+    recent = db.execute(
+        select(Turn.role, Turn.content)
+        .where(Turn.conversation_id == conversation.id)
+        .order_by(Turn.id.desc())
+        .limit(settings.chat_recent_turns)
+    ).all()
+    messages = []
+    if conversation.summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{conversation.summary}"})
+    messages.extend({"role": role, "content": content} for role, content in reversed(recent))
+    return messages
+
+
+def add_turns(db: Session, conversation_id: int, turns: List[Dict[str, str]]) -> None:
+    """Append turns in the caller's transaction"""
+    if turns:
+        db.execute(insert(models.ConversationTurn), [
+            {"conversation_id": conversation_id, "role": t["role"], "content": t["content"]} for t in turns
+        ])
+        db.execute(
+            update(models.Conversation)
+            .where(models.Conversation.id == conversation_id)
+            .values(updated_at=func.now())
+        )
+
+
+def _unsummarized(db: Session, conversation: models.Conversation):
+    """Turns not in the summary and no longer in the recent window, oldest first"""
+    Turn = models.ConversationTurn
+    window_start = db.execute(
+        select(Turn.id)
+        .where(Turn.conversation_id == conversation.id)
+        .order_by(Turn.id.desc())
+        .offset(settings.chat_recent_turns - 1)
+        .limit(1)
+    ).scalar()
+    if window_start is None:
+        return []
+    return db.execute(
+        select(Turn.id, Turn.role, Turn.content)
+        .where(
+            Turn.conversation_id == conversation.id,
+            Turn.id > conversation.summarized_through,
+            Turn.id < window_start,
+        )
+        .order_by(Turn.id)
+    ).all()
+
+
+def needs_summary(db: Session, conversation: models.Conversation) -> bool:
+    return len(_unsummarized(db, conversation)) >= settings.chat_summary_batch
+
+
+def summarize_conversation(conversation_id: int) -> None:
+    """Background step: fold turns that left the recent window into the summary"""
+    db = SessionLocal()
+    try:
+        conversation = db.get(models.Conversation, conversation_id)
+        if conversation is None:
+            return
+        turns = _unsummarized(db, conversation)
+        if len(turns) < settings.chat_summary_batch:
+            return
+        previous, through = conversation.summary, conversation.summarized_through
+        release_connection(db)
+
+        transcript = "\n".join(f"{role}: {content}" for _, role, content in turns)
+        try:
+            response = chat_completion(
+                priority=Priority.BATCH,
+                caller="chat_summary",
+                model=settings.openai_model,
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Current summary:\n{previous or '(none yet)'}\n\nNew turns:\n{transcript}"},
+                ],
+                temperature=0.2,
+                max_tokens=400,
+            )
+            summary = (response.choices[0].message.content or "").strip()
+        except Exception:
+            logger.exception(f"Summarizing conversation {conversation_id} failed")
+            CONVERSATION_SUMMARIES.inc("error")
+            return
+        if not summary:
+            CONVERSATION_SUMMARIES.inc("error")
+            return
+
+        # Only if nobody else moved the summary on meanwhile
+        result = db.execute(
+            update(models.Conversation)
+            .where(models.Conversation.id == conversation_id, models.Conversation.summarized_through == through)
+            .values(summary=summary, summarized_through=turns[-1].id)
+        )
+        db.commit()
+        CONVERSATION_SUMMARIES.inc("updated" if result.rowcount else "superseded")
+    finally:
+        db.close()
@@ -1,27 +1,39 @@
-import openai
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import json
-import PyPDF2
-import io
-from ..config import Settings
+import logging
+from ..config import settings
 from .. import models
+from ..changes import next_change_seq
+from ..database import SessionLocal, release_connection
+from ..etags import bump_applications_version
+from ..job_stats import record_application_change, snapshot
+from ..metrics import registry
+from ..pdf_extraction import extract_text
+from .cv_dedup import cv_hash, find_exact_duplicate, find_near_duplicate, minhash_signature
+from .gateway import Priority, chat_completion
+from .talent_pool import index_cv
+from .prescreen import PRESCREEN_DECISIONS, corpus_for_job, job_text, prescore, prescreen_decision, provisional_analysis
 from datetime import datetime 
 
-settings = Settings()
-openai.api_key = settings.openai_api_key
+logger = logging.getLogger(__name__)
+
+CV_REUSE = registry.counter(
+    "cv_analysis_reuse_total", "CV analyses served from a duplicate CV", ("match", "scope")
+)
+LLM_CALLS_AVOIDED = registry.counter(
+    "llm_calls_avoided_total", "Full CV analyses replaced by reuse or local pre-screening", ("caller", "reason")
+)
+
+NO_CV_TEXT = "Unable to extract text from CV"
+
+# How much of the CV the fit-only prompt carries
+FIT_CV_EXCERPT_CHARS = 4000
 
 def extract_text_from_pdf(cv_content: bytes) -> str:
-    """Extract text from PDF CV"""
-    try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(cv_content))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        return text
-    except Exception as e:
-        print(f"Error extracting PDF text: {e}")
-        return ""
+    """Extract text from PDF CV, in the isolated extraction pool"""
+    return extract_text(cv_content)
 
 def analyze_cv_with_ai(cv_text: str, job_description: str, job_title: str) -> Dict[str, Any]:
     """
@@ -57,7 +69,9 @@ Respond in JSON format:
 """
 
     try:
-        response = openai.chat.completions.create(
+        response = chat_completion(
+            priority=Priority.BATCH,
+            caller="cv_analysis",
             model=settings.openai_model,
             messages=[
                 {"role": "system", "content": "You are an expert recruiter and HR professional."},
@@ -71,18 +85,99 @@ Respond in JSON format:
         return result
         
     except Exception as e:
-        print(f"Error in CV analysis: {e}")
+        logger.exception("Error in CV analysis")
         return {
             "score": 50,
             "summary": "Unable to analyze CV automatically. Manual review required.",
             "recommendation": "review",
             "reasoning": f"Error during AI analysis: {str(e)}",
-            "skills": []
+            "skills": [],
+            "failed": True,
+        }
+
+def score_fit_with_ai(cv_text: str, summary: str, skills: List[str], job_description: str, job_title: str) -> Dict[str, Any]:
+    """
+    Job-fit scoring only, for a CV whose summary and skills are already known
+    Returns: score, recommendation, reasoning
+    """
+    prompt = f"""You are an expert recruiter scoring a known candidate against a new job position.
+
+**Job Title:** {job_title}
+
+**Job Description:**
+{job_description}
+
+**Candidate summary:** {summary}
+**Candidate skills:** {", ".join(skills)}
+
+**Candidate's CV (excerpt):**
+{cv_text[:FIT_CV_EXCERPT_CHARS]}
+
+Please provide:
+1. A match score (0-100) based on how well the candidate fits this role
+2. A recommendation: "shortlist", "review", or "reject"
+3. Reasoning for your recommendation (2-3 sentences)
+
+Respond in JSON format:
+{{
+  "score": 85,
+  "recommendation": "shortlist",
+  "reasoning": "..."
+}}
+"""
+
+    try:
+        response = chat_completion(
+            priority=Priority.BATCH,
+            caller="cv_fit",
+            model=settings.openai_model,
+            messages=[
+                {"role": "system", "content": "You are an expert recruiter and HR professional."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            response_format={"type": "json_object"}
+        )
+        return json.loads(response.choices[0].message.content)
+
+    except Exception as e:
+        logger.exception("Error in CV fit scoring")
+        return {
+            "score": 50,
+            "recommendation": "review",
+            "reasoning": f"Error during AI analysis: {str(e)}",
+            "failed": True,
         }
 
-def process_application_with_ai(application_id: int, db: Session) -> Dict[str, Any]:
+def _reused_analysis(app: models.Application, job: models.Job, source: models.Application, cv_text: str) -> Dict[str, Any]:
+    """Analysis built from a duplicate CV's, re-scoring only when the job differs"""
+    skills = json.loads(source.skills_extracted or "[]")
+    if source.job_id == app.job_id:
+        LLM_CALLS_AVOIDED.inc("cv_analysis", "duplicate_cv")
+        return {
+            "score": source.ai_score,
+            "summary": source.ai_summary,
+            "recommendation": source.ai_recommendation,
+            "reasoning": source.ai_reasoning,
+            "skills": skills,
+        }
+    fit = score_fit_with_ai(cv_text, source.ai_summary or "", skills, job.description, job.title)
+    LLM_CALLS_AVOIDED.inc("cv_analysis", "duplicate_cv_fit_only")
+    return {**fit, "summary": source.ai_summary, "skills": skills}
+
+def process_application_with_ai(
+    application_id: int,
+    db: Session,
+    prescreen: Optional[Dict[str, float]] = None,
+    use_prescreen: bool = True,
+) -> Dict[str, Any]:
     """
-    Main function to process an application with AI
+    Main function to process an application with AI.
+    A CV already analyzed for another application (same file, or nearly the
+    same text from the same applicant) reuses that summary and skills list;
+    otherwise a local pre-screen decides whether the LLM sees it at all.
+    `prescreen` is passed in when the caller already scored a batch;
+    use_prescreen=False always sends the CV to the LLM.
     """
     # Get application details
     app = db.get(models.Application, application_id)
@@ -94,15 +189,55 @@ def process_application_with_ai(application_id: int, db: Session) -> Dict[str, A
     if not job:
         return {"error": "Job not found"}
     
-    # Extract text from CV
-    cv_text = extract_text_from_pdf(app.cv_content)
-    if not cv_text:
-        cv_text = "Unable to extract text from CV"
+    digest = cv_hash(app.cv_content or b"")
+    source = find_exact_duplicate(db, app, digest)
+    match = "exact"
+    if source is not None and source.cv_parsed_text:
+        cv_text = source.cv_parsed_text
+    elif app.cv_parsed_text:
+        cv_text = app.cv_parsed_text
+    else:
+        # Extract text from CV (in the worker pool, without holding a connection)
+        release_connection(db)
+        cv_text = extract_text_from_pdf(app.cv_content)
+        if not cv_text:
+            cv_text = NO_CV_TEXT
+    signature = minhash_signature(cv_text) if cv_text != NO_CV_TEXT else None
+    if source is None and signature is not None:
+        source, _ = find_near_duplicate(db, app, signature, settings.cv_near_duplicate_threshold)
+        match = "near"
     
-    # Analyze with AI
-    analysis = analyze_cv_with_ai(cv_text, job.description, job.title)
+    # Reads are done; model calls below run without holding a connection
+    release_connection(db)
     
-    # Update application with AI results
+    if source is not None:
+        analysis = _reused_analysis(app, job, source, cv_text)
+        CV_REUSE.inc(match, "full" if source.job_id == app.job_id else "fit_only")
+        analysis_source = "duplicate"
+    else:
+        if not use_prescreen:
+            prescreen = None
+        elif prescreen is None and settings.prescreen_enabled and cv_text != NO_CV_TEXT:
+            prescreen = prescore(job_text(job), [cv_text], corpus_for_job(db, job.id, app.id))[0]
+            release_connection(db)
+        if prescreen is not None:
+            app.prescreen_score = prescreen["score"]
+        decision = prescreen_decision(prescreen["score"]) if prescreen is not None else None
+        if decision == "skipped":
+            PRESCREEN_DECISIONS.inc("skipped")
+            LLM_CALLS_AVOIDED.inc("cv_analysis", "prescreen")
+            analysis = provisional_analysis(prescreen)
+            analysis_source = "prescreen"
+        else:
+            if decision is not None:
+                PRESCREEN_DECISIONS.inc(decision)
+            # Analyze with AI
+            analysis = analyze_cv_with_ai(cv_text, job.description, job.title)
+            analysis_source = "llm"
+    
+    # Update application with AI results; the change sequence is reserved before any row is written
+    app.change_seq = next_change_seq(db)
+    before = snapshot(app)
     app.cv_parsed_text = cv_text
     app.ai_score = analysis.get("score", 50)
     app.ai_summary = analysis.get("summary", "")
@@ -111,15 +246,26 @@ def process_application_with_ai(application_id: int, db: Session) -> Dict[str, A
     app.skills_extracted = json.dumps(analysis.get("skills", []))
     app.ai_processed = True
     app.ai_processed_at = datetime.now()
+    app.ai_analysis_source = analysis_source
+    if not analysis.get("failed") and analysis_source != "prescreen":
+        # Only successful analyses are offered for reuse
+        app.cv_sha256 = digest
+        app.cv_minhash = signature
+    if cv_text != NO_CV_TEXT:
+        index_cv(db, app.id, app.applicant_id, cv_text)
     
-    # Auto-update status based on recommendation
-    if analysis.get("recommendation") == "shortlist" and analysis.get("score", 0) >= 80:
+    # Auto-update status based on recommendation; pre-screen rejects wait for a human
+    if analysis_source == "prescreen":
+        app.status = "reviewing"
+    elif analysis.get("recommendation") == "shortlist" and analysis.get("score", 0) >= 80:
         app.status = "shortlisted"
     elif analysis.get("recommendation") == "reject" and analysis.get("score", 0) < 40:
         app.status = "rejected"
     else:
         app.status = "reviewing"
     
+    bump_applications_version(db, app.job_id)
+    record_application_change(db, app.job_id, before, snapshot(app))
     db.commit()
     db.refresh(app)
     
@@ -128,5 +274,55 @@ def process_application_with_ai(application_id: int, db: Session) -> Dict[str, A
         "score": app.ai_score,
         "recommendation": app.ai_recommendation,
         "status": app.status,
-        "summary": app.ai_summary
+        "summary": app.ai_summary,
+        "source": app.ai_analysis_source,
     }
+
+
+def analyze_application_task(application_id: int, use_prescreen: bool = True) -> None:
+    """Background entry point: the request's session is gone by the time this runs"""
+    db = SessionLocal()
+    try:
+        process_application_with_ai(application_id, db, use_prescreen=use_prescreen)
+    finally:
+        db.close()
+
+
+def screen_job_applications(job_id: int) -> Dict[str, int]:
+    """
+    Two-stage screening for all of a job's unanalyzed applications:
+    one vectorized pre-screen pass over the batch, then the per-application
+    pipeline with the batch scores passed in.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(models.Job, job_id)
+        if not job:
+            return {"error": "Job not found"}
+        pending = db.execute(
+            select(models.Application)
+            .where(models.Application.job_id == job_id, models.Application.ai_processed.is_not(True))
+            .order_by(models.Application.id)
+        ).scalars().all()
+
+        release_connection(db)
+        for app in pending:
+            if not app.cv_parsed_text:
+                app.cv_parsed_text = extract_text_from_pdf(app.cv_content) or NO_CV_TEXT
+        db.commit()
+
+        scored = [app for app in pending if app.cv_parsed_text != NO_CV_TEXT]
+        results = dict(zip(
+            (app.id for app in scored),
+            prescore(job_text(job), [app.cv_parsed_text for app in scored], corpus_for_job(db, job_id))
+            if settings.prescreen_enabled else [],
+        ))
+
+        sent = 0
+        for app in pending:
+            outcome = process_application_with_ai(app.id, db, prescreen=results.get(app.id))
+            sent += outcome.get("source") == "llm"
+        logger.info(f"Screened {len(pending)} applications for job {job_id}, {sent} sent to the LLM")
+        return {"screened": len(pending), "sent_to_llm": sent}
+    finally:
+        db.close()
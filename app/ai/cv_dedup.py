@@ -0,0 +1,110 @@
+"""
+Duplicate CV detection, so one CV's analysis can serve several applications.
+
+An exact match is a SHA-256 of the uploaded file. Near duplicates (the same
+CV re-exported, a tweaked line or two) are found by comparing MinHash
+signatures of the parsed text's word shingles against the applicant's other
+analyzed applications.
+"""
+import hashlib
+import re
+from array import array
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, select
+from sqlalchemy.orm import Session
+
+from .. import models
+
+SHINGLE_WORDS = 5
+NUM_PERMUTATIONS = 64
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed so signatures stay comparable across processes and deploys
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_PRIME - 1) + 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _PRIME)
+    for i in range(NUM_PERMUTATIONS)
+]
+
+# Applicants rarely have more applications than this worth comparing against
+NEAR_DUPLICATE_CANDIDATES = 20
+
+
+def cv_hash(cv_content: bytes) -> str:
+    return hashlib.sha256(cv_content).hexdigest()
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.casefold())
+    if len(words) < SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash_signature(text: str) -> Optional[bytes]:
+    """64 x uint32 MinHash of the text's word shingles, None for empty text"""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles]
+    signature = array("I", (
+        min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    ))
+    return signature.tobytes()
+
+
+def similarity(left: bytes, right: bytes) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    a, b = array("I"), array("I")
+    a.frombytes(left)
+    b.frombytes(right)
+    if len(a) != len(b):
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def _reusable(application_id: int):
+    Application = models.Application
+    return (
+        Application.id != application_id,
+        Application.ai_processed.is_(True),
+        Application.skills_extracted.is_not(None),
+    )
+
+
+def find_exact_duplicate(db: Session, application: models.Application, digest: str) -> Optional[models.Application]:
+    """Analyzed application with the same file, preferring one for the same job"""
+    Application = models.Application
+    return db.execute(
+        select(Application)
+        .where(Application.cv_sha256 == digest, *_reusable(application.id))
+        .order_by(case((Application.job_id == application.job_id, 0), else_=1), Application.id.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+
+
+def find_near_duplicate(
+    db: Session, application: models.Application, signature: bytes, threshold: float
+) -> Tuple[Optional[models.Application], float]:
+    """Most similar of the applicant's analyzed applications above `threshold`"""
+    Application = models.Application
+    candidates: List[tuple] = db.execute(
+        select(Application.id, Application.cv_minhash)
+        .where(
+            Application.applicant_id == application.applicant_id,
+            Application.cv_minhash.is_not(None),
+            *_reusable(application.id),
+        )
+        .order_by(Application.id.desc())
+        .limit(NEAR_DUPLICATE_CANDIDATES)
+    ).all()
+    best_id, best = None, 0.0
+    for candidate_id, candidate_signature in candidates:
+        score = similarity(signature, candidate_signature)
+        if score > best:
+            best_id, best = candidate_id, score
+    if best_id is None or best < threshold:
+        return None, best
+    return db.get(Application, best_id), best
@@ -1,180 +1,270 @@
-import openai
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Dict
+from typing import Dict, List, Tuple
 from ..config import settings
+from ..database import SessionLocal, release_connection
+from ..executors import run
+from ..metrics import registry
 from .. import models
+from .gateway import Priority, chat_completion
 from .email_service import send_email
 import logging
 import re
 
 logger = logging.getLogger(__name__)
-openai.api_key = settings.openai_api_key
 
+EMAILS_GENERATED = registry.counter(
+    "emails_generated_total", "Candidate emails produced, by how the text was obtained", ("mode",)
+)
 
-def generate_and_send_email(
-    application_id: int,
-    email_type: str,
-    db: Session,
-    hiring_manager_id: int,
-    send_immediately: bool = True,
-) -> Dict[str, str]:
-    """
-    Generate email and send it.
-    email_type: "rejection", "shortlist", "interview"
-    """
-
-    # Get application and related data
-    app = db.get(models.Application, application_id)
-    if not app:
-        return {"error": "Application not found"}
-
-    applicant = db.get(models.User, app.applicant_id)
-    job = db.get(models.Job, app.job_id)
-    manager = db.get(models.User, hiring_manager_id)
+COMPANY_NAME = "HireChat"
 
-    if not applicant or not job:
-        return {"error": "Applicant or job not found"}
+# Bump whenever the template prompt changes so stored templates get regenerated
+TEMPLATE_PROMPT_VERSION = 1
 
-    context = {
-        "applicant_name": applicant.full_name,
-        "job_title": job.title,
-        "company_name": "HireChat",
-        "manager_name": manager.full_name if manager else "Hiring Team",
-        "ai_score": app.ai_score if app.ai_score else 0,
-        "ai_summary": app.ai_summary or "No summary available",
-        "ai_reasoning": app.ai_reasoning or "No reasoning available",
-    }
+PLACEHOLDER_PATTERN = re.compile(r"\{(applicant_name|job_title|company_name)\}")
 
-    prompts = {
-        "rejection": f"""You are an expert HR professional writing a concise, empathetic rejection email.
+SYSTEM_PROMPT = "You are an expert HR professional writing concise, professional recruiting emails."
 
-Candidate: {context['applicant_name']}
-Position: {context['job_title']}
-Company: {context['company_name']}
-AI score: {context['ai_score']}/100
-AI reasoning: {context['ai_reasoning']}
-
-Write an email that:
-- Thanks them for applying.
+EMAIL_TYPES = {
+    "rejection": (
+        "a concise, empathetic rejection email",
+        """- Thanks them for applying.
 - States that we are moving forward with other candidates.
 - Encourages them to consider future roles if appropriate.
-- Is warm, respectful, and to the point.
+- Is warm, respectful, and to the point.""",
+    ),
+    "shortlist": (
+        "a shortlist notification email",
+        """- Congratulates the candidate on being shortlisted.
+- Explains that they are moving to the next stage.
+- Asks for their availability for an interview.
+- Is professional and positive.""",
+    ),
+    "interview": (
+        "an interview invitation email",
+        """- Clearly invites the candidate to an interview for the role.
+- States that the interview will be held virtually and last around one hour.
+- Asks them to reply with their availability instead of using a hard-coded date/time.
+- Is clear, respectful and professional.""",
+    ),
+}
 
-Important formatting rules:
+FORMAT_RULES = """Important formatting rules:
 - Do NOT start with any greeting (no "Hi", "Hello", "Dear").
 - Do NOT include the candidate name in a greeting.
 - Do NOT include any closing signature (no names, roles, "Best regards", etc.).
 - Do NOT use placeholders like "[insert date and time]" or "[Your Name]" or "[Your Position]".
 
+Use neutral wording such as "at a time that works for you" instead of placeholders.
+
 Output format:
 Line 1: Subject: <subject text>
 Line 2 onwards: email body only, no greeting and no signature.
-""",
+"""
+
+
+def _resolve_type(email_type: str) -> str:
+    return email_type if email_type in EMAIL_TYPES else "shortlist"
+
 
-        "shortlist": f"""You are an expert HR professional writing a shortlist notification email.
+def _personalized_prompt(email_type: str, context: Dict, tone: str) -> str:
+    description, goals = EMAIL_TYPES[email_type]
+    details = ""
+    if email_type == "rejection":
+        details = f"AI score: {context['ai_score']}/100\nAI reasoning: {context['ai_reasoning']}\n"
+    elif email_type == "shortlist":
+        details = f"AI score: {context['ai_score']}/100\nAI summary: {context['ai_summary']}\n"
+    return f"""You are an expert HR professional writing {description}.
 
 Candidate: {context['applicant_name']}
 Position: {context['job_title']}
 Company: {context['company_name']}
-AI score: {context['ai_score']}/100
-AI summary: {context['ai_summary']}
+{details}Tone: {tone}
 
 Write an email that:
-- Congratulates the candidate on being shortlisted.
-- Explains that they are moving to the next stage.
-- Asks for their availability for an interview.
-- Is professional and positive.
+{goals}
 
-Important formatting rules:
-- Do NOT start with any greeting (no "Hi", "Hello", "Dear").
-- Do NOT include the candidate name in a greeting.
-- Do NOT include any closing signature (no names, roles, "Best regards", etc.).
-- Do NOT use placeholders like "[insert date and time]" or "[Your Name]" or "[Your Position]".
+{FORMAT_RULES}"""
 
-Output format:
-Line 1: Subject: <subject text>
-Line 2 onwards: email body only, no greeting and no signature.
-""",
 
-        "interview": f"""You are an expert HR professional writing an interview invitation email.
+def _template_prompt(email_type: str, job: models.Job, tone: str) -> str:
+    description, goals = EMAIL_TYPES[email_type]
+    return f"""You are an expert HR professional writing {description} template
+that will be sent to many candidates for the same position.
 
-Candidate: {context['applicant_name']}
-Position: {context['job_title']}
-Company: {context['company_name']}
+Position: {job.title}
+Company: {COMPANY_NAME}
+Tone: {tone}
 
 Write an email that:
-- Clearly invites the candidate to an interview for the role.
-- States that the interview will be held virtually and last around one hour.
-- Asks them to reply with their availability instead of using a hard-coded date/time.
-- Is clear, respectful and professional.
+{goals}
 
-Important formatting rules:
-- Do NOT start with any greeting (no "Hi", "Hello", "Dear").
-- Do NOT include the candidate name in a greeting.
-- Do NOT include any closing signature (no names, roles, "Best regards", etc.).
-- Do NOT use placeholders like "[insert date and time]" or similar.
-- Do NOT use placeholders like "[Your Name]" or "[Your Position]".
+The text is reused for every candidate, so do not mention anything specific to
+one candidate. Where needed, write these placeholders literally and they will be
+filled in per candidate: {{applicant_name}}, {{job_title}}, {{company_name}}.
+Do not use any other placeholders.
 
-Use neutral wording such as "at a time that works for you" instead of placeholders.
+{FORMAT_RULES}"""
 
-Output format:
-Line 1: Subject: <subject text>
-Line 2 onwards: email body only, no greeting and no signature.
-""",
-    }
 
-    prompt = prompts.get(email_type, prompts["shortlist"])
+def _parse_email(content: str, fallback_subject: str) -> Tuple[str, str]:
+    """Split a model reply into its "Subject:" line and the body"""
+    lines = [l for l in content.split("\n") if l.strip() != ""]
+    subject = ""
+    body_lines = []
 
-    try:
-        logger.info(f"Generating {email_type} email for application {application_id}")
-
-        response = openai.chat.completions.create(
-            model=settings.openai_model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert HR professional writing concise, professional recruiting emails.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.7,
-        )
+    for i, line in enumerate(lines):
+        if line.lower().startswith("subject:"):
+            subject = line.split(":", 1)[1].strip()
+            body_lines = lines[i + 1 :]
+            break
+
+    body = "\n".join(body_lines).strip() or content.strip()
+    return subject or fallback_subject, body
+
+
+def _clean_body(body: str, applicant_name: str) -> str:
+    # Hard cleanup of placeholders and stray template bits
+    # remove [insert ...], [Your Name], [Your Position], etc.
+    body = re.sub(r"\[.*?date.*?\]", "", body, flags=re.IGNORECASE)
+    body = re.sub(r"\[.*?time.*?\]", "", body, flags=re.IGNORECASE)
+    body = re.sub(r"\[.*?your name.*?\]", "", body, flags=re.IGNORECASE)
+    body = re.sub(r"\[.*?your position.*?\]", "", body, flags=re.IGNORECASE)
+
+    # Remove explicit "Hi <name>" / "Dear <name>" if model ignored the rules
+    for prefix in ("Hi", "Hello", "Dear"):
+        pattern = rf"^{prefix}\s+{re.escape(applicant_name)}[,\s]*"
+        body = re.sub(pattern, "", body, flags=re.IGNORECASE).strip()
 
-        content = response.choices[0].message.content or ""
+    # Also trim generic "Hi," / "Hello," / "Dear,"
+    body = re.sub(r"^(Hi|Hello|Dear)[,\s]+\n?", "", body, flags=re.IGNORECASE).strip()
 
-        # Parse "Subject:" and body
-        lines = [l for l in content.split("\n") if l.strip() != ""]
-        subject = ""
-        body_lines = []
+    # Collapse multiple blank lines
+    return re.sub(r"\n\s*\n\s*\n+", "\n\n", body).strip()
 
-        for i, line in enumerate(lines):
-            if line.lower().startswith("subject:"):
-                subject = line.split(":", 1)[1].strip()
-                body_lines = lines[i + 1 :]
-                break
 
-        if not subject:
-            subject = f"Update on your application for {job.title}"
+def render_template(text: str, values: Dict[str, str]) -> str:
+    """Fill the known {placeholders}; any other braces are left alone"""
+    return PLACEHOLDER_PATTERN.sub(lambda m: values[m.group(1)], text)
 
-        body = "\n".join(body_lines).strip() or content.strip()
 
-        # Hard cleanup of placeholders and stray template bits
-        # remove [insert ...], [Your Name], [Your Position], etc.
-        body = re.sub(r"\[.*?date.*?\]", "", body, flags=re.IGNORECASE)
-        body = re.sub(r"\[.*?time.*?\]", "", body, flags=re.IGNORECASE)
-        body = re.sub(r"\[.*?your name.*?\]", "", body, flags=re.IGNORECASE)
-        body = re.sub(r"\[.*?your position.*?\]", "", body, flags=re.IGNORECASE)
+def _complete(prompt: str) -> str:
+    response = chat_completion(
+        priority=Priority.NORMAL,
+        caller="email_agent",
+        model=settings.openai_model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.7,
+    )
+    return response.choices[0].message.content or ""
 
-        # Remove explicit "Hi <name>" / "Dear <name>" if model ignored the rules
-        for prefix in ("Hi", "Hello", "Dear"):
-            pattern = rf"^{prefix}\s+{re.escape(context['applicant_name'])}[,\s]*"
-            body = re.sub(pattern, "", body, flags=re.IGNORECASE).strip()
 
-        # Also trim generic "Hi," / "Hello," / "Dear,"
-        body = re.sub(r"^(Hi|Hello|Dear)[,\s]+\n?", "", body, flags=re.IGNORECASE).strip()
+def get_email_template(db: Session, job: models.Job, email_type: str, tone: str) -> Tuple[models.EmailTemplate, bool]:
+    """
+    Stored template for (job, email_type, tone), generated on first use and
+    whenever the job or the template prompt has changed since.
+    Returns the template and whether it was just generated.
+    No connection is held while the model writes the template.
+    """
+    key = (
+        models.EmailTemplate.job_id == job.id,
+        models.EmailTemplate.email_type == email_type,
+        models.EmailTemplate.tone == tone,
+    )
+    template = db.execute(select(models.EmailTemplate).where(*key)).scalar_one_or_none()
+    if template is not None and template.job_version == job.version \
+            and template.prompt_version == TEMPLATE_PROMPT_VERSION:
+        return template, False
+
+    logger.info(f"Generating {email_type}/{tone} email template for job {job.id}")
+    release_connection(db)
+    subject, body = _parse_email(
+        _complete(_template_prompt(email_type, job, tone)),
+        "Update on your application for {job_title}",
+    )
+    body = _clean_body(body, "{applicant_name}")
+
+    if template is None:
+        template = models.EmailTemplate(job_id=job.id, email_type=email_type, tone=tone)
+        db.add(template)
+    template.subject = subject
+    template.body = body
+    template.job_version = job.version
+    template.prompt_version = TEMPLATE_PROMPT_VERSION
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request stored the same template first; use theirs
+        db.rollback()
+        template = db.execute(select(models.EmailTemplate).where(*key)).scalar_one()
+    return template, True
 
-        # Collapse multiple blank lines
-        body = re.sub(r"\n\s*\n\s*\n+", "\n\n", body).strip()
+
+def draft_email(
+    application_id: int,
+    email_type: str,
+    db: Session,
+    hiring_manager_id: int,
+    tone: str = "professional",
+    personalized: bool = False,
+) -> Dict[str, str]:
+    """
+    Generate an email and save it as an unsent draft.
+    email_type: "rejection", "shortlist", "interview"
+    By default the text comes from the job's stored template with the
+    candidate's details substituted in; personalized=True writes a fresh
+    email from this candidate's AI analysis instead (one LLM call each).
+    """
+
+    # Get application and related data
+    app = db.get(models.Application, application_id)
+    if not app:
+        return {"error": "Application not found"}
+
+    applicant = db.get(models.User, app.applicant_id)
+    job = db.get(models.Job, app.job_id)
+    manager = db.get(models.User, hiring_manager_id)
+
+    if not applicant or not job:
+        return {"error": "Applicant or job not found"}
+
+    context = {
+        "applicant_name": applicant.full_name,
+        "job_title": job.title,
+        "company_name": COMPANY_NAME,
+        "manager_name": manager.full_name if manager else "Hiring Team",
+        "ai_score": app.ai_score if app.ai_score else 0,
+        "ai_summary": app.ai_summary or "No summary available",
+        "ai_reasoning": app.ai_reasoning or "No reasoning available",
+    }
+    template_type = _resolve_type(email_type)
+    tone = tone.strip().lower() or "professional"
+    recipient_email = applicant.email
+
+    try:
+        if personalized:
+            release_connection(db)
+            logger.info(f"Generating {email_type} email for application {application_id}")
+            subject, body = _parse_email(
+                _complete(_personalized_prompt(template_type, context, tone)),
+                f"Update on your application for {job.title}",
+            )
+            mode = "personalized"
+            template_id = None
+        else:
+            template, generated = get_email_template(db, job, template_type, tone)
+            subject = render_template(template.subject, context)
+            body = render_template(template.body, context)
+            mode = "template_generated" if generated else "template_cached"
+            template_id = template.id
+        EMAILS_GENERATED.inc(mode)
+
+        body = _clean_body(body, context["applicant_name"])
 
         # Save draft
         draft = models.EmailDraft(
@@ -186,36 +276,121 @@ Line 2 onwards: email body only, no greeting and no signature.
             sent=False,
         )
         db.add(draft)
-        db.commit()
-        db.refresh(draft)
-
-        email_result: Dict[str, str] = {"success": False}
-        if send_immediately:
-            logger.info(f"Sending email to {applicant.email}")
-            email_result = send_email(
-                to_email=applicant.email,
-                to_name=applicant.full_name,
-                subject=subject,
-                body=body,
-            )
-
-            if email_result.get("success"):
-                draft.sent = True
-                db.commit()
-                logger.info(f"Email sent successfully to {applicant.email}")
+        release_connection(db)
 
         return {
             "draft_id": draft.id,
             "subject": subject,
             "body": body,
             "email_type": email_type,
+            "mode": mode,
+            "template_id": template_id,
+            "email_sent": False,
+            "recipient_email": recipient_email,
+            "message": "Failed: Not sent",
+        }
+
+    except Exception as e:
+        logger.error(f"Error generating email: {e}")
+        return {"error": f"Failed to generate/send email: {str(e)}"}
+
+
+def send_draft(db: Session, result: Dict[str, str]) -> Dict[str, str]:
+    """
+    Send a draft returned by draft_email and mark it sent.
+    Makes no LLM calls, so it can run in the "email" pool on its own.
+    """
+    draft = db.get(models.EmailDraft, result["draft_id"])
+    app = db.get(models.Application, draft.application_id)
+    applicant = db.get(models.User, app.applicant_id)
+    recipient_name = applicant.full_name
+    # No connection is held during the SMTP round trip
+    release_connection(db)
+
+    try:
+        logger.info(f"Sending email to {result['recipient_email']}")
+        email_result = send_email(
+            to_email=result["recipient_email"],
+            to_name=recipient_name,
+            subject=result["subject"],
+            body=result["body"],
+        )
+
+        if email_result.get("success"):
+            draft.sent = True
+            release_connection(db)
+            logger.info(f"Email sent successfully to {result['recipient_email']}")
+
+        return {
+            **result,
             "email_sent": email_result.get("success", False),
-            "recipient_email": applicant.email,
             "message": "Email sent successfully!"
             if email_result.get("success")
             else f"Failed: {email_result.get('error', 'Not sent')}",
         }
 
     except Exception as e:
-        logger.error(f"Error generating/sending email: {e}")
+        logger.error(f"Error sending email: {e}")
         return {"error": f"Failed to generate/send email: {str(e)}"}
+
+
+def generate_and_send_email(
+    application_id: int,
+    email_type: str,
+    db: Session,
+    hiring_manager_id: int,
+    send_immediately: bool = True,
+    tone: str = "professional",
+    personalized: bool = False,
+) -> Dict[str, str]:
+    """
+    Generate email and send it (draft_email, then send_draft) in one thread.
+    Request handlers run the two steps in the "llm" and "email" pools instead.
+    """
+    result = draft_email(application_id, email_type, db, hiring_manager_id, tone=tone, personalized=personalized)
+    if send_immediately and "error" not in result:
+        result = send_draft(db, result)
+    return result
+
+
+def prepare_status_templates(application_ids: List[int], email_type: str) -> None:
+    """Make sure every job in a status batch has a current template (LLM calls, if any)"""
+    db = SessionLocal()
+    try:
+        job_ids = db.execute(
+            select(models.Application.job_id).where(models.Application.id.in_(application_ids)).distinct()
+        ).scalars().all()
+        for job in db.execute(select(models.Job).where(models.Job.id.in_(job_ids))).scalars():
+            get_email_template(db, job, _resolve_type(email_type), "professional")
+    finally:
+        db.close()
+
+
+async def send_status_emails(application_ids: List[int], email_type: str, hiring_manager_id: int) -> None:
+    """
+    Follow-up for bulk status changes, run after the response is sent.
+    Templates are generated in the "llm" pool first, so the sends in the
+    "email" pool only render cached templates and never wait on the LLM.
+    """
+    try:
+        await run("llm", prepare_status_templates, application_ids, email_type)
+    except Exception as e:
+        # Each email retries the template itself and reports its own failure
+        logger.warning(f"Preparing {email_type} templates failed: {e}")
+    await run("email", _send_status_emails, application_ids, email_type, hiring_manager_id)
+
+
+def _send_status_emails(application_ids: List[int], email_type: str, hiring_manager_id: int) -> None:
+    """Uses the job's template, so a whole batch costs one LLM call per job"""
+    db = SessionLocal()
+    try:
+        sent = 0
+        for application_id in application_ids:
+            result = generate_and_send_email(application_id, email_type, db, hiring_manager_id)
+            if result.get("email_sent"):
+                sent += 1
+            elif "error" in result:
+                logger.warning(f"Status email for application {application_id} failed: {result['error']}")
+        logger.info(f"Sent {sent}/{len(application_ids)} {email_type} emails")
+    finally:
+        db.close()
@@ -0,0 +1,227 @@
+"""
+Gateway for outbound chat completions.
+
+Every LLM call goes through chat_completion(), which:
+- coalesces identical in-flight requests into one upstream call (singleflight)
+- admits calls by priority, so interactive chat is served before batch work
+- bounds concurrency with an AIMD window that shrinks on 429s and slow
+  responses and grows back while calls succeed
+- paces requests and tokens per minute with token buckets
+"""
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Any, Dict, List
+
+from ..config import settings
+from ..metrics import registry
+from .client import get_openai_client
+
+logger = logging.getLogger(__name__)
+
+LLM_CALLS = registry.counter("llm_calls_total", "Upstream LLM calls", ("caller", "outcome"))
+LLM_COALESCED = registry.counter(
+    "llm_coalesced_total", "Requests served by an identical in-flight call", ("caller",)
+)
+LLM_LATENCY = registry.histogram("llm_call_duration_seconds", "Upstream LLM call latency", ("caller",))
+LLM_QUEUE_WAIT = registry.histogram(
+    "llm_queue_wait_seconds", "Time waiting for an LLM concurrency slot", ("priority",)
+)
+LLM_PROMPT_TOKENS = registry.histogram(
+    "llm_prompt_tokens", "Prompt tokens per upstream call", ("caller",),
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000),
+)
+LLM_WINDOW = registry.gauge("llm_concurrency_limit", "Current adaptive LLM concurrency window")
+LLM_IN_FLIGHT = registry.gauge("llm_in_flight", "LLM calls currently in flight")
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    NORMAL = 1
+    BATCH = 2
+
+
+class GatewayTimeout(Exception):
+    """No LLM capacity became available within the queue timeout"""
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute, holding at most one minute's worth"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` now (possibly going negative) and return how long to wait"""
+        amount = min(amount, self.capacity)
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """Correct a reservation once the real usage is known"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency window with a priority-ordered wait queue"""
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float, backoff: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        LLM_WINDOW.set(value=self.limit)
+
+    def acquire(self, priority: Priority, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        entry = (int(priority), next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while not (self._waiters[0] == entry and self.in_flight < int(self.limit)):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise GatewayTimeout("Timed out waiting for LLM capacity")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+            self.in_flight += 1
+            LLM_IN_FLIGHT.set(value=self.in_flight)
+
+    def release(self, latency: float | None, overloaded: bool) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if overloaded or (latency is not None and latency > self.latency_target):
+                self.limit = max(self.minimum, self.limit * self.backoff)
+            elif latency is not None:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            LLM_WINDOW.set(value=self.limit)
+            LLM_IN_FLIGHT.set(value=self.in_flight)
+            self._cond.notify_all()
+
+
+_limiter = AdaptiveLimiter(
+    initial=settings.llm_initial_concurrency,
+    minimum=settings.llm_min_concurrency,
+    maximum=settings.llm_max_concurrency,
+    latency_target=settings.llm_latency_target_s,
+)
+_request_bucket = TokenBucket(settings.llm_requests_per_minute)
+_token_bucket = TokenBucket(settings.llm_tokens_per_minute)
+
+_in_flight: Dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+
+
+def _request_key(params: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _estimate_tokens(params: Dict[str, Any]) -> int:
+    # ~4 characters per token is close enough for pacing
+    prompt_chars = sum(len(str(m.get("content") or "")) for m in params.get("messages", []))
+    return prompt_chars // 4 + (params.get("max_tokens") or 500)
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    return _is_rate_limit(error) or (status is not None and status >= 500) or type(error).__name__ in (
+        "APIConnectionError", "APITimeoutError",
+    )
+
+
+def _call_upstream(params: Dict[str, Any], priority: Priority, caller: str):
+    estimate = _estimate_tokens(params)
+    attempt = 0
+    while True:
+        wait_start = time.monotonic()
+        _limiter.acquire(priority, settings.llm_queue_timeout_s)
+        LLM_QUEUE_WAIT.observe(priority.name.lower(), value=time.monotonic() - wait_start)
+
+        latency, overloaded = None, False
+        try:
+            pause = max(_request_bucket.reserve(1), _token_bucket.reserve(estimate))
+            if pause:
+                time.sleep(pause)
+            start = time.monotonic()
+            response = get_openai_client().chat.completions.create(**params)
+            latency = time.monotonic() - start
+            LLM_LATENCY.observe(caller, value=latency)
+            LLM_CALLS.inc(caller, "ok")
+            usage = getattr(response, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                _token_bucket.adjust(usage.total_tokens - estimate)
+            prompt_tokens = getattr(usage, "prompt_tokens", None) if usage is not None else None
+            LLM_PROMPT_TOKENS.observe(caller, value=prompt_tokens or estimate - (params.get("max_tokens") or 500))
+            return response
+        except Exception as error:
+            overloaded = _is_rate_limit(error)
+            LLM_CALLS.inc(caller, "rate_limited" if overloaded else "error")
+            if attempt >= settings.llm_max_retries or not _is_retryable(error):
+                raise
+        finally:
+            _limiter.release(latency, overloaded)
+
+        attempt += 1
+        backoff = min(30.0, 0.5 * 2 ** attempt)
+        logger.warning("LLM call from %s failed (attempt %d), retrying in %.1fs", caller, attempt, backoff)
+        time.sleep(backoff)
+
+
+def chat_completion(*, priority: Priority = Priority.NORMAL, caller: str = "default", **params):
+    """
+    Drop-in for client.chat.completions.create(**params).
+    Identical concurrent calls share one upstream request and its result.
+    """
+    key = _request_key(params)
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = _in_flight[key] = Future()
+
+    if not leader:
+        LLM_COALESCED.inc(caller)
+        return future.result()
+
+    try:
+        response = _call_upstream(params, priority, caller)
+    except BaseException as error:
+        future.set_exception(error)
+        raise
+    else:
+        future.set_result(response)
+        return response
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
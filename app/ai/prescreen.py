@@ -0,0 +1,234 @@
+"""
+Local first-stage CV screening.
+
+Before a CV goes to the LLM it gets a provisional 0-100 score from two cheap
+signals against the job description:
+- cosine similarity of TF-IDF vectors (IDF taken over the job's CVs)
+- coverage of the job's top keywords
+Everything is computed with NumPy over a whole batch at once, as sparse
+(document, term, count) triples, so a job's applications score in
+milliseconds. Only CVs scoring at least settings.prescreen_llm_threshold
+are sent to the LLM; in shadow mode every CV is still sent, which is what
+the agreement report needs to tune the threshold.
+
+    python -m app.ai.prescreen report [--job-id N]
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from ..metrics import registry
+
+PRESCREEN_SECONDS = registry.histogram("prescreen_batch_duration_seconds", "Local pre-screen time per batch")
+PRESCREEN_DECISIONS = registry.counter(
+    "prescreen_decisions_total", "Pre-screen outcomes per application", ("decision",)
+)
+
+KEYWORDS_PER_JOB = 25
+# Cosine similarities between a CV and a job ad rarely go above this
+COSINE_SATURATION = 0.35
+CORPUS_SAMPLE = 200
+
+_STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being both but by can could did do does
+doing during each few for from further had has have having he her here hers him his how i if in into
+is it its itself just me more most my no nor not of off on once only or other our ours out over own
+same she should so some such than that the their theirs them then there these they this those through
+to too under until up very was we were what when where which while who whom why will with would you
+your yours role team work working experience years year looking join company candidate candidates
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in re.findall(r"[a-z][a-z0-9+#.]*[a-z0-9+#]|[a-z]", text.casefold())
+            if w not in _STOPWORDS and len(w) > 1]
+
+
+def prescore(job_text: str, cv_texts: Sequence[str], corpus: Sequence[str] = ()) -> List[Dict[str, float]]:
+    """
+    Provisional scores for `cv_texts` against `job_text`. `corpus` adds more
+    of the job's CVs to the IDF statistics when scoring only a few.
+    """
+    import numpy as np  # imported on first use, it is slow to load
+
+    start = time.perf_counter()
+    documents = [job_text, *cv_texts, *corpus]
+    vocabulary: Dict[str, int] = {}
+    doc_ids, term_ids = [], []
+    for doc_id, text in enumerate(documents):
+        for word in tokenize(text):
+            doc_ids.append(doc_id)
+            term_ids.append(vocabulary.setdefault(word, len(vocabulary)))
+    if not cv_texts:
+        return []
+    if not vocabulary:
+        return [{"score": 0.0, "similarity": 0.0, "coverage": 0.0} for _ in cv_texts]
+
+    # Sparse (doc, term) -> count as parallel arrays
+    pairs = np.unique(np.array(doc_ids, dtype=np.int64) * len(vocabulary) + np.array(term_ids), return_counts=True)
+    docs, terms = np.divmod(pairs[0], len(vocabulary))
+    counts = pairs[1].astype(np.float64)
+
+    n_docs = len(documents)
+    document_frequency = np.bincount(terms, minlength=len(vocabulary))
+    idf = np.log((1 + n_docs) / (1 + document_frequency)) + 1.0
+    weights = (1 + np.log(counts)) * idf[terms]
+
+    job_vector = np.zeros(len(vocabulary))
+    job_mask = docs == 0
+    job_vector[terms[job_mask]] = weights[job_mask]
+    job_norm = np.linalg.norm(job_vector) or 1.0
+
+    norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=n_docs))
+    dots = np.bincount(docs, weights=weights * job_vector[terms], minlength=n_docs)
+    similarity = dots / (np.where(norms > 0, norms, 1.0) * job_norm)
+
+    # The job's most distinctive terms, and which of them each CV mentions
+    keywords = np.flatnonzero(job_vector)
+    keywords = keywords[np.argsort(-job_vector[keywords])][:KEYWORDS_PER_JOB]
+    is_keyword = np.zeros(len(vocabulary), dtype=bool)
+    is_keyword[keywords] = True
+    coverage = np.bincount(docs, weights=is_keyword[terms].astype(np.float64), minlength=n_docs) / max(len(keywords), 1)
+
+    n_cvs = len(cv_texts)
+    similarity = similarity[1:1 + n_cvs]
+    coverage = coverage[1:1 + n_cvs]
+    scores = 100 * (0.5 * np.minimum(similarity / COSINE_SATURATION, 1.0) + 0.5 * coverage)
+    PRESCREEN_SECONDS.observe(value=time.perf_counter() - start)
+    return [
+        {"score": round(float(s), 1), "similarity": round(float(sim), 4), "coverage": round(float(c), 3)}
+        for s, sim, c in zip(scores, similarity, coverage)
+    ]
+
+
+def corpus_for_job(db: Session, job_id: int, exclude_id: Optional[int] = None) -> List[str]:
+    """A sample of the job's already parsed CVs, for IDF when scoring one CV"""
+    Application = models.Application
+    stmt = (
+        select(Application.cv_parsed_text)
+        .where(Application.job_id == job_id, Application.cv_parsed_text.is_not(None))
+        .order_by(Application.id.desc())
+        .limit(CORPUS_SAMPLE)
+    )
+    if exclude_id is not None:
+        stmt = stmt.where(Application.id != exclude_id)
+    return [text for text in db.execute(stmt).scalars() if text]
+
+
+def job_text(job: models.Job) -> str:
+    return f"{job.title}\n{job.title}\n{job.description}"
+
+
+def in_ambiguous_band(score: float, threshold: Optional[float] = None) -> bool:
+    """Just below the threshold, within settings.prescreen_ambiguous_margin of it"""
+    threshold = settings.prescreen_llm_threshold if threshold is None else threshold
+    return threshold - settings.prescreen_ambiguous_margin <= score < threshold
+
+
+def prescreen_decision(score: float) -> str:
+    """One of: llm, ambiguous (both go to the LLM), shadow (goes only because of shadow mode), skipped"""
+    if score >= settings.prescreen_llm_threshold:
+        return "llm"
+    if in_ambiguous_band(score):
+        return "ambiguous"
+    return "shadow" if settings.prescreen_shadow else "skipped"
+
+
+def should_send_to_llm(score: float) -> bool:
+    return prescreen_decision(score) != "skipped"
+
+
+def provisional_analysis(result: Dict[str, float]) -> Dict:
+    """Stored for CVs the LLM doesn't see; a manager can still request a full analysis"""
+    return {
+        "score": result["score"],
+        "summary": "Not analyzed in detail: low match with the job description in local pre-screening.",
+        "recommendation": "reject",
+        "reasoning": (
+            f"Pre-screen score {result['score']:.0f}/100 is below the LLM threshold "
+            f"({settings.prescreen_llm_threshold:.0f}): text similarity {result['similarity']:.2f}, "
+            f"{result['coverage']:.0%} of the job's keywords found."
+        ),
+        "skills": [],
+    }
+
+
+def agreement_report(db: Session, job_id: Optional[int] = None, llm_good_score: float = 60.0) -> dict:
+    """
+    Compare pre-screen scores with LLM scores for applications that have both,
+    and show what each candidate threshold (with the ambiguous band below it
+    still going to the LLM) would have skipped and missed.
+    """
+    import numpy as np
+
+    Application = models.Application
+    stmt = select(Application.prescreen_score, Application.ai_score).where(
+        Application.prescreen_score.is_not(None),
+        Application.ai_score.is_not(None),
+        Application.ai_analysis_source == "llm",
+    )
+    if job_id is not None:
+        stmt = stmt.where(Application.job_id == job_id)
+    rows = db.execute(stmt).all()
+    report = {
+        "applications": len(rows),
+        "current_threshold": settings.prescreen_llm_threshold,
+        "ambiguous_margin": settings.prescreen_ambiguous_margin,
+        "shadow_mode": settings.prescreen_shadow,
+        "llm_good_score": llm_good_score,
+    }
+    if len(rows) < 2:
+        return report
+
+    pre = np.array([r[0] for r in rows], dtype=float)
+    llm = np.array([r[1] for r in rows], dtype=float)
+    good = llm >= llm_good_score
+    margin = settings.prescreen_ambiguous_margin
+    report["correlation"] = round(float(np.corrcoef(pre, llm)[0, 1]), 3) if pre.std() and llm.std() else None
+    report["thresholds"] = []
+    # Same rule as prescreen_decision, with the band moving along with each threshold
+    for threshold in range(0, 65, 5):
+        band = (pre >= threshold - margin) & (pre < threshold)
+        skipped = pre < threshold - margin
+        report["thresholds"].append({
+            "threshold": threshold,
+            "ambiguous_band": [threshold - margin, threshold],
+            "llm_calls_saved": round(float(skipped.mean()), 3),
+            "ambiguous_share": round(float(band.mean()), 3),
+            # Good candidates the band sent to the LLM that the threshold alone would have skipped
+            "good_candidates_rescued": int((good & band).sum()),
+            "good_candidates_missed": int((good & skipped).sum()),
+            "recall_of_good": round(float((good & ~skipped).sum() / good.sum()), 3) if good.any() else None,
+        })
+    return report
+
+
+def main(argv=None) -> None:
+    from ..database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Pre-screen vs LLM agreement")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="agreement and per-threshold trade-off")
+    report.add_argument("--job-id", type=int)
+    report.add_argument("--good-score", type=float, default=60.0, help="LLM score that counts as a good candidate")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        result = agreement_report(db, args.job_id, args.good_score)
+    finally:
+        db.close()
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
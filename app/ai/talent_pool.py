@@ -0,0 +1,290 @@
+"""
+Talent pool: rank a hiring manager's past candidates' CVs against a job.
+
+Each parsed CV is turned into a fixed-size vector (signed feature hashing of
+its words, sublinear term frequency, L2-normalized), quantized to int8 with
+one float32 scale, and stored in cv_vectors when the CV is analyzed. Every
+worker keeps all vectors in one in-memory int8 matrix (about 0.5 KB per CV),
+refreshed incrementally from rows it hasn't seen yet, so ranking a job is a
+single chunked matrix-vector product. Each row also remembers its job, and
+a ranking only considers CVs sent to the requesting manager's own jobs
+(live or archived), like every other manager endpoint.
+
+    python -m app.ai.talent_pool backfill   # vectors for CVs parsed before this existed
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select, union_all
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from ..metrics import registry
+from .prescreen import tokenize
+
+TALENT_POOL_QUERY = registry.histogram("talent_pool_query_duration_seconds", "Talent-pool ranking time")
+TALENT_POOL_VECTORS = registry.gauge("talent_pool_vectors", "CV vectors held in this worker's index")
+
+# Candidates considered per applicant-deduplication pass, as a multiple of k
+OVERSAMPLE = 5
+# Rows converted to float32 at a time while scoring
+SCORE_CHUNK = 4096
+BACKFILL_BATCH = 1000
+
+
+def embed(text: str, dimensions: Optional[int] = None):
+    """Signed hashed term-frequency vector, L2-normalized (float32)"""
+    import numpy as np  # imported on first use, it is slow to load
+
+    dimensions = dimensions or settings.talent_pool_dimensions
+    counts: Dict[int, int] = {}
+    for word in tokenize(text):
+        h = zlib.crc32(word.encode())
+        counts[h] = counts.get(h, 0) + 1
+    vector = np.zeros(dimensions, dtype=np.float32)
+    if not counts:
+        return vector
+    hashes = np.fromiter(counts.keys(), dtype=np.uint64, count=len(counts))
+    weights = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    signs = np.where((hashes >> np.uint64(31)) & np.uint64(1), -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, (hashes % np.uint64(dimensions)).astype(np.int64), weights * signs)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def pack(vector) -> bytes:
+    """float32 scale followed by the int8-quantized components"""
+    import numpy as np
+
+    scale = float(np.abs(vector).max()) / 127 or 1.0
+    return np.float32(scale).tobytes() + np.round(vector / scale).astype(np.int8).tobytes()
+
+
+def index_cv(db: Session, application_id: int, applicant_id: int, cv_text: str) -> None:
+    """Store (or replace) an application's CV vector in the caller's transaction"""
+    db.execute(delete(models.CvVector).where(models.CvVector.application_id == application_id))
+    db.execute(insert(models.CvVector).values(
+        application_id=application_id, applicant_id=applicant_id, vector=pack(embed(cv_text)),
+    ))
+
+
+class TalentPoolIndex:
+    """All CV vectors of this worker as one matrix, with row -> application/applicant/job ids"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.dimensions = settings.talent_pool_dimensions
+        self.last_id = 0
+        self.size = 0
+        self.matrix = None
+        self.scales = None
+        self.application_ids = None
+        self.applicant_ids = None
+        self.job_ids = None
+        self.rows: Dict[int, int] = {}  # application id -> row
+
+    def _grow(self, needed: int) -> None:
+        import numpy as np
+
+        capacity = 0 if self.matrix is None else len(self.matrix)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        matrix = np.zeros((capacity, self.dimensions), dtype=np.int8)
+        scales = np.zeros(capacity, dtype=np.float32)
+        application_ids = np.zeros(capacity, dtype=np.int64)
+        applicant_ids = np.zeros(capacity, dtype=np.int64)
+        job_ids = np.zeros(capacity, dtype=np.int64)
+        if self.matrix is not None:
+            matrix[:self.size] = self.matrix[:self.size]
+            scales[:self.size] = self.scales[:self.size]
+            application_ids[:self.size] = self.application_ids[:self.size]
+            applicant_ids[:self.size] = self.applicant_ids[:self.size]
+            job_ids[:self.size] = self.job_ids[:self.size]
+        self.matrix, self.scales = matrix, scales
+        self.application_ids, self.applicant_ids, self.job_ids = application_ids, applicant_ids, job_ids
+
+    def refresh(self, db: Session) -> int:
+        """Load vectors stored since the last refresh; returns how many"""
+        import numpy as np
+
+        live, archived = models.Application.__table__, models.archived_applications
+        with self.lock:
+            loaded = 0
+            # The application is live or archived; either way it keeps its job
+            result = db.execute(
+                select(models.CvVector.id, models.CvVector.application_id,
+                       models.CvVector.applicant_id, models.CvVector.vector,
+                       func.coalesce(live.c.job_id, archived.c.job_id, 0))
+                .outerjoin(live, live.c.id == models.CvVector.application_id)
+                .outerjoin(archived, archived.c.id == models.CvVector.application_id)
+                .where(models.CvVector.id > self.last_id)
+                .order_by(models.CvVector.id)
+                .execution_options(yield_per=BACKFILL_BATCH * 10)
+            )
+            for rows in result.partitions():
+                self._grow(self.size + len(rows))
+                for vector_id, application_id, applicant_id, blob, job_id in rows:
+                    row = self.rows.get(application_id)
+                    if row is None:
+                        row = self.rows[application_id] = self.size
+                        self.size += 1
+                    self.scales[row] = np.frombuffer(blob, dtype=np.float32, count=1)[0]
+                    self.matrix[row] = np.frombuffer(blob, dtype=np.int8, offset=4)
+                    self.application_ids[row] = application_id
+                    self.applicant_ids[row] = applicant_id
+                    self.job_ids[row] = job_id
+                    self.last_id = vector_id
+                loaded += len(rows)
+            TALENT_POOL_VECTORS.set(value=self.size)
+            return loaded
+
+    def top_k(self, job_vector, k: int, job_ids, exclude_applicants=()) -> List[tuple]:
+        """Best (application_id, applicant_id, score) per applicant among applications to job_ids, highest first"""
+        import numpy as np
+
+        with self.lock:
+            if not self.size:
+                return []
+            scores = np.empty(self.size, dtype=np.float32)
+            for start in range(0, self.size, SCORE_CHUNK):
+                end = min(start + SCORE_CHUNK, self.size)
+                scores[start:end] = self.matrix[start:end].astype(np.float32) @ job_vector
+            scores *= self.scales[:self.size]
+            # Nothing in common with the job at all
+            scores[scores <= 0] = -np.inf
+            scores[~np.isin(self.job_ids[:self.size], np.fromiter(job_ids, dtype=np.int64))] = -np.inf
+            if exclude_applicants:
+                scores[np.isin(self.applicant_ids[:self.size], np.fromiter(exclude_applicants, dtype=np.int64))] = -np.inf
+            wanted = min(self.size, k * OVERSAMPLE)
+            while True:
+                top = np.argpartition(-scores, wanted - 1)[:wanted]
+                top = top[np.argsort(-scores[top])]
+                picked, seen = [], set()
+                for row in top:
+                    applicant_id = int(self.applicant_ids[row])
+                    if not np.isfinite(scores[row]) or applicant_id in seen:
+                        continue
+                    seen.add(applicant_id)
+                    picked.append((int(self.application_ids[row]), applicant_id, float(scores[row])))
+                    if len(picked) == k:
+                        return picked
+                if wanted == self.size:
+                    return picked
+                # Many applications from the same people; look further down
+                wanted = min(self.size, wanted * 4)
+
+
+_index = TalentPoolIndex()
+
+
+def rank_talent_pool(
+    db: Session, job, applications, hiring_manager_id: int, k: int = 20, exclude_applied: bool = True
+) -> List[dict]:
+    """
+    Top-k past candidates for a job (live or archived row, with title and
+    description), one entry per applicant, from applications to the manager's
+    own jobs. `applications` is the table holding the job's own applications,
+    whose applicants are left out.
+    """
+    from .prescreen import job_text
+
+    start = time.perf_counter()
+    _index.refresh(db)
+    excluded = set()
+    if exclude_applied:
+        excluded = set(db.execute(
+            select(applications.c.applicant_id).where(applications.c.job_id == job.id)
+        ).scalars())
+    manager_jobs = set(db.execute(union_all(
+        select(models.Job.id).where(models.Job.hiring_manager_id == hiring_manager_id),
+        select(models.archived_jobs.c.id).where(models.archived_jobs.c.hiring_manager_id == hiring_manager_id),
+    )).scalars())
+    matches = _index.top_k(embed(job_text(job)), k, manager_jobs, excluded)
+    TALENT_POOL_QUERY.observe(value=time.perf_counter() - start)
+    if not matches:
+        return []
+
+    # Details for the handful of winners only, live or archived
+    application_ids = [application_id for application_id, _, _ in matches]
+    details = {}
+    for applications, jobs in (
+        (models.Application.__table__, models.Job.__table__),
+        (models.archived_applications, models.archived_jobs),
+    ):
+        rows = db.execute(
+            select(applications.c.id, applications.c.ai_summary, applications.c.ai_score,
+                   applications.c.job_id, jobs.c.title)
+            .outerjoin(jobs, jobs.c.id == applications.c.job_id)
+            .where(applications.c.id.in_(application_ids))
+        ).all()
+        details.update({row.id: row for row in rows})
+    users = dict(db.execute(
+        select(models.User.id, models.User.full_name).where(
+            models.User.id.in_([applicant_id for _, applicant_id, _ in matches])
+        )
+    ).all())
+
+    results = []
+    for application_id, applicant_id, score in matches:
+        row = details.get(application_id)
+        results.append({
+            "applicant_id": applicant_id,
+            "applicant_name": users.get(applicant_id, "Unknown"),
+            "similarity": round(score, 4),
+            "application_id": application_id,
+            "applied_job_id": row.job_id if row else None,
+            "applied_job_title": row.title if row else None,
+            "ai_score": row.ai_score if row else None,
+            "ai_summary": row.ai_summary if row else None,
+        })
+    return results
+
+
+def backfill(db: Session) -> Dict[str, int]:
+    """Vectors for every parsed CV (live or archived) that doesn't have one yet"""
+    indexed = select(models.CvVector.application_id)
+    sources = [
+        select(t.c.id, t.c.applicant_id, t.c.cv_parsed_text)
+        .where(t.c.cv_parsed_text.is_not(None), t.c.id.not_in(indexed))
+        for t in (models.Application.__table__, models.archived_applications)
+    ]
+    pending = union_all(*sources).subquery()
+    total = 0
+    while True:
+        rows = db.execute(select(pending).order_by(pending.c.id).limit(BACKFILL_BATCH)).all()
+        if not rows:
+            break
+        for application_id, applicant_id, text in rows:
+            index_cv(db, application_id, applicant_id, text)
+        db.commit()
+        total += len(rows)
+    return {"indexed": total, "vectors": db.execute(select(func.count(models.CvVector.id))).scalar()}
+
+
+def main(argv=None) -> None:
+    from ..database import SessionLocal, sync_schema
+
+    parser = argparse.ArgumentParser(description="Talent-pool vector maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("backfill", help="vectorize parsed CVs that have no vector yet")
+    parser.parse_args(argv)
+
+    sync_schema()
+    db = SessionLocal()
+    try:
+        result = backfill(db)
+    finally:
+        db.close()
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
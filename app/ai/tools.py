@@ -0,0 +1,192 @@
+"""
+Read-only query tools for the recruitment assistant.
+
+Each tool takes typed arguments, runs one indexed, manager-scoped SQL query
+and returns a small JSON-serializable result, so the model can answer over
+the full dataset without the data being pasted into the prompt.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, Optional, Type
+
+import orjson
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+
+MAX_ROWS = 25
+
+
+class JobLookupArgs(BaseModel):
+    title_contains: Optional[str] = Field(None, description="Case-insensitive text the job title must contain")
+    status: Optional[str] = Field(None, description='"open" or "closed"')
+    limit: int = Field(10, ge=1, le=MAX_ROWS)
+
+
+class StatusCountArgs(BaseModel):
+    job_id: Optional[int] = Field(None, description="Only count applications for this job")
+    since: Optional[date] = Field(None, description="Only applications created on or after this date")
+
+
+class TopApplicantsArgs(BaseModel):
+    job_id: Optional[int] = Field(None, description="Only applicants for this job; all jobs if omitted")
+    limit: int = Field(5, ge=1, le=MAX_ROWS)
+
+
+class DateRangeArgs(BaseModel):
+    start: date = Field(..., description="First day, inclusive")
+    end: date = Field(..., description="Last day, inclusive")
+    job_id: Optional[int] = None
+    status: Optional[str] = Field(None, description="pending, reviewing, shortlisted, rejected or interview")
+    limit: int = Field(10, ge=0, le=MAX_ROWS, description="How many example rows to return with the count")
+
+
+def _manager_jobs(manager_id: int):
+    return models.Job.hiring_manager_id == manager_id
+
+
+def job_lookup(db: Session, manager_id: int, args: JobLookupArgs) -> dict:
+    counts = (
+        select(models.Application.job_id, func.count(models.Application.id).label("applications"))
+        .group_by(models.Application.job_id)
+        .subquery()
+    )
+    stmt = (
+        select(
+            models.Job.id, models.Job.title, models.Job.status, models.Job.location,
+            models.Job.salary_min, models.Job.salary_max, models.Job.created_at,
+            func.coalesce(counts.c.applications, 0).label("applications"),
+        )
+        .outerjoin(counts, counts.c.job_id == models.Job.id)
+        .where(_manager_jobs(manager_id))
+        .order_by(models.Job.created_at.desc())
+        .limit(args.limit)
+    )
+    if args.title_contains:
+        stmt = stmt.where(models.Job.title.ilike(f"%{args.title_contains}%"))
+    if args.status:
+        stmt = stmt.where(models.Job.status == args.status)
+    totals = db.execute(
+        select(models.Job.status, func.count(models.Job.id)).where(_manager_jobs(manager_id)).group_by(models.Job.status)
+    ).all()
+    return {
+        "jobs_by_status": {status or "unknown": n for status, n in totals},
+        "jobs": [dict(row) for row in db.execute(stmt).mappings()],
+    }
+
+
+def count_applications_by_status(db: Session, manager_id: int, args: StatusCountArgs) -> dict:
+    stmt = (
+        select(models.Application.status, func.count(models.Application.id))
+        .join(models.Job, models.Job.id == models.Application.job_id)
+        .where(_manager_jobs(manager_id))
+        .group_by(models.Application.status)
+    )
+    if args.job_id is not None:
+        stmt = stmt.where(models.Application.job_id == args.job_id)
+    if args.since is not None:
+        stmt = stmt.where(models.Application.created_at >= datetime.combine(args.since, time.min))
+    by_status = {status or "unknown": n for status, n in db.execute(stmt).all()}
+    return {"total": sum(by_status.values()), "by_status": by_status}
+
+
+def top_scored_applicants(db: Session, manager_id: int, args: TopApplicantsArgs) -> dict:
+    stmt = (
+        select(
+            models.Application.id.label("application_id"),
+            models.User.full_name.label("applicant"),
+            models.Job.title.label("job"),
+            models.Application.ai_score,
+            models.Application.ai_recommendation,
+            models.Application.status,
+        )
+        .join(models.Job, models.Job.id == models.Application.job_id)
+        .join(models.User, models.User.id == models.Application.applicant_id)
+        .where(_manager_jobs(manager_id), models.Application.ai_score.is_not(None))
+        .order_by(models.Application.ai_score.desc())
+        .limit(args.limit)
+    )
+    if args.job_id is not None:
+        stmt = stmt.where(models.Application.job_id == args.job_id)
+    return {"applicants": [dict(row) for row in db.execute(stmt).mappings()]}
+
+
+def applications_in_date_range(db: Session, manager_id: int, args: DateRangeArgs) -> dict:
+    conditions = [
+        _manager_jobs(manager_id),
+        models.Application.created_at >= datetime.combine(args.start, time.min),
+        models.Application.created_at < datetime.combine(args.end + timedelta(days=1), time.min),
+    ]
+    if args.job_id is not None:
+        conditions.append(models.Application.job_id == args.job_id)
+    if args.status:
+        conditions.append(models.Application.status == args.status)
+
+    base = select(models.Application.id).join(models.Job, models.Job.id == models.Application.job_id).where(*conditions)
+    total = db.execute(select(func.count()).select_from(base.subquery())).scalar()
+    rows = db.execute(
+        select(
+            models.Application.id.label("application_id"),
+            models.User.full_name.label("applicant"),
+            models.Job.title.label("job"),
+            models.Application.status,
+            models.Application.ai_score,
+            models.Application.created_at,
+        )
+        .join(models.Job, models.Job.id == models.Application.job_id)
+        .join(models.User, models.User.id == models.Application.applicant_id)
+        .where(*conditions)
+        .order_by(models.Application.created_at.desc())
+        .limit(args.limit)
+    ).mappings()
+    return {"total": total, "examples": [dict(row) for row in rows]}
+
+
+class Tool:
+    def __init__(self, name: str, description: str, args_model: Type[BaseModel],
+                 handler: Callable[[Session, int, Any], dict]):
+        self.name = name
+        self.description = description
+        self.args_model = args_model
+        self.handler = handler
+
+    def schema(self) -> dict:
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.args_model.model_json_schema(),
+            },
+        }
+
+
+TOOLS: Dict[str, Tool] = {
+    tool.name: tool
+    for tool in [
+        Tool("job_lookup", "List the manager's jobs with application counts, optionally filtered by title or status.",
+             JobLookupArgs, job_lookup),
+        Tool("count_applications_by_status", "Count applications grouped by status, optionally for one job or since a date.",
+             StatusCountArgs, count_applications_by_status),
+        Tool("top_scored_applicants", "Highest AI-scored applicants, optionally for one job.",
+             TopApplicantsArgs, top_scored_applicants),
+        Tool("applications_in_date_range", "Count applications created between two dates, with a few examples.",
+             DateRangeArgs, applications_in_date_range),
+    ]
+}
+
+TOOL_SCHEMAS = [tool.schema() for tool in TOOLS.values()]
+
+
+def run_tool(db: Session, manager_id: int, name: str, arguments: str) -> str:
+    """Execute a tool call from the model and return its JSON result (errors included)"""
+    tool = TOOLS.get(name)
+    if tool is None:
+        return orjson.dumps({"error": f"Unknown tool {name}"}).decode()
+    try:
+        args = tool.args_model.model_validate_json(arguments or "{}")
+    except ValidationError as e:
+        return orjson.dumps({"error": "Invalid arguments", "details": e.errors(include_url=False)}, default=str).decode()
+    result = tool.handler(db, manager_id, args)
+    return orjson.dumps(result, default=str).decode()
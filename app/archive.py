@@ -0,0 +1,159 @@
+"""
+Archival tier for closed jobs.
+
+Jobs closed longer than settings.archive_after_days ago are moved, together
+with their applications, messages and email drafts, into archived_* tables
+with the same columns. Stored values are copied as-is, so compressed blobs
+are not decoded on the way. The hot tables and their indexes only hold live
+hiring; the read paths in the routes fall back to the archive by id.
+
+Each job moves in its own transaction, so a run can stop at any point and
+the next one simply picks up the jobs that are still eligible.
+
+    python -m app.archive run --older-than-days 365 --limit 200
+    python -m app.archive status
+"""
+import argparse
+import json
+import logging
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+
+from . import models
+from .config import settings
+from .models import archived_applications, archived_email_drafts, archived_jobs, archived_messages
+
+logger = logging.getLogger(__name__)
+
+
+# (hot table, archive table, how its rows are found for one job id)
+_CHILDREN = [
+    (models.Message.__table__, archived_messages, "application"),
+    (models.EmailDraft.__table__, archived_email_drafts, "application"),
+    (models.Application.__table__, archived_applications, "job"),
+]
+
+
+def _eligible_jobs(cutoff: datetime):
+    job = models.Job.__table__
+    return (
+        select(job.c.id)
+        .where(job.c.status == "closed", func.coalesce(job.c.closed_at, job.c.created_at) < cutoff)
+        .order_by(job.c.id)
+    )
+
+
+def _holds_max_id(conn, job_id: int) -> bool:
+    """
+    SQLite hands out max(id) + 1 for new rows, so moving a table's newest
+    row would let its id be reused and collide with the archived copy.
+    Such jobs wait until newer rows exist.
+    """
+    job = models.Job.__table__
+    application = models.Application.__table__
+    if conn.execute(select(func.max(job.c.id))).scalar() == job_id:
+        return True
+    application_ids = select(application.c.id).where(application.c.job_id == job_id)
+    for table, _, scope in _CHILDREN:
+        max_id = conn.execute(select(func.max(table.c.id))).scalar()
+        if max_id is None:
+            continue
+        owner = table.c.job_id == job_id if scope == "job" else table.c.application_id.in_(application_ids)
+        if conn.execute(select(table.c.id).where(table.c.id == max_id, owner)).first():
+            return True
+    return False
+
+
+def archive_job(conn, job_id: int) -> dict:
+    """Copy one job and its dependent rows into the archive and delete the originals"""
+    job = models.Job.__table__
+    application = models.Application.__table__
+    application_ids = select(application.c.id).where(application.c.job_id == job_id)
+    moved = {}
+    for table, archive, scope in _CHILDREN:
+        owner = table.c.job_id == job_id if scope == "job" else table.c.application_id.in_(application_ids)
+        names = [c.name for c in table.columns]
+        result = conn.execute(insert(archive).from_select(names, select(*table.c).where(owner)))
+        moved[archive.name] = result.rowcount
+        # Applications go last, the other children are found through them
+        if scope == "application":
+            conn.execute(delete(table).where(owner))
+    conn.execute(delete(application).where(application.c.job_id == job_id))
+
+    names = [c.name for c in job.columns]
+    conn.execute(
+        insert(archived_jobs).from_select(
+            names + ["archived_at"], select(*job.c, func.now()).where(job.c.id == job_id)
+        )
+    )
+    conn.execute(delete(models.EmailTemplate.__table__).where(models.EmailTemplate.job_id == job_id))
+    conn.execute(delete(job).where(job.c.id == job_id))
+    moved[archived_jobs.name] = 1
+    return moved
+
+
+def run_archive(engine, older_than_days: Optional[int] = None, limit: Optional[int] = None) -> dict:
+    """Archive eligible closed jobs, oldest id first, one transaction per job"""
+    days = settings.archive_after_days if older_than_days is None else older_than_days
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    stats = {"jobs_archived": 0, "jobs_deferred": 0, "rows": {}}
+
+    stmt = _eligible_jobs(cutoff)
+    if limit:
+        stmt = stmt.limit(limit)
+    with engine.connect() as conn:
+        job_ids = conn.execute(stmt).scalars().all()
+
+    for job_id in job_ids:
+        with engine.begin() as conn:
+            # Re-checked inside the transaction in case it was reopened meanwhile
+            still_eligible = conn.execute(_eligible_jobs(cutoff).where(models.Job.id == job_id)).first()
+            if not still_eligible:
+                continue
+            if _holds_max_id(conn, job_id):
+                stats["jobs_deferred"] += 1
+                continue
+            for table_name, count in archive_job(conn, job_id).items():
+                stats["rows"][table_name] = stats["rows"].get(table_name, 0) + count
+        stats["jobs_archived"] += 1
+        logger.info(f"Archived job {job_id}")
+    return stats
+
+
+def archive_status(engine) -> dict:
+    days = settings.archive_after_days
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    with engine.connect() as conn:
+        pending = conn.execute(select(func.count()).select_from(_eligible_jobs(cutoff).subquery())).scalar()
+        counts = {
+            table.name: conn.execute(select(func.count()).select_from(table)).scalar()
+            for table in (archived_jobs, archived_applications, archived_messages, archived_email_drafts)
+        }
+    return {"archive_after_days": days, "jobs_pending": pending, "archived_rows": counts}
+
+
+def main(argv=None) -> None:
+    from .database import engine, sync_schema
+
+    parser = argparse.ArgumentParser(description="Move old closed jobs into the archive tables")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="archive eligible closed jobs")
+    run.add_argument("--older-than-days", type=int, help=f"default {settings.archive_after_days}")
+    run.add_argument("--limit", type=int, help="stop after this many jobs")
+    commands.add_parser("status", help="eligible jobs and archive sizes")
+    args = parser.parse_args(argv)
+
+    sync_schema()
+    if args.command == "run":
+        result = run_archive(engine, args.older_than_days, args.limit)
+    else:
+        result = archive_status(engine)
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from .metrics import registry
+
+CACHE_EVENTS = registry.counter("cache_events_total", "Cache hits, misses and evictions", ("cache", "event"))
+CACHE_SIZE = registry.gauge("cache_entries", "Entries currently cached", ("cache",))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, name: str, max_entries: int, ttl: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._data[key]
+                self.expirations += 1
+                CACHE_EVENTS.inc(self.name, "expired")
+                entry = None
+            if entry is None:
+                self.misses += 1
+                CACHE_EVENTS.inc(self.name, "miss")
+                CACHE_SIZE.set(self.name, value=len(self._data))
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            CACHE_EVENTS.inc(self.name, "hit")
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+                CACHE_EVENTS.inc(self.name, "evicted")
+            CACHE_SIZE.set(self.name, value=len(self._data))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            CACHE_SIZE.set(self.name, value=0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,95 @@
+"""
+Change feed for manager dashboards.
+
+Every write to a job or an application stamps the row with the next value
+of one global change sequence (next_change_seq, in the writer's
+transaction). GET /jobs/changes?since=<cursor> then returns only the
+manager's jobs and applications stamped after the cursor, read through the
+(hiring_manager_id, change_seq) and (job_id, change_seq) indexes, plus the
+cursor for the next call. Without a cursor it returns a full snapshot.
+
+The counter is a single row bumped with an upsert. Its row lock is held
+until the writer commits, so values become visible in order; the feed also
+reads the committed counter first and returns nothing above it, so a
+cursor never moves past a change that is still being written.
+
+Jobs that app.archive moves out of the live tables are not reported; they
+were closed long before and drop out on the client's next full snapshot.
+"""
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .responses import rows_to_dicts, schema_columns
+
+_SEQUENCE_ID = 1
+
+
+def next_change_seq(db: Session) -> int:
+    """
+    Reserve the next change_seq value; held (and locked) until the caller commits.
+    Writers call this before changing rows, and pending ORM changes are not
+    flushed ahead of it, so every writer takes the sequence lock first.
+    """
+    Sequence = models.ChangeSequence
+    dialect = db.get_bind().dialect.name
+    stmt = (postgresql if dialect == "postgresql" else sqlite).insert(Sequence).values(id=_SEQUENCE_ID, value=1)
+    with db.no_autoflush:
+        return db.execute(
+            stmt.on_conflict_do_update(index_elements=["id"], set_={"value": Sequence.value + 1})
+            .returning(Sequence.value)
+        ).scalar_one()
+
+
+def current_change_seq(db: Session) -> int:
+    """Highest committed change_seq (0 before the first write)"""
+    return db.execute(
+        select(models.ChangeSequence.value).where(models.ChangeSequence.id == _SEQUENCE_ID)
+    ).scalar() or 0
+
+
+def changes_since(db: Session, hiring_manager_id: int, since: Optional[int], include_cover_letter: bool = True) -> dict:
+    """A manager's jobs and applications changed after `since` (everything when None)"""
+    Job, Application = models.Job, models.Application
+    cursor = current_change_seq(db)
+
+    jobs_stmt = (
+        select(*schema_columns(schemas.JobOut, Job), Job.change_seq)
+        .where(Job.hiring_manager_id == hiring_manager_id, Job.change_seq <= cursor)
+        .order_by(Job.change_seq, Job.id)
+    )
+    columns = [
+        Application.id,
+        Application.job_id,
+        func.coalesce(models.User.full_name, "Unknown").label("applicant_name"),
+        func.coalesce(models.User.email, "Unknown").label("applicant_email"),
+        Application.cv_filename,
+        Application.status,
+        Application.created_at,
+        Application.ai_score,
+        Application.ai_recommendation,
+        Application.ai_processed,
+        Application.change_seq,
+    ]
+    if include_cover_letter:
+        columns.insert(4, Application.cover_letter)
+    manager_jobs = select(Job.id).where(Job.hiring_manager_id == hiring_manager_id)
+    applications_stmt = (
+        select(*columns)
+        .outerjoin(models.User, models.User.id == Application.applicant_id)
+        .where(Application.job_id.in_(manager_jobs), Application.change_seq <= cursor)
+        .order_by(Application.change_seq, Application.id)
+    )
+    if since is not None:
+        jobs_stmt = jobs_stmt.where(Job.change_seq > since)
+        applications_stmt = applications_stmt.where(Application.change_seq > since)
+
+    return {
+        "cursor": max(cursor, since or 0),
+        "full": since is None,
+        "jobs": rows_to_dicts(db, jobs_stmt),
+        "applications": rows_to_dicts(db, applications_stmt),
+    }
@@ -0,0 +1,246 @@
+"""
+Transparent compression for large text and binary columns.
+
+Values are stored as one header byte followed by the payload:
+    0x00  stored as-is (too small, or compression didn't help)
+    0x01  zlib
+    0x02  zstd
+Rows written before a column was compressed have no header: text comes back
+from SQLite as str, and raw CVs start with "%PDF", so both are passed through
+unchanged until `recompress` rewrites them.
+
+    python -m app.compression report
+    python -m app.compression recompress --batch-size 500
+"""
+import argparse
+import json
+import sys
+import time
+import zlib
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import LargeBinary, cast, column, func, select, table, update
+from sqlalchemy.types import TypeDecorator
+
+from .config import settings
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+STORED, ZLIB, ZSTD = 0x00, 0x01, 0x02
+CODECS = {"zlib": ZLIB, "zstd": ZSTD}
+
+
+def _codec_id(name: str) -> int:
+    codec = CODECS.get(name, ZLIB)
+    if codec == ZSTD and zstandard is None:
+        return ZLIB
+    return codec
+
+
+def compress(data: bytes, codec: Optional[int] = None, min_size: Optional[int] = None) -> bytes:
+    if codec is None:
+        codec = _codec_id(settings.column_compression_codec)
+    if min_size is None:
+        min_size = settings.column_compression_min_size
+    if len(data) >= min_size:
+        if codec == ZSTD:
+            packed = zstandard.ZstdCompressor(level=settings.column_compression_level).compress(data)
+        else:
+            packed = zlib.compress(data, min(settings.column_compression_level, 9))
+        if len(packed) < len(data):
+            return bytes([codec]) + packed
+    return bytes([STORED]) + data
+
+
+def decompress(value: bytes) -> bytes:
+    header, payload = value[0], value[1:]
+    if header == STORED:
+        return payload
+    if header == ZLIB:
+        return zlib.decompress(payload)
+    if header == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Column was compressed with zstd but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return value  # legacy uncompressed value
+
+
+def is_encoded(value) -> bool:
+    return isinstance(value, bytes) and len(value) > 0 and value[0] in (STORED, ZLIB, ZSTD)
+
+
+class _CompressedColumn(TypeDecorator):
+    """Shared storage; subclasses convert values with _to_bytes and _from_bytes"""
+    impl = LargeBinary
+    cache_ok = True
+    compressed = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress(self._to_bytes(value))
+
+    def result_processor(self, dialect, coltype):
+        # Bypass LargeBinary's processor: legacy text rows come back as str
+        def process(value):
+            if value is None:
+                return None
+            if isinstance(value, str):
+                return self._from_bytes(value.encode())
+            value = bytes(value)
+            return self._from_bytes(decompress(value) if is_encoded(value) else value)
+        return process
+
+
+class CompressedText(_CompressedColumn):
+    """Text column stored compressed; reads and writes str"""
+    cache_ok = True
+
+    def _to_bytes(self, value) -> bytes:
+        return value.encode()
+
+    def _from_bytes(self, data: bytes):
+        return data.decode()
+
+
+class CompressedBinary(_CompressedColumn):
+    """Binary column stored compressed; reads and writes bytes"""
+    cache_ok = True
+
+    def _to_bytes(self, value) -> bytes:
+        return bytes(value)
+
+    def _from_bytes(self, data: bytes):
+        return data
+
+
+def compressed_columns() -> Dict[str, list]:
+    """Table name -> names of its compressed columns, from the models"""
+    from .database import Base
+    from . import models  # noqa: F401
+
+    found: Dict[str, list] = {}
+    for model_table in Base.metadata.sorted_tables:
+        names = [c.name for c in model_table.columns if getattr(c.type, "compressed", False)]
+        if names:
+            found[model_table.name] = names
+    return found
+
+
+def _raw_table(name: str, columns: Iterable[str]):
+    # Untyped columns, so values come back exactly as stored
+    return table(name, column("id"), *(column(c) for c in columns))
+
+
+def recompress(engine, batch_size: int = 500, pause: float = 0.0) -> dict:
+    """
+    Rewrite rows that are uncompressed or use another codec than the
+    configured one, in id order and small batches so it can run alongside
+    live traffic and be re-run safely after an interruption.
+    """
+    target = _codec_id(settings.column_compression_codec)
+    totals = {}
+    for table_name, names in compressed_columns().items():
+        raw = _raw_table(table_name, names)
+        stats = totals[table_name] = {"rows_scanned": 0, "values_rewritten": 0, "bytes_before": 0, "bytes_after": 0}
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(
+                    select(raw).where(raw.c.id > last_id).order_by(raw.c.id).limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                for row in rows:
+                    changes = {}
+                    for name in names:
+                        value = getattr(row, name)
+                        if value is None:
+                            continue
+                        if is_encoded(value) and value[0] in (STORED, target):
+                            continue
+                        if isinstance(value, str):
+                            plain = value.encode()
+                        else:
+                            value = bytes(value)
+                            plain = decompress(value) if is_encoded(value) else value
+                        changes[name] = compress(plain, target)
+                        stats["bytes_before"] += len(value)
+                        stats["bytes_after"] += len(changes[name])
+                    if changes:
+                        conn.execute(update(raw).where(raw.c.id == row.id).values(**changes))
+                        stats["values_rewritten"] += len(changes)
+                stats["rows_scanned"] += len(rows)
+                last_id = rows[-1].id
+            if pause:
+                time.sleep(pause)
+    return totals
+
+
+def size_report(engine, sample_rows: int = 200) -> dict:
+    """
+    Stored vs. uncompressed size per column, plus compress/decompress
+    throughput measured on a sample of real values.
+    """
+    codec = _codec_id(settings.column_compression_codec)
+    report = {"codec": next(name for name, value in CODECS.items() if value == codec), "columns": {}}
+    for table_name, names in compressed_columns().items():
+        raw = _raw_table(table_name, names)
+        with engine.connect() as conn:
+            for name in names:
+                col = raw.c[name]
+                rows, stored = conn.execute(
+                    select(func.count(col), func.coalesce(func.sum(func.length(cast(col, LargeBinary))), 0))
+                ).one()
+                sample = [v for v in conn.execute(select(col).where(col.is_not(None)).limit(sample_rows)).scalars()]
+
+                plain = [
+                    v.encode() if isinstance(v, str) else (decompress(bytes(v)) if is_encoded(bytes(v)) else bytes(v))
+                    for v in sample
+                ]
+                plain_bytes = sum(len(p) for p in plain)
+                start = time.perf_counter()
+                packed = [compress(p) for p in plain]
+                compress_s = time.perf_counter() - start
+                start = time.perf_counter()
+                for p in packed:
+                    decompress(p)
+                decompress_s = time.perf_counter() - start
+                packed_bytes = sum(len(p) for p in packed)
+
+                report["columns"][f"{table_name}.{name}"] = {
+                    "rows": rows,
+                    "stored_bytes": stored,
+                    "sample_rows": len(sample),
+                    "sample_legacy_rows": sum(1 for v in sample if isinstance(v, str) or not is_encoded(bytes(v))),
+                    "sample_ratio": round(packed_bytes / plain_bytes, 3) if plain_bytes else None,
+                    "compress_mb_s": round(plain_bytes / compress_s / 1e6, 1) if plain_bytes and compress_s else None,
+                    "decompress_mb_s": round(plain_bytes / decompress_s / 1e6, 1) if plain_bytes and decompress_s else None,
+                }
+    return report
+
+
+def main(argv=None) -> None:
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Column compression maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("report", help="stored sizes, compression ratio and throughput per column")
+    run = commands.add_parser("recompress", help="compress rows written before compression was enabled")
+    run.add_argument("--batch-size", type=int, default=500)
+    run.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        result = size_report(engine)
+    else:
+        result = recompress(engine, args.batch_size, args.pause)
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
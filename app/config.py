@@ -26,6 +26,98 @@ class Settings(BaseSettings):
     # NEW: OpenAI Configuration
     openai_api_key: str = os.getenv("openai_api_key", "")  # Matches your Azure variable name
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+    # LLM gateway limits (see app/ai/gateway.py)
+    llm_requests_per_minute: int = 500
+    llm_tokens_per_minute: int = 200_000
+    llm_initial_concurrency: int = 8
+    llm_min_concurrency: int = 1
+    llm_max_concurrency: int = 32
+    llm_latency_target_s: float = 20.0
+    llm_queue_timeout_s: float = 60.0
+    llm_max_retries: int = 3
+
+    # Recruitment assistant answer cache
+    answer_cache_ttl_s: float = 600.0
+    answer_cache_max_entries: int = 2000
+
+    # CVs whose text is at least this similar reuse an earlier analysis
+    cv_near_duplicate_threshold: float = 0.9
+
+    # Local pre-screen before CV analysis: CVs scoring below the threshold skip the LLM,
+    # except in the ambiguous band [threshold - margin, threshold) just below it, where the
+    # local score is least reliable. In shadow mode every CV still goes to the LLM.
+    prescreen_enabled: bool = True
+    prescreen_shadow: bool = False
+    prescreen_llm_threshold: float = 15.0
+    prescreen_ambiguous_margin: float = 5.0
+
+    # CV text extraction worker processes (see app/pdf_extraction.py); 0 extracts in-process
+    pdf_workers: int = 2
+    pdf_timeout_seconds: float = 20.0
+    pdf_worker_memory_mb: int = 1024
+    pdf_pages_per_task: int = 8
+    pdf_worker_max_tasks: int = 200
+
+    # Chat conversations: prompts carry the running summary plus the last chat_recent_turns
+    # turns; once chat_summary_batch older turns are unsummarized they are folded in
+    chat_recent_turns: int = 6
+    chat_summary_batch: int = 6
+
+    # Idempotency-Key results are replayed for this long; a duplicate waits up to
+    # idempotency_wait_s for the first request, which is presumed dead after idempotency_stale_s
+    idempotency_ttl_s: float = 24 * 3600
+    idempotency_wait_s: float = 30.0
+    idempotency_stale_s: float = 300.0
+
+    # Talent pool: dimensions of the hashed CV vectors (changing it needs a backfill)
+    talent_pool_dimensions: int = 512
+
+    # Response compression (bytes below this are sent as-is)
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    # Large text/binary columns (see app/compression.py); zstd falls back to zlib if not installed
+    column_compression_codec: str = "zstd"
+    column_compression_level: int = 6
+    column_compression_min_size: int = 256
+
+    # Closed jobs older than this move to the archive tables (python -m app.archive run)
+    archive_after_days: int = 365
+
+    # Admission control per route class (see app/admission.py): requests in progress,
+    # queued requests and how long one may queue before a 503
+    admission_llm_concurrency: int = 16
+    admission_llm_queue: int = 32
+    admission_llm_timeout_s: float = 10.0
+    admission_upload_concurrency: int = 8
+    admission_upload_queue: int = 32
+    admission_upload_timeout_s: float = 10.0
+    admission_export_concurrency: int = 4
+    admission_export_queue: int = 8
+    admission_export_timeout_s: float = 5.0
+    admission_default_concurrency: int = 64
+    admission_default_queue: int = 256
+    admission_default_timeout_s: float = 5.0
+    admission_retry_after_s: float = 2.0
+
+    # Bulkhead thread pools per class of blocking work (see app/executors.py)
+    executor_llm_workers: int = 32
+    executor_email_workers: int = 4
+    executor_auth_workers: int = 4
+    executor_cpu_workers: int = 2
+    executor_db_workers: int = 16
+
+    # Observability
+    log_level: str = "INFO"
+    n_plus_one_threshold: int = 10
+
+    # On-demand profiling, off unless explicitly enabled with a token
+    profiling_enabled: bool = False
+    profiling_token: str = ""
+    profiling_max_seconds: float = 60.0
+    profiling_sample_interval_ms: float = 5.0
     
     class Config:
         env_file = ".env"
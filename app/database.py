@@ -1,9 +1,9 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import hashlib
 
-from .config import Settings
+from sqlalchemy import Column, MetaData, String, Table, create_engine, inspect, select, text
+from sqlalchemy.orm import sessionmaker, declarative_base
 
-settings = Settings()
+from .config import settings
 
 
 engine = create_engine(
@@ -21,6 +21,14 @@ SessionLocal = sessionmaker(
 
 Base = declarative_base()
 
+# Kept outside Base.metadata so it isn't part of the fingerprint it stores
+_schema_metadata = MetaData()
+schema_version_table = Table(
+    "schema_version",
+    _schema_metadata,
+    Column("fingerprint", String(64), nullable=False),
+)
+
 
 def get_db():
     db = SessionLocal()
@@ -28,3 +36,74 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def release_connection(db) -> None:
+    """
+    End the session's transaction so its pooled connection (and on SQLite,
+    any lock) is given back before slow external I/O such as LLM or SMTP
+    calls. Pending changes are committed; loaded objects keep their values
+    and stay attached, and the next query starts a new transaction.
+    """
+    expire_on_commit, db.expire_on_commit = db.expire_on_commit, False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+
+def _column_default_sql(column) -> str:
+    default = column.server_default
+    if default is None:
+        return ""
+    if isinstance(default.arg, str):
+        return f" DEFAULT '{default.arg}'"
+    if hasattr(default.arg, "text"):
+        return f" DEFAULT {default.arg.text}"
+    return ""  # non-constant defaults (e.g. now()) can't be used in ADD COLUMN
+
+
+def schema_fingerprint() -> str:
+    """Hash of every table, column and index the models declare"""
+    parts = []
+    for table in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        parts.append(table.name)
+        parts.extend(f"{c.name}:{c.type!r}:{c.nullable}:{c.server_default is not None}" for c in table.columns)
+        parts.extend(sorted(str(i.name) for i in table.indexes))
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:32]
+
+
+def sync_schema() -> bool:
+    """
+    Create missing tables, then add any columns and indexes that were
+    introduced after an existing table was created.
+    Skipped when the stored fingerprint already matches the models.
+    Returns whether any verification ran.
+    """
+    from . import models  # noqa: F401  (registers the tables on Base)
+
+    fingerprint = schema_fingerprint()
+    with engine.begin() as conn:
+        schema_version_table.create(conn, checkfirst=True)
+        stored = conn.execute(select(schema_version_table.c.fingerprint)).scalar()
+    if stored == fingerprint:
+        return False
+
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                    f"{_column_default_sql(column)}"
+                ))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        conn.execute(schema_version_table.delete())
+        conn.execute(schema_version_table.insert().values(fingerprint=fingerprint))
+    return True
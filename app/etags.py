@@ -0,0 +1,99 @@
+import hashlib
+
+from fastapi import Request, Response
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Clients must revalidate every time, but may keep the body around for a 304
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+def weak_etag(*parts) -> str:
+    """Build a weak ETag from a resource name and its version markers"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison against the request's If-None-Match header"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **CACHE_HEADERS})
+
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, **CACHE_HEADERS}
+
+
+def jobs_list_etag(db: Session, current_user: models.User) -> str:
+    """
+    ETag for GET /jobs, from an aggregate over the visible rows.
+    count/max(id) catch creates and removals, sum(version) catches updates.
+    """
+    stmt = select(
+        func.count(models.Job.id),
+        func.max(models.Job.id),
+        func.coalesce(func.sum(models.Job.version), 0),
+    )
+    if current_user.role == models.UserRole.HIRING_MANAGER:
+        stmt = stmt.where(models.Job.hiring_manager_id == current_user.id)
+        scope = ("manager", current_user.id)
+    else:
+        stmt = stmt.where(models.Job.status == "open")
+        scope = ("open",)
+    count, max_id, version_sum = db.execute(stmt).one()
+    return weak_etag("jobs", *scope, count, max_id, version_sum)
+
+
+def bump_job_version(db: Session, job_id: int) -> None:
+    """Mark a job as changed; committed with the caller's transaction"""
+    db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id)
+        .values(version=models.Job.version + 1)
+    )
+
+
+def bump_applications_version(db: Session, job_id: int) -> None:
+    """Mark a job's application list as changed; committed with the caller's transaction"""
+    db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id)
+        .values(applications_version=models.Job.applications_version + 1)
+    )
+
+
+def bump_applications_versions(db: Session, job_ids) -> None:
+    """Bulk form of bump_applications_version, one statement for all jobs"""
+    job_ids = list(job_ids)
+    if job_ids:
+        db.execute(
+            update(models.Job)
+            .where(models.Job.id.in_(job_ids))
+            .values(applications_version=models.Job.applications_version + 1)
+        )
+
+
+def manager_data_version(db: Session, hiring_manager_id: int) -> tuple:
+    """
+    Version token covering a manager's jobs and their applications.
+    Changes whenever a job is created, updated or receives application changes.
+    """
+    return tuple(db.execute(
+        select(
+            func.count(models.Job.id),
+            func.max(models.Job.id),
+            func.coalesce(func.sum(models.Job.version), 0),
+            func.coalesce(func.sum(models.Job.applications_version), 0),
+        ).where(models.Job.hiring_manager_id == hiring_manager_id)
+    ).one())
@@ -0,0 +1,151 @@
+"""
+Bulkheads: separately sized thread pools per class of blocking work.
+
+Without them every blocking call shares anyio's one threadpool, so a slow
+LLM or SMTP server can occupy all of its threads and stall unrelated
+requests. Each class of work gets its own named pool instead, sized from
+Settings (executor_<name>_workers):
+
+    llm    OpenAI-backed handlers and background analysis
+    email  SMTP sends
+    auth   bcrypt hashing and verification
+    cpu    local scoring (talent pool ranking)
+    db     request handlers that are mostly SQL
+
+Async handlers await `run(name, fn, ...)`; sync code can fire and forget
+with `submit(name, fn, ...)`. The caller's context variables (request id,
+per-request SQL stats) travel with the task. PDF text extraction has its
+own process pool (app/pdf_extraction.py).
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict
+
+from .config import settings
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+POOL_NAMES = ("llm", "email", "auth", "cpu", "db")
+
+EXECUTOR_WORKERS = registry.gauge("executor_workers", "Threads per bulkhead pool", ("pool",))
+EXECUTOR_ACTIVE = registry.gauge("executor_active", "Tasks running in a bulkhead pool", ("pool",))
+EXECUTOR_QUEUED = registry.gauge("executor_queued", "Tasks waiting for a bulkhead thread", ("pool",))
+EXECUTOR_QUEUE_WAIT = registry.histogram(
+    "executor_queue_wait_seconds", "Time a task waited for a bulkhead thread", ("pool",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+EXECUTOR_TASKS = registry.counter("executor_tasks_total", "Tasks finished per bulkhead pool", ("pool", "outcome"))
+
+
+class Bulkhead:
+    """A named ThreadPoolExecutor that tracks queue depth, busy threads and wait times"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.peak_active = 0
+        EXECUTOR_WORKERS.set(name, value=workers)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        context = contextvars.copy_context()
+        queued_at = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+            EXECUTOR_QUEUED.set(self.name, value=self.queued)
+
+        def task():
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.peak_active = max(self.peak_active, self.active)
+                EXECUTOR_QUEUED.set(self.name, value=self.queued)
+                EXECUTOR_ACTIVE.set(self.name, value=self.active)
+            EXECUTOR_QUEUE_WAIT.observe(self.name, value=time.perf_counter() - queued_at)
+            ok = False
+            try:
+                result = context.run(fn, *args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    EXECUTOR_ACTIVE.set(self.name, value=self.active)
+                EXECUTOR_TASKS.inc(self.name, "ok" if ok else "error")
+
+        return self._executor.submit(task)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "active": self.active,
+                "queued": self.queued,
+                "saturation": round(self.active / self.workers, 3),
+                "peak_active": self.peak_active,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_lock = threading.Lock()
+_pools: Dict[str, Bulkhead] = {}
+
+
+def get_pool(name: str) -> Bulkhead:
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            if name not in POOL_NAMES:
+                raise KeyError(f"Unknown executor pool {name}")
+            pool = _pools[name] = Bulkhead(name, getattr(settings, f"executor_{name}_workers"))
+        return pool
+
+
+async def run(name: str, fn: Callable, *args, **kwargs):
+    """Run a blocking call in the named pool and await its result"""
+    return await asyncio.wrap_future(get_pool(name).submit(fn, *args, **kwargs))
+
+
+def _log_failure(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Background task failed", exc_info=future.exception())
+
+
+def submit(name: str, fn: Callable, *args, **kwargs) -> Future:
+    """Queue a blocking call in the named pool without waiting for it; failures are logged"""
+    future = get_pool(name).submit(fn, *args, **kwargs)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def stats() -> Dict[str, dict]:
+    """Saturation snapshot of every pool created so far"""
+    with _lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.stats() for pool in pools}
+
+
+def shutdown() -> None:
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
@@ -0,0 +1,204 @@
+"""
+Idempotency-Key support for expensive POST endpoints.
+
+The first request with a key claims it by inserting a row (the unique index
+decides races between workers), runs the handler and stores the status code
+and JSON body. Repeats of the key by the same user get the stored response
+back with an Idempotent-Replayed header and the handler doesn't run again.
+A repeat that arrives while the first request is still running waits for
+it on the event loop, so waiting never occupies an executor thread; the
+handler is a coroutine that sends its own work to the executor pools, and
+the short key lookups run in the "db" pool. Server errors
+are not stored: the claim is dropped so a retry runs again.
+
+Keys are scoped per user and endpoint, and bound to a fingerprint of the
+request, so reusing a key for a different request is rejected.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+from .config import settings
+from .database import engine
+from .executors import run
+from .metrics import registry
+
+IDEMPOTENCY_REQUESTS = registry.counter(
+    "idempotency_requests_total", "Requests carrying an Idempotency-Key", ("scope", "outcome")
+)
+
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL_S = 0.05
+PURGE_INTERVAL_S = 60.0
+
+_table = models.IdempotencyKey.__table__
+_lock = threading.Lock()
+# Wakes waiters in this process as soon as a key finishes; only touched on the event loop
+_running: Dict[tuple, asyncio.Event] = {}
+_last_purge = 0.0
+
+
+def fingerprint(*parts) -> str:
+    """Hash of what makes a request "the same" request"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _purge_expired(now: float) -> None:
+    global _last_purge
+    with _lock:
+        if now - _last_purge < PURGE_INTERVAL_S:
+            return
+        _last_purge = now
+    with engine.begin() as conn:
+        conn.execute(delete(_table).where(_table.c.expires_at < now))
+
+
+def _find(conn, user_id: int, scope: str, key: str):
+    return conn.execute(
+        select(_table).where(_table.c.user_id == user_id, _table.c.scope == scope, _table.c.key == key)
+    ).first()
+
+
+def _claim(user_id: int, scope: str, key: str, request_fingerprint: str):
+    """Insert the pending row; returns None when claimed, else the existing row"""
+    now = time.time()
+    with engine.begin() as conn:
+        row = _find(conn, user_id, scope, key)
+        if row is not None:
+            abandoned = row.status_code is None and now - row.started_at > settings.idempotency_stale_s
+            if row.expires_at >= now and not abandoned:
+                return row
+            conn.execute(delete(_table).where(_table.c.id == row.id))
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(_table).values(
+                user_id=user_id, scope=scope, key=key, fingerprint=request_fingerprint,
+                started_at=now, expires_at=now + settings.idempotency_ttl_s,
+            ))
+    except IntegrityError:
+        # Another worker claimed it first
+        with engine.connect() as conn:
+            return _find(conn, user_id, scope, key)
+    return None
+
+
+def _lookup(user_id: int, scope: str, key: str):
+    with engine.connect() as conn:
+        return _find(conn, user_id, scope, key)
+
+
+async def _wait_for(user_id: int, scope: str, key: str, event: Optional[asyncio.Event]):
+    """Wait until the first request stores its response (or gives up on the key)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.idempotency_wait_s
+    while loop.time() < deadline:
+        if event is not None:
+            # Running in this process: sleep until it finishes, then read the result once
+            try:
+                await asyncio.wait_for(event.wait(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                pass
+            event = None
+        else:
+            await asyncio.sleep(POLL_INTERVAL_S)
+        row = await run("db", _lookup, user_id, scope, key)
+        if row is None or row.status_code is not None:
+            return row
+    raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+
+def _replay(row) -> ORJSONResponse:
+    return ORJSONResponse(
+        orjson.loads(row.response_body),
+        status_code=row.status_code,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _store(user_id: int, scope: str, key: str, code: int, body) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            update(_table)
+            .where(_table.c.user_id == user_id, _table.c.scope == scope, _table.c.key == key)
+            .values(status_code=code, response_body=orjson.dumps(body, default=str).decode())
+        )
+
+
+def _release(user_id: int, scope: str, key: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(delete(_table).where(
+            _table.c.user_id == user_id, _table.c.scope == scope, _table.c.key == key
+        ))
+
+
+async def run_idempotent(
+    key: Optional[str],
+    user_id: int,
+    scope: str,
+    request_fingerprint: str,
+    handler: Callable[[], Awaitable[dict]],
+    status_code: int = 200,
+):
+    """
+    Await `handler()` at most once per (user, scope, key) and return its
+    response. Without a key the handler's result is returned as-is.
+    """
+    if key is None:
+        return await handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+    await run("db", _purge_expired, time.time())
+    marker = (user_id, scope, key)
+    for _ in range(2):
+        row = await run("db", _claim, user_id, scope, key, request_fingerprint)
+        if row is None:
+            break
+        if row.fingerprint != request_fingerprint:
+            IDEMPOTENCY_REQUESTS.inc(scope, "mismatch")
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if row.status_code is None:
+            IDEMPOTENCY_REQUESTS.inc(scope, "waited")
+            row = await _wait_for(user_id, scope, key, _running.get(marker))
+            if row is None:
+                # The first request failed and dropped its claim; try to take it over
+                continue
+        IDEMPOTENCY_REQUESTS.inc(scope, "replayed")
+        return _replay(row)
+    else:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+    IDEMPOTENCY_REQUESTS.inc(scope, "executed")
+    event = _running[marker] = asyncio.Event()
+    stored = False
+    try:
+        try:
+            body, code, error = await handler(), status_code, None
+        except HTTPException as e:
+            if e.status_code >= 500:
+                raise
+            # Client errors are an outcome too: replay them rather than re-running
+            body, code, error = {"detail": e.detail}, e.status_code, e
+        await run("db", _store, user_id, scope, key, code, body)
+        stored = True
+        if error is not None:
+            raise error
+        return ORJSONResponse(body, status_code=code)
+    finally:
+        if not stored:
+            await run("db", _release, user_id, scope, key)
+        _running.pop(marker, None)
+        event.set()
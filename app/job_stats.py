@@ -0,0 +1,222 @@
+"""
+Hiring-funnel counters per job.
+
+job_stats holds one row per (job, metric, bucket): the application total,
+counts by status and AI recommendation, a 10-point score histogram and
+applications per day. Every code path that creates or changes an
+application calls record_application_change() in its own transaction, so
+reading a job's stats never touches the applications table.
+
+    python -m app.job_stats rebuild            # backfill from applications
+    python -m app.job_stats rebuild --verify   # only report drift
+"""
+import argparse
+import json
+import sys
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Integer, cast, delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+UNSCORED = "unscored"
+UNKNOWN = "none"
+
+
+def score_bucket(score: Optional[float]) -> str:
+    if score is None:
+        return UNSCORED
+    low = min(int(score) // 10 * 10, 90)
+    return f"{low}-{low + 9}" if low < 90 else "90-100"
+
+
+def snapshot(application) -> dict:
+    """The fields the counters depend on, from an Application or a row"""
+    created_at = getattr(application, "created_at", None)
+    return {
+        "status": application.status or "pending",
+        "ai_recommendation": application.ai_recommendation,
+        "ai_score": application.ai_score,
+        "day": (created_at or datetime.now(timezone.utc)).date().isoformat(),
+    }
+
+
+def _buckets(state: Optional[dict]) -> Counter:
+    if state is None:
+        return Counter()
+    return Counter([
+        ("total", ""),
+        ("status", state["status"]),
+        ("recommendation", state["ai_recommendation"] or UNKNOWN),
+        ("score", score_bucket(state["ai_score"])),
+        ("day", state["day"]),
+    ])
+
+
+def _upsert(db: Session):
+    dialect = db.get_bind().dialect.name
+    return (postgresql if dialect == "postgresql" else sqlite).insert(models.JobStat)
+
+
+def _apply(db: Session, job_id: int, deltas: Counter) -> None:
+    rows = [
+        {"job_id": job_id, "metric": metric, "bucket": bucket, "count": delta}
+        for (metric, bucket), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    stmt = _upsert(db)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["job_id", "metric", "bucket"],
+        set_={"count": models.JobStat.count + stmt.excluded.count},
+    ), rows)
+
+
+def record_application_change(db: Session, job_id: int, before: Optional[dict], after: Optional[dict]) -> None:
+    """
+    Move one application's contribution from `before` to `after`
+    (None for a new or removed application). Runs in the caller's transaction.
+    """
+    deltas = _buckets(after)
+    deltas.subtract(_buckets(before))
+    _apply(db, job_id, deltas)
+
+
+def record_status_changes(db: Session, changes: Iterable[tuple], new_status: str) -> None:
+    """Bulk status updates: `changes` holds (job_id, old_status, count) per group of updated applications"""
+    per_job: Dict[int, Counter] = {}
+    for job_id, old_status, count in changes:
+        deltas = per_job.setdefault(job_id, Counter())
+        deltas[("status", old_status or "pending")] -= count
+        deltas[("status", new_status)] += count
+    for job_id, deltas in per_job.items():
+        _apply(db, job_id, deltas)
+
+
+def _format(rows: Iterable[tuple]) -> dict:
+    stats = {"total": 0, "by_status": {}, "by_recommendation": {}, "score_histogram": {}, "daily": {}}
+    sections = {"status": "by_status", "recommendation": "by_recommendation", "score": "score_histogram", "day": "daily"}
+    for metric, bucket, count in rows:
+        if not count:
+            continue
+        if metric == "total":
+            stats["total"] = count
+        else:
+            stats[sections[metric]][bucket] = count
+    stats["daily"] = dict(sorted(stats["daily"].items()))
+    return stats
+
+
+def job_stats(db: Session, job_id: int) -> dict:
+    rows = db.execute(
+        select(models.JobStat.metric, models.JobStat.bucket, models.JobStat.count)
+        .where(models.JobStat.job_id == job_id)
+    ).all()
+    return _format(rows)
+
+
+def manager_summary(db: Session, hiring_manager_id: int) -> dict:
+    """All of a manager's live jobs combined, plus each job's total"""
+    owned = select(models.Job.id).where(models.Job.hiring_manager_id == hiring_manager_id)
+    combined = db.execute(
+        select(models.JobStat.metric, models.JobStat.bucket, func.sum(models.JobStat.count))
+        .where(models.JobStat.job_id.in_(owned), models.JobStat.metric != "day")
+        .group_by(models.JobStat.metric, models.JobStat.bucket)
+    ).all()
+    per_job = db.execute(
+        select(models.Job.id, models.Job.title, models.Job.status, func.coalesce(models.JobStat.count, 0))
+        .outerjoin(models.JobStat, (models.JobStat.job_id == models.Job.id) & (models.JobStat.metric == "total"))
+        .where(models.Job.hiring_manager_id == hiring_manager_id)
+        .order_by(models.Job.id)
+    ).all()
+    summary = _format(combined)
+    del summary["daily"]
+    summary["jobs"] = [
+        {"job_id": job_id, "title": title, "status": status, "applications": total}
+        for job_id, title, status, total in per_job
+    ]
+    return summary
+
+
+def _computed(conn, applications, job_id: Optional[int]) -> Dict[int, Counter]:
+    """Counters recomputed from the applications themselves, one grouped query"""
+    keys = (
+        applications.c.job_id,
+        applications.c.status,
+        applications.c.ai_recommendation,
+        cast(applications.c.ai_score / 10, Integer),  # scores are >= 0, so this floors
+        func.date(applications.c.created_at),
+    )
+    stmt = select(*keys, func.count()).group_by(*keys)
+    if job_id is not None:
+        stmt = stmt.where(applications.c.job_id == job_id)
+    result: Dict[int, Counter] = {}
+    for row_job, status, recommendation, decile, day, count in conn.execute(stmt):
+        state = {
+            "status": status or "pending",
+            "ai_recommendation": recommendation,
+            "ai_score": None if decile is None else float(decile) * 10,
+            "day": str(day) if day else date.today().isoformat(),
+        }
+        counters = result.setdefault(row_job, Counter())
+        for key in _buckets(state):
+            counters[key] += count
+    return result
+
+
+def rebuild(engine, job_id: Optional[int] = None, verify: bool = False) -> dict:
+    """
+    Recompute counters from applications (live and archived) and compare
+    with the stored ones; unless verify is set, replace any that drifted.
+    """
+    with engine.begin() as conn:
+        computed: Dict[int, Counter] = {}
+        for applications in (models.Application.__table__, models.archived_applications):
+            for row_job, counters in _computed(conn, applications, job_id).items():
+                computed.setdefault(row_job, Counter()).update(counters)
+
+        stmt = select(models.JobStat.job_id, models.JobStat.metric, models.JobStat.bucket, models.JobStat.count)
+        if job_id is not None:
+            stmt = stmt.where(models.JobStat.job_id == job_id)
+        stored: Dict[int, Counter] = {}
+        for row_job, metric, bucket, count in conn.execute(stmt):
+            if count:
+                stored.setdefault(row_job, Counter())[(metric, bucket)] = count
+
+        drifted = sorted(j for j in set(computed) | set(stored) if computed.get(j, Counter()) != stored.get(j, Counter()))
+        if not verify:
+            for row_job in drifted:
+                conn.execute(delete(models.JobStat).where(models.JobStat.job_id == row_job))
+                rows = [
+                    {"job_id": row_job, "metric": metric, "bucket": bucket, "count": count}
+                    for (metric, bucket), count in computed.get(row_job, Counter()).items()
+                ]
+                if rows:
+                    conn.execute(models.JobStat.__table__.insert(), rows)
+    return {"jobs_checked": len(set(computed) | set(stored)), "jobs_drifted": drifted, "repaired": not verify}
+
+
+def main(argv=None) -> None:
+    from .database import engine, sync_schema
+
+    parser = argparse.ArgumentParser(description="Maintain the per-job funnel counters")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("rebuild", help="recompute counters from applications")
+    run.add_argument("--job-id", type=int)
+    run.add_argument("--verify", action="store_true", help="report drift without fixing it")
+    args = parser.parse_args(argv)
+
+    sync_schema()
+    result = rebuild(engine, args.job_id, args.verify)
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    if args.verify and result["jobs_drifted"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,45 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 import logging
 
-from .database import engine, Base
+from .admission import AdmissionControlMiddleware, RouteClass
+from .config import settings
+from .database import engine, sync_schema
+from . import executors, pdf_extraction
+from .metrics import MetricsMiddleware, configure_logging, instrument_engine, registry
+from .profiling import ProfilingMiddleware, instrument_routes
+from .responses import CompressionMiddleware
 from . import models
 from .routes import auth_routes, job_routes, application_routes, chat_routes
 from .routes import agent_routes  # NEW: Import agent routes
+from .routes import profiling_routes
 
 logger = logging.getLogger(__name__)
+configure_logging(settings.log_level)
+instrument_engine(engine)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("✅ Database tables created/verified successfully")
+        if sync_schema():
+            logger.info("✅ Database tables created/verified successfully")
+        else:
+            logger.info("✅ Database schema up to date, verification skipped")
     except Exception as e:
         logger.warning(f"⚠️ Table creation skipped (likely already exists): {e}")
     
     yield
+    pdf_extraction.shutdown()
+    executors.shutdown()
     logger.info("🛑 Application shutting down")
 
-app = FastAPI(title="Hirechat Job Portal", lifespan=lifespan)
+app = FastAPI(
+    title="Hirechat Job Portal",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 origins = [
     "http://localhost:5173",
@@ -29,6 +47,17 @@ origins = [
     "https://hirechat-fza5e9g0b0bne7ek.ukwest-01.azurewebsites.net",
 ]
 
+# Innermost, so shed requests still get CORS headers and are counted in the metrics
+app.add_middleware(
+    AdmissionControlMiddleware,
+    route_classes=[
+        RouteClass(name, getattr(settings, f"admission_{name}_concurrency"),
+                   getattr(settings, f"admission_{name}_queue"), getattr(settings, f"admission_{name}_timeout_s"))
+        for name in ("llm", "upload", "export", "default")
+    ],
+    retry_after_s=settings.admission_retry_after_s,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -37,13 +66,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.profiling_enabled:
+    app.add_middleware(
+        ProfilingMiddleware,
+        token=settings.profiling_token,
+        sample_interval=settings.profiling_sample_interval_ms / 1000,
+    )
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    gzip_level=settings.compression_gzip_level,
+    brotli_quality=settings.compression_brotli_quality,
+)
+
+# Outermost, so timings include compression and CORS
+app.add_middleware(MetricsMiddleware, n_plus_one_threshold=settings.n_plus_one_threshold)
+
 # Include routers
 app.include_router(auth_routes.router)
 app.include_router(job_routes.router)
 app.include_router(application_routes.router)
 app.include_router(chat_routes.router)
 app.include_router(agent_routes.router)  # NEW: Add AI routes
+app.include_router(profiling_routes.router)
 
 @app.get("/")
 def root():
     return {"message": "Hirechat Job Portal API ✅ with AI Agents 🤖"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+if settings.profiling_enabled:
+    instrument_routes(app.routes)
@@ -0,0 +1,344 @@
+"""
+In-process metrics with Prometheus text exposition, request/SQL
+instrumentation and structured per-request logs.
+"""
+import logging
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence, Tuple
+
+import orjson
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger("app.requests")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> str:
+        return f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> str:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + "".join(
+            f"{self.name}{_format_labels(self.labelnames, k)} {v}\n" for k, v in items
+        )
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, list] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+                self._sums[labels] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[labels] += value
+
+    def render(self) -> str:
+        with self._lock:
+            items = sorted((k, list(v), self._sums[k]) for k, v in self._counts.items())
+        out = [self.header()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                out.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}\n")
+            out.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}\n")
+            out.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}\n")
+        return "".join(out)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(m.render() for m in metrics)
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+HTTP_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("method",)
+)
+DB_QUERIES = registry.counter("db_queries_total", "SQL statements executed", ("route",))
+DB_TIME = registry.counter("db_query_seconds_total", "Time spent executing SQL", ("route",))
+DB_QUERIES_PER_REQUEST = registry.histogram(
+    "db_queries_per_request", "SQL statements per request", ("route",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250, 1000),
+)
+DB_POOL_WAIT = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Time to get a connection from the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_HOLD = registry.histogram("db_pool_connection_hold_seconds", "How long a connection stayed checked out")
+DB_POOL_HOLD_TOTAL = registry.counter(
+    "db_pool_connection_hold_seconds_total", "Connection hold time, by the route that held it", ("route",)
+)
+DB_POOL_CHECKED_OUT = registry.gauge("db_pool_checked_out", "Connections currently checked out")
+N_PLUS_ONE = registry.counter(
+    "db_n_plus_one_suspected_total", "Requests repeating one statement over the threshold", ("route",)
+)
+
+
+@dataclass
+class RequestStats:
+    request_id: str
+    route: str = "unmatched"
+    queries: int = 0
+    db_seconds: float = 0.0
+    connection_seconds: float = 0.0
+    statements: Dict[str, int] = field(default_factory=dict)
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    stats = _current.get()
+    return stats.request_id if stats else None
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id to every log record as record.request_id"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id() or "-"
+        return True
+
+
+def configure_logging(level: str = "INFO") -> None:
+    """Log to stderr with the request id on every line, unless logging is already set up"""
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(
+            level=level,
+            format="%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s",
+        )
+    for handler in root.handlers:
+        if not any(isinstance(f, RequestIdFilter) for f in handler.filters):
+            handler.addFilter(RequestIdFilter())
+
+
+def instrument_engine(engine) -> None:
+    """
+    Count statements and DB time, globally and for the current request, and
+    time pool checkouts and how long each connection is held.
+    """
+    pool = engine.pool
+    pool_connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return pool_connect()
+        finally:
+            DB_POOL_WAIT.observe(value=time.perf_counter() - start)
+
+    pool.connect = timed_connect
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        start = connection_record.info.pop("checked_out_at", None)
+        if start is None:
+            return
+        held = time.perf_counter() - start
+        DB_POOL_CHECKED_OUT.dec()
+        DB_POOL_HOLD.observe(value=held)
+        stats = _current.get()
+        if stats is None:
+            DB_POOL_HOLD_TOTAL.inc("background", amount=held)
+        else:
+            stats.connection_seconds += held
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _current.get()
+        if stats is None:
+            DB_QUERIES.inc("background")
+            DB_TIME.inc("background", amount=elapsed)
+        else:
+            # Attributed to the route once the request finishes
+            stats.queries += 1
+            stats.db_seconds += elapsed
+            stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+def _route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Per-route latency, status codes, in-flight requests and per-request SQL stats"""
+
+    def __init__(self, app: ASGIApp, n_plus_one_threshold: int = 10):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        stats = RequestStats(request_id=request_id or uuid.uuid4().hex)
+        token = _current.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = stats.request_id
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec(method)
+            stats.route = _route_template(scope)
+            self._record(method, status_code, elapsed, stats)
+            _current.reset(token)
+
+    def _record(self, method: str, status_code: int, elapsed: float, stats: RequestStats) -> None:
+        HTTP_REQUESTS.inc(method, stats.route, str(status_code))
+        HTTP_LATENCY.observe(method, stats.route, value=elapsed)
+        DB_QUERIES.inc(stats.route, amount=stats.queries)
+        DB_TIME.inc(stats.route, amount=stats.db_seconds)
+        DB_QUERIES_PER_REQUEST.observe(stats.route, value=stats.queries)
+        DB_POOL_HOLD_TOTAL.inc(stats.route, amount=stats.connection_seconds)
+
+        repeated = max(stats.statements.items(), key=lambda kv: kv[1], default=(None, 0))
+        if repeated[1] > self.n_plus_one_threshold:
+            N_PLUS_ONE.inc(stats.route)
+            logger.warning(
+                "Possible N+1 on %s %s: statement ran %d times: %s",
+                method, stats.route, repeated[1], repeated[0][:200],
+            )
+
+        request_logger.info(orjson.dumps({
+            "request_id": stats.request_id,
+            "method": method,
+            "route": stats.route,
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000, 2),
+            "queries": stats.queries,
+            "db_ms": round(stats.db_seconds * 1000, 2),
+            "db_connection_ms": round(stats.connection_seconds * 1000, 2),
+        }).decode())
@@ -1,4 +1,5 @@
 from sqlalchemy import (
+    BigInteger,
     Column,
     Integer,
     String,
@@ -9,10 +10,13 @@ from sqlalchemy import (
     Enum,
     Float,  # NEW
     Boolean,  # NEW
+    Index,
+    Table,
 )
 from sqlalchemy.sql import func
 from enum import Enum as PyEnum
 from .database import Base
+from .compression import CompressedBinary, CompressedText
 
 class UserRole(str, PyEnum):
     APPLICANT = "applicant"
@@ -38,31 +42,62 @@ class Job(Base):
     salary_min = Column(Integer, nullable=False)
     salary_max = Column(Integer, nullable=False)
     status = Column(String, default="open")
-    hiring_manager_id = Column(Integer, ForeignKey("users.id"))
+    hiring_manager_id = Column(Integer, ForeignKey("users.id"), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    closed_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Bumped on every change, used for ETags
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    applications_version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Position in the change feed (app/changes.py), stamped on every write
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_jobs_manager_change_seq", "hiring_manager_id", "change_seq"),
+    )
 
 class Application(Base):
     __tablename__ = "applications"
     
     id = Column(Integer, primary_key=True, index=True)
-    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False)
-    applicant_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    cover_letter = Column(Text, nullable=False)
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False, index=True)
+    applicant_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    cover_letter = Column(CompressedText, nullable=False)
     cv_filename = Column(String, nullable=False)
-    cv_content = Column(LargeBinary)
+    cv_content = Column(CompressedBinary)
     status = Column(String, default="pending")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # NEW: AI Analysis Fields
-    cv_parsed_text = Column(Text, nullable=True)  # Extracted text from CV
+    cv_parsed_text = Column(CompressedText, nullable=True)  # Extracted text from CV
     ai_score = Column(Float, nullable=True)  # 0-100 score
     ai_summary = Column(Text, nullable=True)  # AI-generated summary
     ai_recommendation = Column(String, nullable=True)  # "shortlist", "review", "reject"
-    ai_reasoning = Column(Text, nullable=True)  # Why the recommendation
+    ai_reasoning = Column(CompressedText, nullable=True)  # Why the recommendation
     skills_extracted = Column(Text, nullable=True)  # JSON string of skills
     ai_processed = Column(Boolean, default=False)  # Has AI analyzed this?
     ai_processed_at = Column(DateTime(timezone=True), nullable=True)
 
+    # Set once the CV has been analyzed, to find duplicates (see app/ai/cv_dedup.py)
+    cv_sha256 = Column(String(64), nullable=True, index=True)
+    cv_minhash = Column(LargeBinary, nullable=True)
+
+    # Local pre-screen score (app/ai/prescreen.py) and where the AI fields came from:
+    # "llm", "duplicate" (reused from the same CV) or "prescreen" (not sent to the LLM)
+    prescreen_score = Column(Float, nullable=True)
+    ai_analysis_source = Column(String, nullable=True)
+
+    # Position in the change feed (app/changes.py), stamped on every write
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+    # Serve the assistant's query tools, per-job listings and the change feed
+    __table_args__ = (
+        Index("ix_applications_job_status", "job_id", "status"),
+        Index("ix_applications_job_score", "job_id", "ai_score"),
+        Index("ix_applications_created_at", "created_at"),
+        Index("ix_applications_job_change_seq", "job_id", "change_seq"),
+    )
+
 class Message(Base):
     __tablename__ = "messages"
     
@@ -80,7 +115,136 @@ class EmailDraft(Base):
     application_id = Column(Integer, ForeignKey("applications.id"), nullable=False)
     draft_type = Column(String, nullable=False)  # "rejection", "shortlist", "interview"
     subject = Column(String, nullable=False)
-    body = Column(Text, nullable=False)
+    body = Column(CompressedText, nullable=False)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     sent = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class EmailTemplate(Base):
+    """One generated email per (job, type, tone), rendered locally per candidate"""
+    __tablename__ = "email_templates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False)
+    email_type = Column(String, nullable=False)
+    tone = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    # Regenerated when either no longer matches the job or the prompt
+    job_version = Column(Integer, nullable=False)
+    prompt_version = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_email_templates_key", "job_id", "email_type", "tone", unique=True),
+    )
+
+
+class JobStat(Base):
+    """Funnel counters per job, kept in step with applications (see app/job_stats.py)"""
+    __tablename__ = "job_stats"
+
+    job_id = Column(Integer, primary_key=True)
+    metric = Column(String, primary_key=True)  # "total", "status", "recommendation", "score", "day"
+    bucket = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ChangeSequence(Base):
+    """Single-row counter that hands out change_seq values (see app/changes.py)"""
+    __tablename__ = "change_sequence"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(BigInteger, nullable=False)
+
+
+class CvVector(Base):
+    """Hashed bag-of-words vector per parsed CV, for talent-pool matching (see app/ai/talent_pool.py)"""
+    __tablename__ = "cv_vectors"
+
+    # Rows are replaced rather than updated, so ids only grow and workers
+    # can refresh their in-memory index with "id > last seen"
+    id = Column(Integer, primary_key=True)
+    application_id = Column(Integer, nullable=False, unique=True)
+    applicant_id = Column(Integer, nullable=False, index=True)
+    vector = Column(LargeBinary, nullable=False)
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class Conversation(Base):
+    """Server-side chat history (see app/ai/conversations.py)"""
+    __tablename__ = "conversations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    assistant = Column(String(32), nullable=False)  # "recruitment" or "job_search"
+    # Running summary of every turn up to and including summarized_through
+    summary = Column(Text)
+    summarized_through = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ConversationTurn(Base):
+    __tablename__ = "conversation_turns"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    role = Column(String(16), nullable=False)
+    content = Column(CompressedText, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_conversation_turns_conversation", "conversation_id", "id"),
+    )
+
+
+class IdempotencyKey(Base):
+    """Stored outcome of a POST sent with an Idempotency-Key header (see app/idempotency.py)"""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    scope = Column(String(64), nullable=False)
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    # Unix times; status_code stays NULL while the first request is running
+    started_at = Column(Float, nullable=False)
+    expires_at = Column(Float, nullable=False, index=True)
+    status_code = Column(Integer)
+    response_body = Column(Text)
+
+    __table_args__ = (
+        Index("ix_idempotency_keys_key", "user_id", "scope", "key", unique=True),
+    )
+
+
+# Archive tier (see app/archive.py): old closed jobs and everything hanging off them
+def _archive_table(source: Table, *extra) -> Table:
+    """Same columns as `source`, without foreign keys or hot-table indexes"""
+    columns = [
+        Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+        for c in source.columns
+    ]
+    return Table(f"archived_{source.name}", Base.metadata, *columns, *extra)
+
+
+archived_jobs = _archive_table(
+    Job.__table__,
+    Column("archived_at", DateTime(timezone=True), nullable=True),
+    Index("ix_archived_jobs_hiring_manager_id", "hiring_manager_id"),
+)
+archived_applications = _archive_table(
+    Application.__table__,
+    Index("ix_archived_applications_job_id", "job_id"),
+    Index("ix_archived_applications_applicant_id", "applicant_id"),
+)
+archived_messages = _archive_table(
+    Message.__table__,
+    Index("ix_archived_messages_application_id", "application_id"),
+)
+archived_email_drafts = _archive_table(
+    EmailDraft.__table__,
+    Index("ix_archived_email_drafts_application_id", "application_id"),
+)
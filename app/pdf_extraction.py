@@ -0,0 +1,196 @@
+"""
+CV text extraction in a separate process pool.
+
+PyPDF2 is pure Python: a malformed or huge PDF holds the GIL and can run for
+minutes. Extraction therefore runs in worker processes that each have an
+address-space limit, and every document has a wall-clock deadline. A worker
+that times out or dies is killed together with its pool, which is recreated
+on the next call; the web process only ever sees an empty text and a
+failure reason in the metrics. Other documents that were in flight in the
+discarded pool are retried once on the new one.
+
+Long documents are split into page ranges: the first range also reports the
+page count, and the remaining ranges are extracted in parallel.
+
+settings.pdf_workers = 0 extracts in-process (no limits), for tools and tests.
+"""
+import io
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from .config import settings
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PDF_EXTRACTION_SECONDS = registry.histogram("pdf_extraction_duration_seconds", "CV text extraction time per document")
+PDF_PAGE_SECONDS = registry.histogram(
+    "pdf_extraction_page_seconds", "Worker time per extracted page",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+PDF_EXTRACTION_FAILURES = registry.counter(
+    "pdf_extraction_failures_total", "CV text extractions that failed", ("reason",)
+)
+
+
+# Worker side: runs in the pool processes and only needs PyPDF2
+
+def _limit_memory(memory_mb: int) -> None:
+    if memory_mb <= 0:
+        return
+    try:
+        import resource
+
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):  # not available on this platform
+        pass
+
+
+def _extract_pages(content: bytes, first: int, last: Optional[int]) -> Tuple[str, int, int, float]:
+    """
+    Text of pages [first, last) (to the end if last is None).
+    Returns (text, pages extracted, total pages, seconds).
+    """
+    import PyPDF2
+
+    start = time.perf_counter()
+    reader = PyPDF2.PdfReader(io.BytesIO(content))
+    total = len(reader.pages)
+    last = total if last is None else min(last, total)
+    text = "".join(reader.pages[i].extract_text() or "" for i in range(first, last))
+    return text, max(last - first, 0), total, time.perf_counter() - start
+
+
+def _extract_task(content: bytes, first: int, last: Optional[int]):
+    """Pool entry point: failures come back as ("error", reason) instead of raising"""
+    try:
+        return "ok", _extract_pages(content, first, last)
+    except MemoryError:
+        return "error", "memory"
+    except Exception as e:
+        return "error", f"invalid_pdf: {type(e).__name__}: {e}"
+
+
+# Web process side
+
+class _ExtractionError(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn: forking a threaded server process is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.pdf_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_limit_memory,
+                initargs=(settings.pdf_worker_memory_mb,),
+                max_tasks_per_child=settings.pdf_worker_max_tasks or None,
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Kill a pool's workers (a stuck parse can't be cancelled) and forget it"""
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _fail(reason: str, started: float) -> str:
+    PDF_EXTRACTION_FAILURES.inc(reason.split(":")[0])
+    PDF_EXTRACTION_SECONDS.observe(value=time.perf_counter() - started)
+    logger.warning(f"PDF text extraction failed: {reason}")
+    return ""
+
+
+def _extract_in_pool(content: bytes, started: float) -> str:
+    # One retry on a fresh pool: a pool is shared, so it can break or be shut
+    # down because of someone else's document (a timeout kills all workers)
+    for attempt in range(2):
+        pool = _get_pool()
+        try:
+            parts = _extract_parts(pool, content, time.perf_counter() + settings.pdf_timeout_seconds)
+        except FutureTimeoutError:
+            _discard_pool(pool)
+            return _fail("timeout", started)
+        except (BrokenProcessPool, CancelledError, RuntimeError):
+            # A worker died (out of memory outside Python, a parser crash, or
+            # another caller's timeout killed the pool), our queued tasks were
+            # cancelled with it, or it was shut down between _get_pool() and submit()
+            _discard_pool(pool)
+            if attempt:
+                return _fail("worker_crashed", started)
+            logger.info("PDF extraction pool was broken or shut down; retrying on a fresh pool")
+            continue
+        except _ExtractionError as e:
+            return _fail(str(e), started)
+
+        for _, pages, _, seconds in parts:
+            if pages:
+                PDF_PAGE_SECONDS.observe(value=seconds / pages)
+        PDF_EXTRACTION_SECONDS.observe(value=time.perf_counter() - started)
+        return "".join(part[0] for part in parts)
+
+
+def _extract_parts(pool: ProcessPoolExecutor, content: bytes, deadline: float) -> List[tuple]:
+    chunk = max(settings.pdf_pages_per_task, 1)
+
+    def collect(futures) -> List[tuple]:
+        results = []
+        for future in futures:
+            status, value = future.result(timeout=max(deadline - time.perf_counter(), 0))
+            if status == "error":
+                raise _ExtractionError(value)
+            results.append(value)
+        return results
+
+    parts = collect([pool.submit(_extract_task, content, 0, chunk)])
+    total = parts[0][2]
+    if total > chunk:
+        parts += collect([
+            pool.submit(_extract_task, content, start, start + chunk)
+            for start in range(chunk, total, chunk)
+        ])
+    return parts
+
+
+def extract_text(content: bytes) -> str:
+    """Text of a PDF, or "" if it can't be extracted within the limits"""
+    started = time.perf_counter()
+    if not content:
+        return _fail("empty", started)
+    if settings.pdf_workers <= 0:
+        status, value = _extract_task(content, 0, None)
+        if status == "error":
+            return _fail(value, started)
+        text, pages, _, seconds = value
+        if pages:
+            PDF_PAGE_SECONDS.observe(value=seconds / pages)
+        PDF_EXTRACTION_SECONDS.observe(value=time.perf_counter() - started)
+        return text
+    return _extract_in_pool(content, started)
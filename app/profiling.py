@@ -0,0 +1,228 @@
+"""
+Opt-in profiling for live workers.
+
+Nothing here is installed unless settings.profiling_enabled is set, so the
+normal request path carries no overhead. When enabled, a request carrying
+both X-Profile (cprofile or sample) and a valid X-Profile-Token gets its
+endpoint profiled and the report returned instead of the response body.
+"""
+import asyncio
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_MODES = ("cprofile", "sample")
+
+
+def token_is_valid(supplied: Optional[str], expected: str) -> bool:
+    return bool(expected) and bool(supplied) and hmac.compare_digest(supplied, expected)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> str:
+    """Root-to-leaf 'a;b;c' stack, the format flamegraph.pl and speedscope read"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Periodically samples thread stacks into collapsed-stack counts"""
+
+    def __init__(self, interval: float = 0.005, thread_ids: Optional[set] = None):
+        self.interval = interval
+        # None samples every thread except the sampler itself
+        self.thread_ids = thread_ids
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                self.samples[collapse_stack(frame)] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileSession:
+    def __init__(self, mode: str, interval: float):
+        self.mode = mode
+        self.profile = cProfile.Profile() if mode == "cprofile" else None
+        self.thread_ids: set = set()
+        self.sampler = StackSampler(interval, self.thread_ids) if mode == "sample" else None
+
+    def report(self, limit: int = 60) -> str:
+        if self.profile is not None:
+            out = io.StringIO()
+            pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(limit)
+            return out.getvalue()
+        return self.sampler.collapsed()
+
+
+_session: ContextVar[Optional[ProfileSession]] = ContextVar("profile_session", default=None)
+
+
+def _wrap_endpoint(call):
+    """Profile the endpoint body in whichever thread runs it, when a session is active"""
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def async_wrapper(*args, **kwargs):
+            session = _session.get()
+            if session is None:
+                return await call(*args, **kwargs)
+            session.thread_ids.add(threading.get_ident())
+            if session.profile is None:
+                return await call(*args, **kwargs)
+            # Other coroutines interleaving on the loop are captured too
+            session.profile.enable()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                session.profile.disable()
+        return async_wrapper
+
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        session = _session.get()
+        if session is None:
+            return call(*args, **kwargs)
+        session.thread_ids.add(threading.get_ident())
+        try:
+            if session.profile is None:
+                return call(*args, **kwargs)
+            return session.profile.runcall(call, *args, **kwargs)
+        finally:
+            session.thread_ids.discard(threading.get_ident())
+    return wrapper
+
+
+def instrument_routes(routes: Iterable) -> None:
+    """Wrap every API endpoint so profiled requests can reach its thread"""
+    for route in routes:
+        if isinstance(route, APIRoute) and not getattr(route.dependant.call, "__profiled__", False):
+            route.dependant.call = _wrap_endpoint(route.dependant.call)
+            route.dependant.call.__profiled__ = True
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, token: str, sample_interval: float = 0.005):
+        self.app = app
+        self.token = token
+        self.sample_interval = sample_interval
+
+    def _requested_mode(self, scope: Scope) -> Optional[str]:
+        headers = Headers(scope=scope)
+        mode = headers.get("x-profile")
+        if mode not in PROFILE_MODES:
+            return None
+        if not token_is_valid(headers.get("x-profile-token"), self.token):
+            return None
+        return mode
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        mode = self._requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession(mode, self.sample_interval)
+        status = {"code": 500}
+
+        async def capture(message: Message) -> None:
+            # The original response is swallowed and replaced by the report
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+
+        token = _session.set(session)
+        if session.sampler:
+            session.sampler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            elapsed = time.perf_counter() - start
+            if session.sampler:
+                session.sampler.stop()
+            _session.reset(token)
+
+        body = session.report().encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profiled-status", str(status["code"]).encode()),
+                (b"x-profiled-duration-ms", f"{elapsed * 1000:.1f}".encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def sample_worker(seconds: float, interval: float) -> str:
+    """Sample every thread in this worker for a fixed window"""
+    sampler = StackSampler(interval).start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+    return sampler.collapsed()
+
+
+async def tracemalloc_diff(seconds: float, top: int = 30, frames: int = 10) -> str:
+    """Snapshot allocations, wait, snapshot again and report the biggest growth"""
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(frames)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>")]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "traceback")
+    lines = [f"# tracemalloc diff over {seconds:.1f}s, top {top} by growth (traced now={current} peak={peak})"]
+    for stat in stats[:top]:
+        lines.append(f"{stat.size_diff:+d} B ({stat.count_diff:+d} blocks), total {stat.size} B")
+        lines.extend(f"    {line}" for line in stat.traceback.format(limit=frames))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,83 @@
+from typing import Any, Iterable, List, Type
+
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+def schema_columns(schema: Type[BaseModel], model: Any) -> List[Any]:
+    """Map the fields of an output schema to the matching ORM columns"""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def rows_to_dicts(db: Session, stmt: Select) -> List[dict]:
+    """
+    Run a column select and return plain dicts.
+    Rows come straight from our own tables, so they skip the per-row
+    Pydantic validation that response_model would otherwise do.
+    """
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 4) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        out = self.compressor.process(body)
+        if more_body:
+            return out + self.compressor.flush()
+        return out + self.compressor.finish()
+
+
+def _accepted_encodings(accept_encoding: str) -> Iterable[str]:
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        yield token.strip().lower()
+
+
+class CompressionMiddleware:
+    """
+    Negotiate brotli or gzip for responses above minimum_size.
+    Brotli is preferred when the client accepts it and the package is installed.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = set(_accepted_encodings(Headers(scope=scope).get("Accept-Encoding", "")))
+        if brotli is not None and "br" in accepted:
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif "gzip" in accepted:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+
+        await responder(scope, receive, send)
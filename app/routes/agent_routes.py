@@ -1,22 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, Header, HTTPException, BackgroundTasks
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from typing import Dict
+from typing import Dict, Optional
 from pydantic import BaseModel
 from .. import models
 from ..auth import get_current_hiring_manager
-from ..database import get_db
-from ..ai.cv_analysis import process_application_with_ai
-from ..ai.email_agent import generate_and_send_email  # UPDATED: Changed import name
+from ..database import get_db, release_connection
+from ..executors import run
+from ..idempotency import fingerprint, run_idempotent
+from ..ai.cv_analysis import analyze_application_task, screen_job_applications
+from ..ai.email_agent import draft_email, send_draft
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
 class ProcessApplicationRequest(BaseModel):
     application_id: int
+    skip_prescreen: bool = False  # always run the full LLM analysis
 
 class EmailDraftRequest(BaseModel):
     application_id: int
     email_type: str
     send_immediately: bool = True  # NEW
+    tone: str = "professional"
+    personalized: bool = False  # write from this candidate's analysis instead of the job's template
 
 @router.post("/analyze-application")
 def analyze_application(
@@ -33,19 +39,63 @@ def analyze_application(
     if job.hiring_manager_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    background_tasks.add_task(process_application_with_ai, request.application_id, db)
+    # The request's session lives until background tasks finish; let its connection go now
+    release_connection(db)
+    background_tasks.add_task(
+        run, "llm", analyze_application_task, request.application_id, use_prescreen=not request.skip_prescreen
+    )
     
     return {"message": "AI analysis started", "application_id": request.application_id}
 
+@router.post("/jobs/{job_id}/screen")
+def screen_job(
+    job_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_hiring_manager),
+):
+    """Pre-screen every unanalyzed application of a job locally, then analyze the promising ones"""
+    job = db.get(models.Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.hiring_manager_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    pending = db.execute(
+        select(func.count(models.Application.id))
+        .where(models.Application.job_id == job_id, models.Application.ai_processed.is_not(True))
+    ).scalar()
+    release_connection(db)
+    background_tasks.add_task(run, "llm", screen_job_applications, job_id)
+    return {"message": "Screening started", "job_id": job_id, "pending": pending}
+
 @router.post("/generate-email")
-def create_and_send_email(  # Function can keep same name
+async def create_and_send_email(  # Function can keep same name
     request: EmailDraftRequest,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_hiring_manager),
 ):
     """
-    Generate and send email to candidate
+    Generate and send email to candidate.
+    Retries sent with the same Idempotency-Key get the first response
+    instead of another LLM call and a second email.
     """
+    async def create_and_send():
+        # The LLM work and the SMTP round trip run in their own pools
+        result = await run("llm", _create_email, request, db, current_user)
+        if request.send_immediately:
+            result = await run("email", send_draft, db, result)
+            if "error" in result:
+                raise HTTPException(status_code=500, detail=result["error"])
+        return result
+
+    return await run_idempotent(
+        idempotency_key, current_user.id, "generate_email", fingerprint(request.model_dump_json()),
+        create_and_send,
+    )
+
+def _create_email(request: EmailDraftRequest, db: Session, current_user: models.User) -> dict:
     app = db.get(models.Application, request.application_id)
     if not app:
         raise HTTPException(status_code=404, detail="Application not found")
@@ -54,13 +104,13 @@ def create_and_send_email(  # Function can keep same name
     if job.hiring_manager_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # UPDATED: Call the new function
-    result = generate_and_send_email(
+    result = draft_email(
         request.application_id,
         request.email_type,
         db,
         current_user.id,
-        send_immediately=request.send_immediately
+        tone=request.tone,
+        personalized=request.personalized,
     )
     
     if "error" in result:
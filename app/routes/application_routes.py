@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 import smtplib
 from email.message import EmailMessage
 import io
@@ -6,25 +6,42 @@ import logging
 
 from fastapi import (
     APIRouter,
+    BackgroundTasks,
     Depends,
     HTTPException,
     status,
     UploadFile,
     File,
     Form,
+    Header,
     Query,
 )
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
 
 from .. import models, schemas
 from ..auth import get_current_user
-from ..database import get_db
+from ..changes import next_change_seq
+from ..database import get_db, release_connection
+from ..executors import run, submit
+from ..idempotency import fingerprint, run_idempotent
 from ..config import settings  # use settings directly
+from ..ai.email_agent import send_status_emails
+from ..etags import bump_applications_version, bump_applications_versions
+from ..job_stats import record_application_change, record_status_changes, snapshot
+from ..responses import rows_to_dicts, schema_columns
 
 router = APIRouter(prefix="/applications", tags=["applications"])
 logger = logging.getLogger(__name__)
 
+VALID_STATUSES = {"pending", "shortlisted", "rejected", "interview"}
+
+# Status changes that tell the candidate, and the email they get
+STATUS_EMAILS = {"rejected": "rejection", "shortlisted": "shortlist", "interview": "interview"}
+
+MAX_BULK_IDS = 5000
+
 
 def send_application_email(to_email: str, job_title: str, application_id: int) -> None:
   """Send application confirmation email."""
@@ -69,14 +86,31 @@ def send_application_email(to_email: str, job_title: str, application_id: int) -
 
 
 @router.post("", status_code=status.HTTP_201_CREATED)
-def create_application(
+async def create_application(
     job_id: int = Form(...),
     cover_letter: str = Form(...),
     cv: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-  """Create a new job application."""
+  """Create a new job application. Retries sent with the same Idempotency-Key get the first response."""
+  # Read CV content
+  cv_content = await cv.read()
+
+  def create():
+      return _create_application(db, current_user, job_id, cover_letter, cv.filename, cv_content)
+
+  return await run_idempotent(
+      idempotency_key, current_user.id, "create_application",
+      fingerprint(job_id, cover_letter, cv.filename, cv_content), lambda: run("db", create),
+      status_code=status.HTTP_201_CREATED,
+  )
+
+
+def _create_application(
+    db: Session, current_user: models.User, job_id: int, cover_letter: str, cv_filename: str, cv_content: bytes
+) -> dict:
   job = db.get(models.Job, job_id)
   if not job:
       raise HTTPException(status_code=404, detail="Job not found")
@@ -96,36 +130,31 @@ def create_application(
           detail="You have already applied for this job.",
       )
 
-  # Read CV content
-  cv_content = cv.file.read()
-
   # Create application
   db_application = models.Application(
       job_id=job_id,
       cover_letter=cover_letter,
       applicant_id=current_user.id,
-      cv_filename=cv.filename,
+      cv_filename=cv_filename,
       cv_content=cv_content,
+      change_seq=next_change_seq(db),
   )
 
   db.add(db_application)
+  bump_applications_version(db, job_id)
+  record_application_change(db, job_id, None, snapshot(db_application))
   db.commit()
   db.refresh(db_application)
 
-  # Send confirmation email
-  try:
-      logger.info(f"Sending confirmation email to: {current_user.email}")
-      send_application_email(
-          to_email=current_user.email,
-          job_title=job.title,
-          application_id=db_application.id,
-      )
-  except Exception as e:
-      # Log the error but don't fail the application
-      logger.error(f"Failed to send application email: {e}")
-      logger.error(
-          f"Application created successfully (ID: {db_application.id}) but email failed"
-      )
+  # Send confirmation email; it doesn't hold up the response, and a failure is only logged
+  logger.info(f"Sending confirmation email to: {current_user.email}")
+  submit(
+      "email",
+      send_application_email,
+      to_email=current_user.email,
+      job_title=job.title,
+      application_id=db_application.id,
+  )
 
   return {
       "id": db_application.id,
@@ -137,15 +166,21 @@ def create_application(
 
 @router.get("/my-applications", response_model=List[schemas.ApplicationOut])
 def list_my_applications(
+    include_archived: bool = Query(False),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
   """List all applications by current user."""
-  return (
-      db.query(models.Application)
-      .filter(models.Application.applicant_id == current_user.id)
-      .all()
+  stmt = select(*schema_columns(schemas.ApplicationOut, models.Application)).where(
+      models.Application.applicant_id == current_user.id
   )
+  applications = rows_to_dicts(db, stmt)
+  if include_archived:
+      archived = models.archived_applications
+      applications += rows_to_dicts(db, select(*schema_columns(schemas.ApplicationOut, archived.c)).where(
+          archived.c.applicant_id == current_user.id
+      ))
+  return ORJSONResponse(applications)
 
 
 @router.get("/{application_id}/cv")
@@ -156,13 +191,16 @@ def download_cv(
 ):
   """Download CV for an application."""
   application = db.get(models.Application, application_id)
+  if not application:
+      # Read-through to the archive for applications of archived jobs
+      archived = models.archived_applications
+      application = db.execute(
+          select(archived.c.applicant_id, archived.c.cv_filename, archived.c.cv_content)
+          .where(archived.c.id == application_id)
+      ).first()
   if not application:
       raise HTTPException(status_code=404, detail="Application not found")
 
-  job = db.get(models.Job, application.job_id)
-  if not job:
-      raise HTTPException(status_code=404, detail="Job not found")
-
   # Check authorization
   if (
       current_user.role != models.UserRole.HIRING_MANAGER
@@ -184,6 +222,108 @@ def download_cv(
   )
 
 
+@router.patch("/bulk-status")
+def bulk_update_application_status(
+    payload: schemas.BulkStatusUpdate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+  """
+  Set one status on many applications, selected by id or by a filter
+  on one job, in a single UPDATE that also checks job ownership.
+  Candidate emails (notify=true) are queued to run after the response.
+  """
+  if current_user.role != models.UserRole.HIRING_MANAGER:
+      raise HTTPException(status_code=403, detail="Not authorized")
+  if payload.new_status not in VALID_STATUSES:
+      raise HTTPException(status_code=400, detail="Invalid status")
+  if (payload.application_ids is None) == (payload.filter is None):
+      raise HTTPException(status_code=400, detail="Give either application_ids or filter")
+  if payload.application_ids is not None and len(payload.application_ids) > MAX_BULK_IDS:
+      raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_IDS} ids per request")
+
+  Application = models.Application
+  owned_jobs = select(models.Job.id).where(models.Job.hiring_manager_id == current_user.id)
+  conditions = [Application.job_id.in_(owned_jobs), Application.status != payload.new_status]
+
+  if payload.application_ids is not None:
+      requested = list(dict.fromkeys(payload.application_ids))
+      conditions.append(Application.id.in_(requested))
+  else:
+      criteria = payload.filter
+      job = db.get(models.Job, criteria.job_id)
+      if not job:
+          raise HTTPException(status_code=404, detail="Job not found")
+      if job.hiring_manager_id != current_user.id:
+          raise HTTPException(status_code=403, detail="Not authorized to update applications for this job")
+      conditions.append(Application.job_id == criteria.job_id)
+      if criteria.status is not None:
+          conditions.append(Application.status == criteria.status)
+      if criteria.ai_score_below is not None:
+          conditions.append(Application.ai_score < criteria.ai_score_below)
+      if criteria.ai_score_at_least is not None:
+          conditions.append(Application.ai_score >= criteria.ai_score_at_least)
+      if criteria.ai_recommendation is not None:
+          conditions.append(Application.ai_recommendation == criteria.ai_recommendation)
+
+  # Reserving the change sequence first takes the write lock (SQLite) or the
+  # sequence row lock that every application writer takes first (PostgreSQL),
+  # so the old-status counts and the UPDATE below see the same rows
+  change_seq = next_change_seq(db)
+  # Old statuses feed the funnel counters; RETURNING only sees new values
+  previous = db.execute(
+      select(Application.job_id, Application.status, func.count())
+      .where(*conditions)
+      .group_by(Application.job_id, Application.status)
+  ).all()
+  updated = db.execute(
+      update(Application)
+      .where(*conditions)
+      .values(status=payload.new_status, change_seq=change_seq)
+      .returning(Application.id, Application.job_id),
+      execution_options={"synchronize_session": False},
+  ).all() if previous else []
+  updated_ids = [row.id for row in updated]
+  bump_applications_versions(db, {row.job_id for row in updated})
+  record_status_changes(db, previous, payload.new_status)
+  db.commit()
+
+  results = [{"id": application_id, "result": "updated"} for application_id in updated_ids]
+  if payload.application_ids is not None:
+      # Explain the ids that were not updated with one lookup
+      updated_set = set(updated_ids)
+      skipped = [i for i in requested if i not in updated_set]
+      owners = dict(db.execute(
+          select(Application.id, models.Job.hiring_manager_id)
+          .join(models.Job, models.Job.id == Application.job_id)
+          .where(Application.id.in_(skipped))
+      ).all()) if skipped else {}
+      for application_id in skipped:
+          if application_id not in owners:
+              result = "not_found"
+          elif owners[application_id] != current_user.id:
+              result = "forbidden"
+          else:
+              result = "unchanged"
+          results.append({"id": application_id, "result": result})
+
+  email_type = STATUS_EMAILS.get(payload.new_status)
+  queued = 0
+  if payload.notify and email_type and updated_ids:
+      # Background tasks run before get_db closes the session
+      release_connection(db)
+      background_tasks.add_task(send_status_emails, updated_ids, email_type, current_user.id)
+      queued = len(updated_ids)
+
+  return {
+      "new_status": payload.new_status,
+      "updated": len(updated_ids),
+      "notifications_queued": queued,
+      "results": results,
+  }
+
+
 @router.patch("/{application_id}/status")
 def update_application_status(
     application_id: int,
@@ -203,11 +343,14 @@ def update_application_status(
   if current_user.role != models.UserRole.HIRING_MANAGER:
       raise HTTPException(status_code=403, detail="Not authorized")
 
-  valid_status = {"pending", "shortlisted", "rejected", "interview"}
-  if new_status not in valid_status:
+  if new_status not in VALID_STATUSES:
       raise HTTPException(status_code=400, detail="Invalid status")
 
+  before = snapshot(application)
+  application.change_seq = next_change_seq(db)
   application.status = new_status
+  bump_applications_version(db, application.job_id)
+  record_application_change(db, application.job_id, before, snapshot(application))
   db.commit()
   db.refresh(application)
 
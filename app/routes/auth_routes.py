@@ -5,19 +5,24 @@ from sqlalchemy.orm import Session
 
 from .. import models, schemas
 from ..auth import (
-    authenticate_user, hash_password, create_access_token, get_current_user, get_current_hiring_manager
+    authenticate_user, create_access_token, get_current_hiring_manager, get_current_user, get_user_by_email,
+    hash_password,
 )
 from ..database import get_db
+from ..executors import run
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/register", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED)
-def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user_in.email).first()
-    if db_user:
+async def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
+    if await run("db", get_user_by_email, db, user_in.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = hash_password(user_in.password)
+    # bcrypt is deliberately slow; it gets its own pool so logins can't starve other work
+    hashed_password = await run("auth", hash_password, user_in.password)
+    return await run("db", _create_user, db, user_in, hashed_password)
+
+def _create_user(db: Session, user_in: schemas.UserCreate, hashed_password: str) -> models.User:
     db_user = models.User(
         email=user_in.email,
         full_name=user_in.full_name,
@@ -35,7 +40,7 @@ async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await run("auth", authenticate_user, db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,19 +1,22 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from pydantic import BaseModel
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from openai import OpenAI
-import os
+import logging
 
 from .. import models
-from ..auth import get_current_user
-from ..database import get_db
-from ..ai.agent import query_database_with_ai
-from ..config import Settings
+from ..auth import get_current_hiring_manager, get_current_user
+from ..database import get_db, release_connection
+from ..ai.agent import answer_cache, query_database_with_ai
+from ..ai.conversations import add_turns, context_messages, get_conversation, needs_summary, summarize_conversation
+from ..ai.gateway import Priority, chat_completion
+from ..config import settings
+from ..executors import run
 
 router = APIRouter(prefix="/chat", tags=["chat"])
-settings = Settings()
+logger = logging.getLogger(__name__)
 
 
 class ChatMessage(BaseModel):
@@ -23,58 +26,97 @@ class ChatMessage(BaseModel):
 
 class ChatQuery(BaseModel):
     query: str
-    history: List[ChatMessage] = []
+    # Omit to start a new conversation; earlier turns are kept server-side
+    conversation_id: Optional[int] = None
 
 
 class ChatAnswer(BaseModel):
     answer: str
+    conversation_id: Optional[int] = None
+
+
+class ConversationOut(BaseModel):
+    id: int
+    summary: Optional[str] = None
+    turns: List[ChatMessage]
+
+
+def _record_exchange(db: Session, background_tasks: BackgroundTasks, conversation, question: str, answer: str) -> None:
+    """Store the new turns and schedule summarizing once enough have left the recent window"""
+    add_turns(db, conversation.id, [
+        {"role": "user", "content": question},
+        {"role": "assistant", "content": answer},
+    ])
+    summarize = needs_summary(db, conversation)
+    release_connection(db)
+    if summarize:
+        background_tasks.add_task(run, "llm", summarize_conversation, conversation.id)
 
 
 @router.post("/query", response_model=ChatAnswer)
-def chat_query(
+async def chat_query(
     payload: ChatQuery,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     """Manager recruitment assistant endpoint"""
+    return await run("llm", _chat_query, payload, background_tasks, db, current_user)
+
+
+def _chat_query(payload: ChatQuery, background_tasks: BackgroundTasks, db: Session, current_user: models.User):
     if current_user.role != "hiring_manager":
         return ChatAnswer(
             answer="Only hiring managers can use the recruitment assistant."
         )
     
-    answer = query_database_with_ai(payload.query, current_user.id)
+    conversation = get_conversation(db, current_user.id, "recruitment", payload.conversation_id)
+    history = context_messages(db, conversation)
+    # The assistant opens its own short sessions around the model calls
+    release_connection(db)
+    answer = query_database_with_ai(payload.query, current_user.id, history)
     
-    return ChatAnswer(answer=answer)
+    _record_exchange(db, background_tasks, conversation, payload.query, answer)
+    return ChatAnswer(answer=answer, conversation_id=conversation.id)
+
+
+@router.get("/cache-stats")
+def chat_cache_stats(current_user: models.User = Depends(get_current_hiring_manager)):
+    """Hit/miss statistics of the recruitment assistant answer cache"""
+    return answer_cache.stats()
 
 
 @router.post("/applicant-query", response_model=ChatAnswer)
-def applicant_chat_query(
+async def applicant_chat_query(
     payload: ChatQuery,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     """Applicant job search assistant endpoint"""
-    print(f"[DEBUG] Applicant query received from user: {current_user.email}")
+    return await run("llm", _applicant_chat_query, payload, background_tasks, db, current_user)
+
+
+def _applicant_chat_query(payload: ChatQuery, background_tasks: BackgroundTasks, db: Session, current_user: models.User):
+    logger.debug("Applicant query received from user %s", current_user.id)
     
     if current_user.role != "applicant":
         return ChatAnswer(
             answer="Only applicants can use the job search assistant."
         )
     
+    conversation = get_conversation(db, current_user.id, "job_search", payload.conversation_id)
     try:
         # Get all open jobs
-        print("[DEBUG] Fetching jobs...")
         jobs = db.query(models.Job).filter(models.Job.status == "open").all()
-        print(f"[DEBUG] Found {len(jobs)} jobs")
         
         # Get user's applications
-        print("[DEBUG] Fetching applications...")
         applications = (
             db.query(models.Application)
             .filter(models.Application.applicant_id == current_user.id)
             .all()
         )
-        print(f"[DEBUG] Found {len(applications)} applications")
+        logger.debug("Applicant context: %d open jobs, %d applications", len(jobs), len(applications))
         
         # Build context for OpenAI
         jobs_context = "\n".join([
@@ -104,24 +146,18 @@ Help the user with:
 
 Be friendly, concise, and encouraging. If asked about specific jobs, reference them by title and key details."""
 
-        # Build message history
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history (last 10 messages)
-        for msg in payload.history[-10:]:
-            messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
+        # Earlier conversation: running summary plus the latest turns
+        messages = [{"role": "system", "content": system_prompt}, *context_messages(db, conversation)]
+
+        # Everything needed is loaded; don't hold the connection during the model call
+        release_connection(db)
         
         # Add current query
         messages.append({"role": "user", "content": payload.query})
         
-        print("[DEBUG] Calling OpenAI...")
-        
-        # Call OpenAI using settings
-        client = OpenAI(api_key=settings.openai_api_key)
-        response = client.chat.completions.create(
+        response = chat_completion(
+            priority=Priority.INTERACTIVE,
+            caller="applicant_assistant",
             model=settings.openai_model,
             messages=messages,
             temperature=0.7,
@@ -129,15 +165,35 @@ Be friendly, concise, and encouraging. If asked about specific jobs, reference t
         )
         
         answer = response.choices[0].message.content
-        print(f"[DEBUG] OpenAI response received: {answer[:50]}...")
         
-        return ChatAnswer(answer=answer)
+        _record_exchange(db, background_tasks, conversation, payload.query, answer)
+        return ChatAnswer(answer=answer, conversation_id=conversation.id)
         
     except Exception as e:
-        import traceback
-        error_detail = traceback.format_exc()
-        print(f"[ERROR] Full traceback:\n{error_detail}")
+        logger.exception("Applicant assistant failed")
         raise HTTPException(
             status_code=500, 
             detail=f"AI assistant error: {str(e)}"
         )
+
+
+@router.get("/conversations/{conversation_id}", response_model=ConversationOut)
+def get_conversation_history(
+    conversation_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """A conversation's full transcript and its current summary"""
+    conversation = db.get(models.Conversation, conversation_id)
+    if conversation is None or conversation.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    turns = db.execute(
+        select(models.ConversationTurn.role, models.ConversationTurn.content)
+        .where(models.ConversationTurn.conversation_id == conversation_id)
+        .order_by(models.ConversationTurn.id)
+    ).all()
+    return ConversationOut(
+        id=conversation.id,
+        summary=conversation.summary,
+        turns=[ChatMessage(role=role, content=content) for role, content in turns],
+    )
@@ -1,29 +1,84 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import func, or_, select
 
 from .. import models, schemas
+from ..ai.talent_pool import rank_talent_pool
 from ..auth import get_current_hiring_manager, get_current_user
+from ..changes import changes_since, next_change_seq
 from ..database import get_db
+from ..etags import (
+    bump_job_version,
+    etag_headers,
+    etag_matches,
+    jobs_list_etag,
+    not_modified,
+    weak_etag,
+)
+from ..executors import run
+from ..export import MEDIA_TYPES, OPTIONAL_COLUMNS, export_columns, stream_applications
+from ..job_stats import job_stats, manager_summary
+from ..responses import rows_to_dicts, schema_columns
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
 
 @router.get("", response_model=List[schemas.JobOut])
 def list_jobs(
+    request: Request,
+    include_archived: bool = Query(False),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
+    include_archived = include_archived and current_user.role == "hiring_manager"
+    etag = jobs_list_etag(db, current_user)
+    if include_archived:
+        # Archived rows never change, so their count and max id are enough
+        archived = db.execute(
+            select(func.count(models.archived_jobs.c.id), func.max(models.archived_jobs.c.id))
+            .where(models.archived_jobs.c.hiring_manager_id == current_user.id)
+        ).one()
+        etag = weak_etag(etag, "archived", *archived)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    stmt = select(*schema_columns(schemas.JobOut, models.Job))
     if current_user.role == "hiring_manager":
-        return db.query(models.Job).filter(
-            models.Job.hiring_manager_id == current_user.id
-        ).order_by(models.Job.created_at.desc()).all()
+        stmt = stmt.where(models.Job.hiring_manager_id == current_user.id)
     else:
-        return db.query(models.Job).filter(
-            models.Job.status == "open"
-        ).order_by(models.Job.created_at.desc()).all()
+        stmt = stmt.where(models.Job.status == "open")
+    stmt = stmt.order_by(models.Job.created_at.desc())
+    jobs = rows_to_dicts(db, stmt)
+    if include_archived:
+        jobs += rows_to_dicts(db, (
+            select(*schema_columns(schemas.JobOut, models.archived_jobs.c))
+            .where(models.archived_jobs.c.hiring_manager_id == current_user.id)
+            .order_by(models.archived_jobs.c.created_at.desc())
+        ))
+    return ORJSONResponse(jobs, headers=etag_headers(etag))
+
+
+@router.get("/stats/summary")
+def get_manager_summary(
+    db: Session = Depends(get_db),
+    hiring_manager: models.User = Depends(get_current_hiring_manager),
+):
+    """Funnel counts across all of the manager's live jobs"""
+    return ORJSONResponse(manager_summary(db, hiring_manager.id))
+
+
+@router.get("/changes")
+def get_changes(
+    since: Optional[int] = Query(None, ge=0, description="Cursor from the previous response; omit for a full snapshot"),
+    include_cover_letter: bool = Query(True),
+    db: Session = Depends(get_db),
+    hiring_manager: models.User = Depends(get_current_hiring_manager),
+):
+    """Jobs and applications changed since a cursor, so dashboards refresh with a delta"""
+    return ORJSONResponse(changes_since(db, hiring_manager.id, since, include_cover_letter))
 
 
 @router.post("", response_model=schemas.JobOut, status_code=status.HTTP_201_CREATED)
@@ -32,7 +87,7 @@ def create_job(
     db: Session = Depends(get_db),
     hiring_manager: models.User = Depends(get_current_hiring_manager),
 ):
-    db_job = models.Job(**job_in.dict(), hiring_manager_id=hiring_manager.id)
+    db_job = models.Job(**job_in.dict(), hiring_manager_id=hiring_manager.id, change_seq=next_change_seq(db))
     db.add(db_job)
     db.commit()
     db.refresh(db_job)
@@ -42,17 +97,33 @@ def create_job(
 @router.get("/{job_id}", response_model=schemas.JobOut)
 def get_job(
     job_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    job = db.get(models.Job, job_id)
-    if not job:
+    # Check ownership and version before loading the full row
+    marker = db.execute(
+        select(models.Job.hiring_manager_id, models.Job.version).where(models.Job.id == job_id)
+    ).first()
+    table = models.Job.__table__
+    if not marker:
+        # Read-through to the archive; archived jobs are frozen at their last version
+        table = models.archived_jobs
+        marker = db.execute(
+            select(table.c.hiring_manager_id, table.c.version).where(table.c.id == job_id)
+        ).first()
+    if not marker:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    if current_user.role == "hiring_manager" and job.hiring_manager_id != current_user.id:
+    if current_user.role == "hiring_manager" and marker.hiring_manager_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view this job")
     
-    return job
+    etag = weak_etag("job", job_id, marker.version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    stmt = select(*schema_columns(schemas.JobOut, table.c)).where(table.c.id == job_id)
+    return ORJSONResponse(rows_to_dicts(db, stmt)[0], headers=etag_headers(etag))
 
 
 @router.patch("/{job_id}/close", response_model=schemas.JobOut)
@@ -69,49 +140,141 @@ def close_job(
         raise HTTPException(status_code=403, detail="Not authorized to close this job")
     
     job.status = "closed"
+    job.closed_at = func.now()
+    job.change_seq = next_change_seq(db)
+    bump_job_version(db, job.id)
     db.commit()
     db.refresh(job)
     return job
 
 
-@router.get("/{job_id}/applications")
-def get_job_applications(
-    job_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
-):
-    """Get all applications for a specific job (hiring managers only)"""
+def _managed_job(db: Session, job_id: int, current_user: models.User):
+    """
+    Ownership check for a manager's job, live or archived.
+    Returns the job's marker row and the table holding its applications.
+    """
     if current_user.role != models.UserRole.HIRING_MANAGER:
         raise HTTPException(status_code=403, detail="Only hiring managers can view applications")
     
-    job = db.get(models.Job, job_id)
+    job = db.execute(
+        select(models.Job.hiring_manager_id, models.Job.applications_version).where(models.Job.id == job_id)
+    ).first()
+    applications = models.Application.__table__
+    if not job:
+        job = db.execute(
+            select(models.archived_jobs.c.hiring_manager_id, models.archived_jobs.c.applications_version)
+            .where(models.archived_jobs.c.id == job_id)
+        ).first()
+        applications = models.archived_applications
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
     if job.hiring_manager_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view applications for this job")
+    return job, applications
+
+
+@router.get("/{job_id}/applications")
+def get_job_applications(
+    job_id: int,
+    request: Request,
+    include_cover_letter: bool = Query(True),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Get all applications for a specific job (hiring managers only)"""
+    job, applications = _managed_job(db, job_id, current_user)
     
-    applications = (
-        db.query(models.Application)
-        .filter(models.Application.job_id == job_id)
-        .all()
+    etag = weak_etag("job-applications", job_id, job.applications_version, include_cover_letter)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    columns = [
+        applications.c.id,
+        func.coalesce(models.User.full_name, "Unknown").label("applicant_name"),
+        func.coalesce(models.User.email, "Unknown").label("applicant_email"),
+        applications.c.cv_filename,
+        applications.c.status,
+        applications.c.created_at,
+        applications.c.ai_score,
+        applications.c.ai_recommendation,
+        applications.c.ai_processed,
+    ]
+    if include_cover_letter:
+        columns.insert(3, applications.c.cover_letter)
+
+    # One joined query instead of a users lookup per application
+    stmt = (
+        select(*columns)
+        .outerjoin(models.User, models.User.id == applications.c.applicant_id)
+        .where(applications.c.job_id == job_id)
+    )
+    return ORJSONResponse(rows_to_dicts(db, stmt), headers=etag_headers(etag))
+
+
+@router.get("/{job_id}/stats")
+def get_job_stats(
+    job_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Funnel counts for one job, read from the maintained counters"""
+    job, _ = _managed_job(db, job_id, current_user)
+
+    etag = weak_etag("job-stats", job_id, job.applications_version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return ORJSONResponse({"job_id": job_id, **job_stats(db, job_id)}, headers=etag_headers(etag))
+
+
+@router.get("/{job_id}/talent-pool")
+async def get_talent_pool(
+    job_id: int,
+    k: int = Query(20, ge=1, le=200),
+    include_applicants: bool = Query(False, description="Also rank people who already applied to this job"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Past candidates from any of the manager's jobs whose CVs best match this one"""
+    # Scoring is numpy work; it shares the small cpu pool rather than the request threads
+    return await run("cpu", _talent_pool, db, job_id, k, include_applicants, current_user)
+
+
+def _talent_pool(db: Session, job_id: int, k: int, include_applicants: bool, current_user: models.User):
+    _, applications = _managed_job(db, job_id, current_user)
+
+    jobs = models.Job.__table__ if applications is models.Application.__table__ else models.archived_jobs
+    job = db.execute(select(jobs.c.id, jobs.c.title, jobs.c.description).where(jobs.c.id == job_id)).one()
+    candidates = rank_talent_pool(db, job, applications, current_user.id, k, exclude_applied=not include_applicants)
+    return ORJSONResponse({"job_id": job_id, "candidates": candidates})
+
+
+@router.get("/{job_id}/applications/export")
+def export_job_applications(
+    job_id: int,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    columns: Optional[str] = Query(None, description="Comma-separated column names"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Stream a job's applications as CSV or NDJSON"""
+    _, applications = _managed_job(db, job_id, current_user)
+
+    available = export_columns(applications)
+    if columns:
+        names = [name.strip() for name in columns.split(",") if name.strip()]
+        unknown = [name for name in names if name not in available]
+        if unknown or not names:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(available)}",
+            )
+    else:
+        names = [name for name in available if name not in OPTIONAL_COLUMNS]
+
+    return StreamingResponse(
+        stream_applications(job_id, applications, names, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="job-{job_id}-applications.{format}"'},
     )
-    
-    result = []
-    for app in applications:
-        applicant = db.get(models.User, app.applicant_id)
-        result.append({
-            "id": app.id,
-            "applicant_name": applicant.full_name if applicant else "Unknown",
-            "applicant_email": applicant.email if applicant else "Unknown",
-            "cover_letter": app.cover_letter,
-            "cv_filename": app.cv_filename,
-            "status": app.status,
-            "created_at": app.created_at,
-            # NEW: Include AI analysis data
-            "ai_score": app.ai_score,
-            "ai_recommendation": app.ai_recommendation,
-            "ai_processed": app.ai_processed,
-        })
-    
-    return result
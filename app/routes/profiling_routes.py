@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from .. import executors
+from ..config import settings
+from ..profiling import sample_worker, token_is_valid, tracemalloc_diff
+
+router = APIRouter(prefix="/admin/profile", tags=["admin"], include_in_schema=False)
+
+
+def require_profiling_token(x_profile_token: str | None = Header(None)) -> None:
+    if not settings.profiling_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token_is_valid(x_profile_token, settings.profiling_token):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+
+
+@router.get("/sample", dependencies=[Depends(require_profiling_token)])
+async def sample_worker_stacks(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(5.0, ge=1),
+):
+    """Sample every thread of this worker and return collapsed stacks for a flamegraph"""
+    seconds = min(seconds, settings.profiling_max_seconds)
+    collapsed = await sample_worker(seconds, interval_ms / 1000)
+    return PlainTextResponse(collapsed)
+
+
+@router.get("/memory", dependencies=[Depends(require_profiling_token)])
+async def memory_growth(
+    seconds: float = Query(30.0, gt=0),
+    top: int = Query(30, ge=1, le=500),
+):
+    """tracemalloc snapshot diff over a time window, largest growth first"""
+    seconds = min(seconds, settings.profiling_max_seconds)
+    return PlainTextResponse(await tracemalloc_diff(seconds, top=top))
+
+
+@router.get("/executors", dependencies=[Depends(require_profiling_token)])
+async def executor_stats():
+    """Busy threads, queue depth and saturation of each bulkhead pool in this worker"""
+    return executors.stats()
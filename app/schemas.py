@@ -69,6 +69,21 @@ class ApplicationOut(ApplicationBase):
         from_attributes = True
 
 
+class BulkStatusFilter(BaseModel):
+    job_id: int
+    status: Optional[str] = None
+    ai_score_below: Optional[float] = None
+    ai_score_at_least: Optional[float] = None
+    ai_recommendation: Optional[str] = None
+
+class BulkStatusUpdate(BaseModel):
+    new_status: str
+    # Exactly one of these selects the applications
+    application_ids: Optional[List[int]] = None
+    filter: Optional[BulkStatusFilter] = None
+    notify: bool = False  # queue a candidate email for each updated application
+
+
 class MessageBase(BaseModel):
     content: str
 
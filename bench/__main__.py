@@ -0,0 +1,67 @@
+import argparse
+import json
+import sys
+
+from .datagen import SCALES
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Hirechat benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run scenarios and write a JSON report")
+    run_parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    run_parser.add_argument("--scenario", action="append", dest="scenarios",
+                            help="scenario name, repeatable (default: all)")
+    run_parser.add_argument("--requests", type=int, default=200)
+    run_parser.add_argument("--external-requests", type=int, default=20,
+                            help="requests for scenarios that hit the LLM/SMTP stubs")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--llm-latency", type=float, default=0.2)
+    run_parser.add_argument("--smtp-latency", type=float, default=0.05)
+    run_parser.add_argument("--database-url")
+    run_parser.add_argument("--out", help="write the report here instead of stdout")
+
+    compare_parser = commands.add_parser("compare", help="diff two reports")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--json", action="store_true")
+
+    commands.add_parser("list", help="list scenarios")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        from .runner import run
+
+        report = run(
+            scale=args.scale,
+            scenarios=args.scenarios,
+            requests=args.requests,
+            external_requests=args.external_requests,
+            concurrency=args.concurrency,
+            seed=args.seed,
+            llm_latency=args.llm_latency,
+            smtp_latency=args.smtp_latency,
+            database_url=args.database_url,
+        )
+        output = json.dumps(report, indent=2)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(output + "\n")
+        else:
+            sys.stdout.write(output + "\n")
+    elif args.command == "compare":
+        from .compare import compare, format_table, load
+
+        diff = compare(load(args.before), load(args.after))
+        sys.stdout.write((json.dumps(diff, indent=2) if args.json else format_table(diff)) + "\n")
+    else:
+        from .scenarios import SCENARIOS
+
+        for scenario in SCENARIOS.values():
+            sys.stdout.write(f"{scenario.name:<24} {scenario.router}\n")
+
+
+if __name__ == "__main__":
+    main()
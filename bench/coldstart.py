@@ -0,0 +1,81 @@
+"""
+Cold start benchmark: import time of app.main plus lifespan startup,
+measured in fresh interpreters.
+
+The first run starts on an empty database (schema gets created), later runs
+reuse it (schema verification should be skipped). It also lists heavy
+modules that got imported at startup, which should stay empty.
+
+    python -m bench.coldstart --runs 5 --max-import-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ("openai", "PyPDF2", "passlib", "bcrypt", "jose", "numpy")
+
+_PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import app.main as main
+imported = time.perf_counter()
+
+async def startup():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+
+asyncio.run(startup())
+ready = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "heavy_modules": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def probe(database_url: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url)
+    output = subprocess.check_output([sys.executable, "-c", _PROBE], env=env, text=True,
+                                     stderr=subprocess.DEVNULL)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(runs: int) -> dict:
+    database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="hirechat-coldstart-"), "cold.db")
+    first = probe(database_url)
+    warm = [probe(database_url) for _ in range(runs)]
+    return {
+        "first_boot": first,
+        "warm_boot": {
+            "runs": runs,
+            "import_ms_median": round(statistics.median(r["import_ms"] for r in warm), 1),
+            "startup_ms_median": round(statistics.median(r["startup_ms"] for r in warm), 1),
+            "heavy_modules": sorted({m for r in warm for m in r["heavy_modules"]}),
+        },
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Measure app import and startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time exceeds this")
+    args = parser.parse_args(argv)
+
+    report = run(args.runs)
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+    warm = report["warm_boot"]
+    if warm["heavy_modules"]:
+        sys.exit(f"heavy modules imported at startup: {', '.join(warm['heavy_modules'])}")
+    if args.max_import_ms and warm["import_ms_median"] > args.max_import_ms:
+        sys.exit(f"import took {warm['import_ms_median']}ms, budget is {args.max_import_ms}ms")
+
+
+if __name__ == "__main__":
+    main()
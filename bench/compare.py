@@ -0,0 +1,56 @@
+"""Diff two benchmark reports scenario by scenario."""
+import json
+from typing import List
+
+METRICS = [
+    ("throughput_rps", ("throughput_rps",)),
+    ("p50_ms", ("latency_ms", "p50")),
+    ("p95_ms", ("latency_ms", "p95")),
+    ("p99_ms", ("latency_ms", "p99")),
+    ("queries", ("queries_per_request",)),
+    ("llm_calls", ("llm_calls",)),
+    ("rss_mb", ("peak_rss_mb",)),
+]
+
+
+def _lookup(data: dict, path) -> float:
+    for key in path:
+        data = data.get(key, {}) if isinstance(data, dict) else {}
+    return data if isinstance(data, (int, float)) else 0.0
+
+
+def compare(before: dict, after: dict) -> dict:
+    result = {}
+    # Only scenarios present in both runs are comparable
+    for name in sorted(set(before["scenarios"]) & set(after["scenarios"])):
+        old = before["scenarios"][name]
+        new = after["scenarios"][name]
+        row = {}
+        for label, path in METRICS:
+            a, b = _lookup(old, path), _lookup(new, path)
+            row[label] = {
+                "before": a,
+                "after": b,
+                "change_pct": round((b - a) / a * 100, 1) if a else None,
+            }
+        result[name] = row
+    return result
+
+
+def format_table(diff: dict) -> str:
+    lines: List[str] = []
+    header = f"{'scenario':<24}" + "".join(f"{label:>20}" for label, _ in METRICS)
+    lines.append(header)
+    for name, row in diff.items():
+        cells = []
+        for label, _ in METRICS:
+            cell = row[label]
+            pct = "" if cell["change_pct"] is None else f" ({cell['change_pct']:+.1f}%)"
+            cells.append(f"{cell['after']:>11g}{pct:>9}")
+        lines.append(f"{name:<24}" + "".join(cells))
+    return "\n".join(lines)
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
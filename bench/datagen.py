@@ -0,0 +1,233 @@
+"""
+Seeded synthetic data for benchmarks.
+
+Generates users, jobs, applications (with small but real, text-extractable
+PDF CVs) and messages. The same seed and scale always produce the same rows.
+
+    python -m bench.datagen --scale 10k --database-url sqlite:////tmp/bench.db
+"""
+import argparse
+import os
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List
+
+# Scale names map to the number of applications, everything else is derived
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+BENCH_PASSWORD = "bench-password"
+
+SKILLS = [
+    "Python", "FastAPI", "Django", "SQL", "PostgreSQL", "SQLite", "AWS", "Azure",
+    "Docker", "Kubernetes", "React", "TypeScript", "JavaScript", "Node.js", "Go",
+    "Java", "Spring", "Terraform", "Linux", "Redis", "Kafka", "Machine Learning",
+    "Pandas", "NumPy", "CI/CD", "GraphQL", "REST APIs", "Microservices", "Agile",
+    "Product Management", "Figma", "Data Analysis", "Excel", "Recruiting",
+]
+TITLES = [
+    "Backend Engineer", "Frontend Engineer", "Full Stack Developer", "Data Engineer",
+    "DevOps Engineer", "Data Scientist", "Product Manager", "QA Engineer",
+    "Platform Engineer", "Machine Learning Engineer",
+]
+LOCATIONS = ["London", "Manchester", "Leeds", "Bristol", "Edinburgh", "Remote"]
+FIRST_NAMES = ["Alex", "Sam", "Priya", "Tom", "Aisha", "Chen", "Maria", "Liam", "Noah", "Zara"]
+LAST_NAMES = ["Smith", "Patel", "Jones", "Khan", "Brown", "Wang", "Garcia", "Taylor", "Wilson", "Ali"]
+STATUSES = ["pending", "pending", "pending", "reviewing", "shortlisted", "rejected", "interview"]
+
+
+@dataclass
+class Dataset:
+    seed: int
+    applications: int
+    manager_ids: List[int] = field(default_factory=list)
+    applicant_ids: List[int] = field(default_factory=list)
+    # Applicants with no applications, used by scenarios that apply to jobs
+    fresh_applicant_ids: List[int] = field(default_factory=list)
+    job_ids: List[int] = field(default_factory=list)
+    password: str = BENCH_PASSWORD
+
+
+def _escape_pdf(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(lines: List[str]) -> bytes:
+    """Build a one-page PDF whose text PyPDF2 can extract"""
+    content = "BT /F1 11 Tf 14 TL 50 800 Td " + " ".join(f"({_escape_pdf(l)}) '" for l in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+def cv_lines(rng: random.Random, name: str) -> List[str]:
+    skills = rng.sample(SKILLS, rng.randint(4, 9))
+    years = rng.randint(0, 15)
+    return [
+        name,
+        f"{rng.choice(TITLES)} - {rng.choice(LOCATIONS)}",
+        f"Experience: {years} years",
+        "Skills: " + ", ".join(skills),
+        f"Previously worked on {rng.choice(SKILLS)} and {rng.choice(SKILLS)} projects.",
+        f"Education: BSc {rng.choice(['Computer Science', 'Mathematics', 'Physics', 'Business'])}",
+    ]
+
+
+def job_description(rng: random.Random, title: str) -> str:
+    skills = rng.sample(SKILLS, rng.randint(4, 8))
+    return (
+        f"We are hiring a {title} to join our team. "
+        f"You will work with {', '.join(skills[:-1])} and {skills[-1]}. "
+        f"At least {rng.randint(1, 8)} years of experience is expected. "
+        "You will collaborate with product, design and engineering."
+    )
+
+
+def _batched_insert(conn, table, rows: List[dict]) -> None:
+    if rows:
+        conn.execute(table.insert(), rows)
+
+
+def generate(engine, applications: int, seed: int = 42, batch_size: int = 5000) -> Dataset:
+    """Create the schema and fill it with a deterministic dataset"""
+    from app import models
+    from app.auth import hash_password
+    from app.database import sync_schema
+    from app.job_stats import rebuild
+
+    sync_schema()
+    rng = random.Random(seed)
+    # One bcrypt hash for everybody, hashing per user would dominate the run
+    hashed = hash_password(BENCH_PASSWORD)
+    dataset = Dataset(seed=seed, applications=applications)
+
+    n_managers = max(1, applications // 2000)
+    n_applicants = max(1, applications // 3)
+    n_fresh = max(50, min(5000, applications // 10))
+    n_jobs = max(3, applications // 40)
+    start = datetime(2025, 1, 1)
+
+    users = models.User.__table__
+    jobs = models.Job.__table__
+    apps = models.Application.__table__
+    messages = models.Message.__table__
+
+    with engine.begin() as conn:
+        user_id = 0
+        rows = []
+        for i in range(n_managers + n_applicants + n_fresh):
+            user_id += 1
+            is_manager = i < n_managers
+            rows.append({
+                "id": user_id,
+                "email": f"{'manager' if is_manager else 'applicant'}{user_id}@bench.example.com",
+                "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "hashed_password": hashed,
+                "role": (models.UserRole.HIRING_MANAGER if is_manager else models.UserRole.APPLICANT).name,
+                "is_active": 1,
+            })
+            if is_manager:
+                dataset.manager_ids.append(user_id)
+            elif i < n_managers + n_applicants:
+                dataset.applicant_ids.append(user_id)
+            else:
+                dataset.fresh_applicant_ids.append(user_id)
+            if len(rows) >= batch_size:
+                _batched_insert(conn, users, rows)
+                rows = []
+        _batched_insert(conn, users, rows)
+
+        rows = []
+        for job_id in range(1, n_jobs + 1):
+            title = rng.choice(TITLES)
+            salary_min = rng.randrange(25_000, 90_000, 1000)
+            rows.append({
+                "id": job_id,
+                "title": title,
+                "description": job_description(rng, title),
+                "location": rng.choice(LOCATIONS),
+                "salary_min": salary_min,
+                "salary_max": salary_min + rng.randrange(5_000, 30_000, 1000),
+                "status": "open" if rng.random() < 0.8 else "closed",
+                "hiring_manager_id": dataset.manager_ids[job_id % n_managers],
+                "created_at": start + timedelta(minutes=job_id),
+            })
+            dataset.job_ids.append(job_id)
+        _batched_insert(conn, jobs, rows)
+
+        app_rows, message_rows = [], []
+        for app_id in range(1, applications + 1):
+            # Each applicant applies to distinct jobs
+            applicant_index = (app_id - 1) % n_applicants
+            job_id = (applicant_index * 7 + (app_id - 1) // n_applicants) % n_jobs + 1
+            applicant_id = dataset.applicant_ids[applicant_index]
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            created_at = start + timedelta(minutes=app_id)
+            scored = rng.random() < 0.5
+            app_rows.append({
+                "id": app_id,
+                "job_id": job_id,
+                "applicant_id": applicant_id,
+                "cover_letter": f"Dear hiring team, I am {name}. " + "I would love to join. " * rng.randint(5, 40),
+                "cv_filename": f"cv_{app_id}.pdf",
+                "cv_content": build_pdf(cv_lines(rng, name)),
+                "status": rng.choice(STATUSES),
+                "created_at": created_at,
+                "ai_score": round(rng.uniform(10, 98), 1) if scored else None,
+                "ai_recommendation": rng.choice(["shortlist", "review", "reject"]) if scored else None,
+                "ai_processed": scored,
+            })
+            message_rows.append({
+                "id": app_id,
+                "application_id": app_id,
+                "sender_id": applicant_id,
+                "content": f"Hi, just checking on my application {app_id}.",
+                "created_at": created_at,
+            })
+            if len(app_rows) >= batch_size:
+                _batched_insert(conn, apps, app_rows)
+                _batched_insert(conn, messages, message_rows)
+                app_rows, message_rows = [], []
+        _batched_insert(conn, apps, app_rows)
+        _batched_insert(conn, messages, message_rows)
+
+    # Rows went in directly, so backfill the counters the app would have kept
+    rebuild(engine)
+    return dataset
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Generate a seeded benchmark database")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", required=True)
+    args = parser.parse_args(argv)
+
+    os.environ["DATABASE_URL"] = args.database_url
+    from app.database import engine
+
+    dataset = generate(engine, SCALES[args.scale], seed=args.seed)
+    print(
+        f"{args.scale}: {len(dataset.manager_ids)} managers, "
+        f"{len(dataset.applicant_ids) + len(dataset.fresh_applicant_ids)} applicants, "
+        f"{len(dataset.job_ids)} jobs, {dataset.applications} applications"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Before/after benchmark for the list endpoints.
+
+Compares the old path (ORM rows -> response_model validation -> stdlib JSON,
+users fetched per application) against the fast path (column select ->
+orjson) on a generated listing, and reports bytes on the wire per encoding.
+
+    python -m bench.listings --rows 5000
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+import orjson
+
+
+def _setup_database(rows: int):
+    db_file = os.path.join(tempfile.mkdtemp(prefix="hirechat-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_file}"
+
+    from app.database import Base, SessionLocal, engine
+    from app import models
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    manager = models.User(email="manager@bench.example.com", full_name="Bench Manager",
+                          hashed_password="x", role=models.UserRole.HIRING_MANAGER)
+    db.add(manager)
+    db.flush()
+    job = models.Job(title="Backend Engineer", description="Python, SQL and APIs. " * 40,
+                     location="London", salary_min=50000, salary_max=70000,
+                     hiring_manager_id=manager.id)
+    db.add(job)
+    db.flush()
+    applicants = [
+        models.User(email=f"applicant{i}@bench.example.com", full_name=f"Applicant {i}",
+                    hashed_password="x", role=models.UserRole.APPLICANT)
+        for i in range(rows)
+    ]
+    db.add_all(applicants)
+    db.flush()
+    db.add_all([
+        models.Application(job_id=job.id, applicant_id=a.id,
+                           cover_letter=f"I am applicant {a.id}. " + "I enjoy building APIs. " * 30,
+                           cv_filename="cv.pdf", cv_content=b"%PDF-1.4", ai_score=float(a.id % 100))
+        for a in applicants
+    ])
+    db.commit()
+    return db, job.id, manager.id
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def _wire_sizes(body: bytes) -> dict:
+    sizes = {"identity": len(body), "gzip": len(gzip.compress(body, compresslevel=6))}
+    try:
+        import brotli
+        sizes["br"] = len(brotli.compress(body, quality=4))
+    except ImportError:
+        pass
+    return sizes
+
+
+def run(rows: int, repeat: int) -> dict:
+    db, job_id, manager_id = _setup_database(rows)
+
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+    from starlette.requests import Request
+
+    from app import models, schemas
+    from app.responses import rows_to_dicts, schema_columns
+    from app.routes.job_routes import get_job_applications
+
+    adapter = TypeAdapter(List[schemas.ApplicationOut])
+    manager = db.get(models.User, manager_id)
+    # No If-None-Match, so every call takes the full listing path rather than a 304
+    request = Request({"type": "http", "method": "GET", "path": f"/jobs/{job_id}/applications", "headers": []})
+
+    def legacy_my_applications():
+        apps = db.query(models.Application).filter(models.Application.job_id == job_id).all()
+        payload = jsonable_encoder(adapter.validate_python(apps))
+        db.expunge_all()
+        return json.dumps(payload).encode()
+
+    def fast_my_applications():
+        stmt = select(*schema_columns(schemas.ApplicationOut, models.Application)).where(
+            models.Application.job_id == job_id
+        )
+        return orjson.dumps(rows_to_dicts(db, stmt))
+
+    def legacy_job_applications():
+        result = []
+        for app in db.query(models.Application).filter(models.Application.job_id == job_id).all():
+            applicant = db.get(models.User, app.applicant_id)
+            result.append({
+                "id": app.id,
+                "applicant_name": applicant.full_name if applicant else "Unknown",
+                "applicant_email": applicant.email if applicant else "Unknown",
+                "cover_letter": app.cover_letter,
+                "cv_filename": app.cv_filename,
+                "status": app.status,
+                "created_at": app.created_at,
+                "ai_score": app.ai_score,
+                "ai_recommendation": app.ai_recommendation,
+                "ai_processed": app.ai_processed,
+            })
+        db.expunge_all()
+        return json.dumps(jsonable_encoder(result)).encode()
+
+    def fast_job_applications():
+        response = get_job_applications(job_id, request, include_cover_letter=True, db=db, current_user=manager)
+        return response.body
+
+    report = {"rows": rows, "repeat": repeat, "scenarios": {}}
+    for name, legacy, fast in (
+        ("application_listing", legacy_my_applications, fast_my_applications),
+        ("job_applications", legacy_job_applications, fast_job_applications),
+    ):
+        report["scenarios"][name] = {
+            "before": {"cpu_seconds": _timed(legacy, repeat), "bytes": _wire_sizes(legacy())},
+            "after": {"cpu_seconds": _timed(fast, repeat), "bytes": _wire_sizes(fast())},
+        }
+    db.close()
+    return report
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    json.dump(run(args.rows, args.repeat), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
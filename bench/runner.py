@@ -0,0 +1,171 @@
+"""
+Run scenarios against a real uvicorn server backed by a generated database
+and the offline stubs, and produce a JSON report.
+
+    python -m bench run --scale 10k --requests 200 --concurrency 8 --out before.json
+    python -m bench compare before.json after.json
+"""
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .datagen import SCALES, generate
+from .stubs import OpenAIStub, SMTPStub, free_port, install_offline_environment
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+def _start_server(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def run_scenario(scenario, base_url: str, context, requests: int, concurrency: int, seed: int,
+                 queries: QueryCounter, openai_stub: OpenAIStub, smtp_stub: SMTPStub) -> dict:
+    import httpx
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i: int) -> None:
+        if not hasattr(local, "client"):
+            local.client = httpx.Client(base_url=base_url, timeout=120)
+        rng = random.Random(seed * 1_000_003 + i)
+        start = time.perf_counter()
+        try:
+            status = str(scenario.call(local.client, context, rng).status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    queries_before, llm_before, mail_before = queries.count, openai_stub.calls, smtp_stub.messages
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    errors = sum(n for code, n in statuses.items() if not code.startswith(("2", "3")))
+    return {
+        "router": scenario.router,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "status_codes": statuses,
+        "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        },
+        "queries_per_request": round((queries.count - queries_before) / requests, 2),
+        "llm_calls": openai_stub.calls - llm_before,
+        "emails_sent": smtp_stub.messages - mail_before,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run(scale: str = "10k", scenarios: Optional[List[str]] = None, requests: int = 200,
+        external_requests: int = 20, concurrency: int = 8, seed: int = 42,
+        llm_latency: float = 0.2, smtp_latency: float = 0.05, database_url: Optional[str] = None) -> dict:
+    openai_stub = OpenAIStub(latency=llm_latency, seed=seed).start()
+    smtp_stub = SMTPStub(latency=smtp_latency, seed=seed).start()
+    install_offline_environment(openai_stub, smtp_stub)
+    if database_url is None:
+        database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="hirechat-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = database_url
+
+    # Imported only now so the app picks up the environment above
+    from app.database import engine
+    from app.main import app
+
+    from .scenarios import SCENARIOS, build_context
+
+    import httpx
+
+    generate_start = time.perf_counter()
+    dataset = generate(engine, SCALES[scale], seed=seed)
+    generate_seconds = time.perf_counter() - generate_start
+
+    queries = QueryCounter(engine)
+    port = free_port()
+    server, thread = _start_server(app, port)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        with httpx.Client(base_url=base_url, timeout=120) as client:
+            context = build_context(client, dataset, engine)
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "python": sys.version.split()[0],
+                "scale": scale,
+                "seed": seed,
+                "concurrency": concurrency,
+                "llm_latency_s": llm_latency,
+                "smtp_latency_s": smtp_latency,
+                "generate_seconds": round(generate_seconds, 2),
+            },
+            "scenarios": {},
+        }
+        for name in scenarios or list(SCENARIOS):
+            scenario = SCENARIOS[name]
+            count = external_requests if scenario.external else requests
+            report["scenarios"][name] = run_scenario(
+                scenario, base_url, context, count, concurrency, seed, queries, openai_stub, smtp_stub
+            )
+        return report
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        openai_stub.stop()
+        smtp_stub.stop()
@@ -0,0 +1,209 @@
+"""
+Scripted request scenarios, at least one per router in app/routes/.
+
+Each scenario issues a single request per call; the runner repeats it with
+the configured concurrency and collects latency, status codes and queries.
+"""
+import itertools
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+import httpx
+
+from .datagen import Dataset, build_pdf, cv_lines
+
+
+@dataclass
+class Context:
+    dataset: Dataset
+    manager_token: str
+    manager_id: int
+    applicant_token: str
+    applicant_id: int
+    manager_job_ids: List[int]
+    manager_application_ids: List[int]
+    fresh_tokens: Dict[int, str] = field(default_factory=dict)
+    _fresh_pairs: "itertools.count" = field(default_factory=itertools.count)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def manager_headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.manager_token}"}
+
+    def applicant_headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.applicant_token}"}
+
+    def next_fresh_application(self):
+        """A (token, job_id) pair that has never applied before"""
+        with self._lock:
+            n = next(self._fresh_pairs)
+        applicants = sorted(self.fresh_tokens)
+        applicant_id = applicants[n % len(applicants)]
+        job_id = self.dataset.job_ids[(n // len(applicants)) % len(self.dataset.job_ids)]
+        return self.fresh_tokens[applicant_id], job_id
+
+
+@dataclass
+class Scenario:
+    name: str
+    router: str
+    call: Callable[[httpx.Client, Context, random.Random], httpx.Response]
+    # Scenarios that hit the LLM or SMTP stubs are much slower
+    external: bool = False
+
+
+def _login(client: httpx.Client, email: str, password: str) -> str:
+    response = client.post("/auth/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def build_context(client: httpx.Client, dataset: Dataset, engine, fresh_logins: int = 20) -> Context:
+    """Log in the users the scenarios act as and pick ids they can see"""
+    from sqlalchemy import select
+
+    from app import models
+
+    manager_id = dataset.manager_ids[0]
+    applicant_id = dataset.applicant_ids[0]
+    with engine.connect() as conn:
+        job_ids = list(conn.execute(
+            select(models.Job.id).where(models.Job.hiring_manager_id == manager_id)
+        ).scalars())
+        application_ids = list(conn.execute(
+            select(models.Application.id).where(models.Application.job_id.in_(job_ids))
+        ).scalars())
+
+    context = Context(
+        dataset=dataset,
+        manager_token=_login(client, f"manager{manager_id}@bench.example.com", dataset.password),
+        manager_id=manager_id,
+        applicant_token=_login(client, f"applicant{applicant_id}@bench.example.com", dataset.password),
+        applicant_id=applicant_id,
+        manager_job_ids=job_ids,
+        manager_application_ids=application_ids,
+    )
+    for fresh_id in dataset.fresh_applicant_ids[:fresh_logins]:
+        context.fresh_tokens[fresh_id] = _login(client, f"applicant{fresh_id}@bench.example.com", dataset.password)
+    return context
+
+
+def _auth_token(client, ctx, rng):
+    return client.post(
+        "/auth/token",
+        data={"username": f"applicant{ctx.applicant_id}@bench.example.com", "password": ctx.dataset.password},
+    )
+
+
+def _auth_me(client, ctx, rng):
+    return client.get("/auth/me", headers=ctx.applicant_headers())
+
+
+def _jobs_list_manager(client, ctx, rng):
+    return client.get("/jobs", headers=ctx.manager_headers())
+
+
+def _jobs_list_open(client, ctx, rng):
+    return client.get("/jobs", headers=ctx.applicant_headers())
+
+
+def _jobs_get(client, ctx, rng):
+    return client.get(f"/jobs/{rng.choice(ctx.manager_job_ids)}", headers=ctx.manager_headers())
+
+
+def _jobs_applications(client, ctx, rng):
+    return client.get(f"/jobs/{rng.choice(ctx.manager_job_ids)}/applications", headers=ctx.manager_headers())
+
+
+def _applications_create(client, ctx, rng):
+    token, job_id = ctx.next_fresh_application()
+    return client.post(
+        "/applications",
+        headers={"Authorization": f"Bearer {token}"},
+        data={"job_id": str(job_id), "cover_letter": "I would love to join the team."},
+        files={"cv": ("cv.pdf", build_pdf(cv_lines(rng, "Bench Applicant")), "application/pdf")},
+    )
+
+
+def _applications_mine(client, ctx, rng):
+    return client.get("/applications/my-applications", headers=ctx.applicant_headers())
+
+
+def _applications_cv(client, ctx, rng):
+    return client.get(f"/applications/{rng.choice(ctx.manager_application_ids)}/cv", headers=ctx.manager_headers())
+
+
+def _applications_status(client, ctx, rng):
+    status = rng.choice(["pending", "shortlisted", "rejected", "interview"])
+    return client.patch(
+        f"/applications/{rng.choice(ctx.manager_application_ids)}/status",
+        params={"new_status": status},
+        headers=ctx.manager_headers(),
+    )
+
+
+def _chat_query(client, ctx, rng):
+    question = rng.choice([
+        "How many applications did we get this week?",
+        "Who scored highest for the backend role?",
+        "Which jobs are still open?",
+    ])
+    return client.post("/chat/query", json={"query": question}, headers=ctx.manager_headers())
+
+
+def _chat_applicant_query(client, ctx, rng):
+    return client.post(
+        "/chat/applicant-query",
+        json={"query": "Which remote Python jobs are open?", "history": []},
+        headers=ctx.applicant_headers(),
+    )
+
+
+def _ai_analyze(client, ctx, rng):
+    return client.post(
+        "/ai/analyze-application",
+        json={"application_id": rng.choice(ctx.manager_application_ids)},
+        headers=ctx.manager_headers(),
+    )
+
+
+def _ai_generate_email(client, ctx, rng):
+    return client.post(
+        "/ai/generate-email",
+        json={
+            "application_id": rng.choice(ctx.manager_application_ids),
+            "email_type": rng.choice(["rejection", "shortlist", "interview"]),
+            "send_immediately": True,
+        },
+        headers=ctx.manager_headers(),
+    )
+
+
+def _ai_analysis(client, ctx, rng):
+    return client.get(
+        f"/ai/application/{rng.choice(ctx.manager_application_ids)}/analysis",
+        headers=ctx.manager_headers(),
+    )
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    s.name: s
+    for s in [
+        Scenario("auth.token", "auth_routes", _auth_token),
+        Scenario("auth.me", "auth_routes", _auth_me),
+        Scenario("jobs.list_manager", "job_routes", _jobs_list_manager),
+        Scenario("jobs.list_open", "job_routes", _jobs_list_open),
+        Scenario("jobs.get", "job_routes", _jobs_get),
+        Scenario("jobs.applications", "job_routes", _jobs_applications),
+        Scenario("applications.create", "application_routes", _applications_create, external=True),
+        Scenario("applications.mine", "application_routes", _applications_mine),
+        Scenario("applications.cv", "application_routes", _applications_cv),
+        Scenario("applications.status", "application_routes", _applications_status),
+        Scenario("chat.query", "chat_routes", _chat_query, external=True),
+        Scenario("chat.applicant_query", "chat_routes", _chat_applicant_query, external=True),
+        Scenario("ai.analyze", "agent_routes", _ai_analyze, external=True),
+        Scenario("ai.generate_email", "agent_routes", _ai_generate_email, external=True),
+        Scenario("ai.analysis", "agent_routes", _ai_analysis),
+    ]
+}
@@ -0,0 +1,253 @@
+"""
+Local stand-ins for the OpenAI API and the SMTP server.
+
+Both run in background threads, add a configurable latency to every call
+and count what they receive, so benchmarks never leave the machine.
+"""
+import json
+import os
+import random
+import socket
+import socketserver
+import ssl
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Latency:
+    def __init__(self, seconds: float, jitter: float, seed: int):
+        self.seconds = seconds
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sleep(self) -> None:
+        with self.lock:
+            delay = self.seconds + self.rng.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _completion_text(payload: dict) -> str:
+    """Pick a plausible canned answer for the prompt shape the app sends"""
+    if (payload.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps({
+            "score": 72,
+            "summary": "Experienced engineer with a solid backend background.",
+            "recommendation": "review",
+            "reasoning": "Good overlap with the listed skills, some gaps in seniority.",
+            "skills": ["Python", "SQL", "AWS"],
+        })
+    prompt = " ".join(str(m.get("content") or "") for m in payload.get("messages", []))
+    if "Subject:" in prompt:
+        return (
+            "Subject: Update on your application\n"
+            "Thank you for your interest in the role. We have reviewed your application "
+            "and will be in touch about the next steps at a time that works for you."
+        )
+    return "Based on the current data, there are several open roles and recent applications to review."
+
+
+def _completion_message(payload: dict):
+    """Call the first offered tool once, then answer in text"""
+    tools = payload.get("tools") or []
+    already_called = any(m.get("role") == "tool" for m in payload.get("messages", []))
+    if tools and not already_called and payload.get("tool_choice") != "none":
+        name = tools[0]["function"]["name"]
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{"id": "call_stub_1", "type": "function", "function": {"name": name, "arguments": "{}"}}],
+        }, "tool_calls"
+    return {"role": "assistant", "content": _completion_text(payload)}, "stop"
+
+
+class OpenAIStub:
+    """Minimal /v1/chat/completions server"""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.05, rate_limit_ratio: float = 0.0, seed: int = 0):
+        self.latency = _Latency(latency, jitter, seed)
+        self.rate_limit_ratio = rate_limit_ratio
+        self.rng = random.Random(seed + 1)
+        self.calls = 0
+        self.rate_limited = 0
+        self.prompt_chars = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def _handle(self, payload: dict):
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += sum(len(str(m.get("content") or "")) for m in payload.get("messages", []))
+            limited = self.rng.random() < self.rate_limit_ratio
+            if limited:
+                self.rate_limited += 1
+        self.latency.sleep()
+        if limited:
+            return 429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}}
+        message, finish_reason = _completion_message(payload)
+        return 200, {
+            "id": f"chatcmpl-stub-{self.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": finish_reason,
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def start(self) -> "OpenAIStub":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                status, body = stub._handle(payload)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _self_signed_context() -> ssl.SSLContext:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(datetime.utcnow() - timedelta(days=1))
+        .not_valid_after(datetime.utcnow() + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    directory = tempfile.mkdtemp(prefix="hirechat-smtp-")
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+class SMTPStub:
+    """SMTP server speaking just enough ESMTP for smtplib (STARTTLS + AUTH)"""
+
+    def __init__(self, latency: float = 0.1, jitter: float = 0.02, seed: int = 0):
+        self.latency = _Latency(latency, jitter, seed)
+        self.messages = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._tls = _self_signed_context()
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def start(self) -> "SMTPStub":
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str) -> None:
+                self.wfile.write(line.encode() + b"\r\n")
+                self.wfile.flush()
+
+            def handle(self):
+                self.reply("220 localhost stub ESMTP")
+                while True:
+                    raw = self.rfile.readline()
+                    if not raw:
+                        return
+                    command = raw.decode(errors="replace").strip()
+                    verb = command.split(" ", 1)[0].upper()
+                    if verb in ("EHLO", "HELO"):
+                        self.wfile.write(b"250-localhost\r\n250-STARTTLS\r\n250 AUTH PLAIN LOGIN\r\n")
+                        self.wfile.flush()
+                    elif verb == "STARTTLS":
+                        self.reply("220 Ready to start TLS")
+                        self.connection = stub._tls.wrap_socket(self.connection, server_side=True)
+                        self.rfile = self.connection.makefile("rb")
+                        self.wfile = self.connection.makefile("wb")
+                    elif verb == "AUTH":
+                        self.reply("235 Authentication successful")
+                    elif verb == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                            pass
+                        stub.latency.sleep()
+                        with stub._lock:
+                            stub.messages += 1
+                        self.reply("250 OK queued")
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def install_offline_environment(openai_stub: OpenAIStub, smtp_stub: SMTPStub) -> None:
+    """Point the app at the stubs. Must run before the app is imported."""
+    host, port = smtp_stub.address
+    os.environ["OPENAI_BASE_URL"] = openai_stub.base_url
+    os.environ["openai_api_key"] = "sk-bench-stub"
+    os.environ["SMTP_HOST"] = host
+    os.environ["SMTP_PORT"] = str(port)
+    os.environ["SMTP_USER"] = "bench@bench.example.com"
+    os.environ["SMTP_PASSWORD"] = "bench"
@@ -0,0 +1,55 @@
+"""CSV exports neutralize spreadsheet formulas in applicant-supplied text."""
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='hirechat-test-'), 'test.db')}"
+
+from app import models  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.export import _csv_value, stream_applications  # noqa: E402
+
+FORMULAS = ["=HYPERLINK(\"http://evil\")", "+1+1", "-2+3", "@SUM(A1)", "\tcmd", "\rcmd"]
+
+
+def test_csv_value_prefixes_formula_text():
+    for value in FORMULAS:
+        assert _csv_value(value) == "'" + value
+
+
+def test_csv_value_leaves_other_values_alone():
+    assert _csv_value("Jane Doe") == "Jane Doe"
+    assert _csv_value(-5.0) == -5.0
+    assert _csv_value(None) == ""
+    assert _csv_value(datetime(2024, 1, 2, 3, 4, 5)) == "2024-01-02T03:04:05"
+
+
+def test_csv_export_neutralizes_applicant_text():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    manager = models.User(email="m@test.example.com", full_name="Manager", hashed_password="x",
+                          role=models.UserRole.HIRING_MANAGER)
+    applicant = models.User(email="a@test.example.com", full_name="=cmd|' /C calc'!A0", hashed_password="x",
+                            role=models.UserRole.APPLICANT)
+    db.add_all([manager, applicant])
+    db.flush()
+    job = models.Job(title="Engineer", description="d", location="l", salary_min=1, salary_max=2,
+                     hiring_manager_id=manager.id)
+    db.add(job)
+    db.flush()
+    db.add(models.Application(job_id=job.id, applicant_id=applicant.id, cover_letter="+1+1",
+                              cv_filename="@cv.pdf", ai_summary="-2+3", ai_score=-1.0))
+    job_id = job.id
+    db.commit()
+    db.close()
+
+    names = ["applicant_name", "cover_letter", "cv_filename", "ai_summary", "ai_score"]
+    body = b"".join(stream_applications(job_id, models.Application.__table__, names, "csv")).decode()
+    header, row = list(csv.reader(io.StringIO(body)))
+    assert header == names
+    assert row == ["'=cmd|' /C calc'!A0", "'+1+1", "'@cv.pdf", "'-2+3", "-1.0"]
+
+    ndjson = b"".join(stream_applications(job_id, models.Application.__table__, names, "ndjson"))
+    assert b'"cover_letter":"+1+1"' in ndjson  # only CSV is meant for spreadsheets